@@ -1,168 +1,55 @@
 import pandas as pd
-import numpy as np
-import math
-import scipy.stats
-from scipy.special import erfinv
 import warnings
+from lois_fiabilite import LOIS, statistiques_lois
+from stockage import charger_table, sauver_table, TABLE_RESUME, TABLE_STATISTIQUES
+from instrumentation import demarrer_rapport, etape
 warnings.filterwarnings("ignore")
 
-# ======================== 1. Fonctions statistiques par loi ========================
+# Export Excel en fin de traitement
+EXPORT_EXCEL = True
 
-def weibull_2p_stats(alpha, beta):
-    mtbf = alpha * math.gamma(1 + 1 / beta)
-    median = alpha * (math.log(2))**(1 / beta)
-    mode = alpha * ((beta - 1) / beta) ** (1 / beta) if beta > 1 else 0
-    q75 = alpha * (-math.log(1 - 0.25)) ** (1 / beta)
-    q99 = alpha * (-math.log(1 - 0.01)) ** (1 / beta)
+# Quantiles calculés (probabilité de défaillance) : une colonne Q.. chacun
+QUANTILES = (0.75, 0.99)
 
-    def hazard(t): return (beta / alpha) * (t / alpha) ** (beta - 1)
-    return {
-        "MTBF": f"{mtbf:.1f} ({hazard(mtbf):.5f})",
-        "Mediane": f"{median:.1f} ({hazard(median):.5f})",
-        "Mode": f"{mode:.1f} ({hazard(mode):.5f})",
-        "Q75": f"{q75:.1f} ({hazard(q75):.5f})",
-        "Q99": f"{q99:.1f} ({hazard(q99):.5f})"
-    }
+# Présentation "valeur (λ)" de l'ancienne feuille Excel ; le stockage reste numérique
+FORMAT_TEXTE = False
 
-def weibull_3p_stats(alpha, beta, gamma_):
-    mtbf = gamma_ + alpha * math.gamma(1 + 1 / beta)
-    median = gamma_ + alpha * (math.log(2))**(1 / beta)
-    mode = gamma_ + alpha * ((beta - 1) / beta) ** (1 / beta) if beta > 1 else gamma_
-    q75 = gamma_ + alpha * (-math.log(1 - 0.25)) ** (1 / beta)
-    q99 = gamma_ + alpha * (-math.log(1 - 0.01)) ** (1 / beta)
+# ======================== 1. Présentation (optionnelle) ========================
 
-    def hazard(t):
-        t_ = t - gamma_
-        if t_ <= 0: return 0
-        return (beta / alpha) * (t_ / alpha) ** (beta - 1)
-    return {
-        "MTBF": f"{mtbf:.1f} ({hazard(mtbf):.5f})",
-        "Mediane": f"{median:.1f} ({hazard(median):.5f})",
-        "Mode": f"{mode:.1f} ({hazard(mode):.5f})",
-        "Q75": f"{q75:.1f} ({hazard(q75):.5f})",
-        "Q99": f"{q99:.1f} ({hazard(q99):.5f})"
-    }
+def formater_statistiques(df_stats, points):
+    """Colonnes "valeur (λ)" pour l'affichage, à partir des colonnes numériques."""
+    df_texte = df_stats.drop(columns=[f"lambda_{p}" for p in points])
+    for p in points:
+        df_texte[p] = [f"{v:.1f} ({h:.5f})" for v, h in zip(df_stats[p], df_stats[f"lambda_{p}"])]
+    return df_texte
 
-def gamma_stats(k, theta):
-    mtbf = k * theta
-    median = scipy.stats.gamma.ppf(0.5, a=k, scale=theta)
-    mode = (k - 1) * theta if k >= 1 else 0
-    q75 = scipy.stats.gamma.ppf(0.75, a=k, scale=theta)
-    q99 = scipy.stats.gamma.ppf(0.99, a=k, scale=theta)
+if __name__ == "__main__":
 
-    def hazard(t):
-        if t <= 0: return 0
-        f = scipy.stats.gamma.pdf(t, a=k, scale=theta)
-        R = 1 - scipy.stats.gamma.cdf(t, a=k, scale=theta)
-        return f / R if R > 0 else 0
+    # ======================== 2. Lecture des paramètres ========================
 
-    return {
-        "MTBF": f"{mtbf:.1f} ({hazard(mtbf):.5f})",
-        "Mediane": f"{median:.1f} ({hazard(median):.5f})",
-        "Mode": f"{mode:.1f} ({hazard(mode):.5f})",
-        "Q75": f"{q75:.1f} ({hazard(q75):.5f})",
-        "Q99": f"{q99:.1f} ({hazard(q99):.5f})"
-    }
+    # Rapport d'exécution (durées des étapes)
+    demarrer_rapport("Analyse_stat_v1")
 
-def lognormale_stats(mu, sigma):
-    mtbf = math.exp(mu + sigma**2 / 2)
-    median = math.exp(mu)
-    mode = math.exp(mu - sigma**2)
-    q75 = math.exp(mu + sigma * math.sqrt(2) * erfinv(2 * 0.75 - 1))
-    q99 = math.exp(mu + sigma * math.sqrt(2) * erfinv(2 * 0.99 - 1))
+    with etape("lecture"):
+        df = charger_table(TABLE_RESUME)
+        for loi in df.loc[~df["Loi"].isin(LOIS), "Loi"].unique():
+            print(f"[Erreur] Loi non supportée : {loi}")
+        df = df[df["Loi"].isin(LOIS)]
 
-    def hazard(t):
-        if t <= 0: return 0
-        f = (1 / (t * sigma * math.sqrt(2 * math.pi))) * math.exp(-(math.log(t) - mu) ** 2 / (2 * sigma**2))
-        R = 1 - scipy.stats.lognorm.cdf(t, s=sigma, scale=np.exp(mu))
-        return f / R if R > 0 else 0
+    # ======================== 3. Traitement (toutes les lignes d'une loi en un appel) ========================
 
-    return {
-        "MTBF": f"{mtbf:.1f} ({hazard(mtbf):.5f})",
-        "Mediane": f"{median:.1f} ({hazard(median):.5f})",
-        "Mode": f"{mode:.1f} ({hazard(mode):.5f})",
-        "Q75": f"{q75:.1f} ({hazard(q75):.5f})",
-        "Q99": f"{q99:.1f} ({hazard(q99):.5f})"
-    }
+    with etape("statistiques"):
+        statistiques = statistiques_lois(df, QUANTILES)
+        df_stats = pd.concat([df[["Site", "Composant", "Loi", "Méthode"]], statistiques], axis=1).reset_index(drop=True)
 
-def exponentielle_stats(lmbda):
-    mtbf = 1 / lmbda
-    median = math.log(2) / lmbda
-    mode = 0
-    q75 = -math.log(1 - 0.25) / lmbda
-    q99 = -math.log(1 - 0.01) / lmbda
+    # ======================== 4. Export ========================
 
-    def hazard(_): return lmbda
-    return {
-        "MTBF": f"{mtbf:.1f} ({hazard(mtbf):.5f})",
-        "Mediane": f"{median:.1f} ({hazard(median):.5f})",
-        "Mode": f"{mode:.1f} ({hazard(mode):.5f})",
-        "Q75": f"{q75:.1f} ({hazard(q75):.5f})",
-        "Q99": f"{q99:.1f} ({hazard(q99):.5f})"
-    }
-
-def gumbel_stats(mu, beta):
-    mtbf = mu + beta * 0.5772
-    median = mu - beta * math.log(math.log(2))
-    mode = mu
-    q75 = scipy.stats.gumbel_r.ppf(0.75, loc=mu, scale=beta)
-    q99 = scipy.stats.gumbel_r.ppf(0.99, loc=mu, scale=beta)
-
-    def hazard(t):
-        f = scipy.stats.gumbel_r.pdf(t, loc=mu, scale=beta)
-        R = 1 - scipy.stats.gumbel_r.cdf(t, loc=mu, scale=beta)
-        return f / R if R > 0 else 0
-
-    return {
-        "MTBF": f"{mtbf:.1f} ({hazard(mtbf):.5f})",
-        "Mediane": f"{median:.1f} ({hazard(median):.5f})",
-        "Mode": f"{mode:.1f} ({hazard(mode):.5f})",
-        "Q75": f"{q75:.1f} ({hazard(q75):.5f})",
-        "Q99": f"{q99:.1f} ({hazard(q99):.5f})"
-    }
-
-# ======================== 2. Lecture des paramètres ========================
-
-df = pd.read_excel(r"C:\Users\COMPUTER\Validation_Lois_Fiabilite.xlsx", sheet_name="Résumé Meilleure Loi")
-resultats = []
-
-# ======================== 3. Traitement ========================
-
-for _, row in df.iterrows():
-    try:
-        loi = row["Loi"]
-        methode = row["Méthode"]
-
-        if loi == "Weibull 2P":
-            stats = weibull_2p_stats(float(row["alpha"]), float(row["beta"]))
-        elif loi == "Weibull 3P":
-            stats = weibull_3p_stats(float(row["alpha"]), float(row["beta"]), float(row["gamma"]))
-        elif loi == "Gamma":
-            stats = gamma_stats(float(row["k"]), float(row["theta"]))
-        elif loi == "Lognormale":
-            stats = lognormale_stats(float(row["mu_ln"]), float(row["sigma_ln"]))
-        elif loi == "Exponentielle":
-            stats = exponentielle_stats(float(row["lambda_"]))
-        elif loi == "Gumbel":
-            stats = gumbel_stats(float(row["mu_gumbel"]), float(row["beta_gumbel"]))
+    with etape("export"):
+        sauver_table(TABLE_STATISTIQUES, df_stats)
+        if EXPORT_EXCEL:
+            points = [c for c in statistiques.columns if not c.startswith("lambda_")]
+            (formater_statistiques(df_stats, points) if FORMAT_TEXTE else df_stats).to_excel(
+                "Statistiques_Fiabilite.xlsx", index=False)
+            print("✅ Statistiques calculées et exportées dans 'Statistiques_Fiabilite.xlsx'")
         else:
-            continue
-
-        ligne = {
-            "Site": row["Site"],
-            "Composant": row["Composant"],
-            "Loi": loi,
-            "Méthode": methode
-        }
-        ligne.update(stats)
-        resultats.append(ligne)
-
-    except Exception as e:
-        print(f"[Erreur] {row['Site']} - {row['Composant']} - {loi} : {e}")
-        continue
-
-# ======================== 4. Export ========================
-
-df_stats = pd.DataFrame(resultats)
-df_stats.to_excel("Statistiques_Fiabilite.xlsx", index=False)
-print("✅ Statistiques calculées et exportées dans 'Statistiques_Fiabilite.xlsx'")
+            print("✅ Statistiques calculées et enregistrées dans le stockage")
@@ -3,179 +3,165 @@ import numpy as np
 import math
 from typing import Callable
 import os
-from scipy.special import gammainc
-from scipy.stats import norm
+from lois_fiabilite import LOIS, evaluer_lois
+from grille_temps import grille_adaptative
+from fiabilite_systeme import (indexer_sites, fiabilite_sites_serie, importance_serie_sites,
+                               importance_format_long, lire_structure, construire_structures,
+                               contient_attente, importance_structure, segments, COLONNES_STRUCTURE)
+from simulation_systeme import fiabilite_sites_structure
+from instrumentation import demarrer_rapport, etape
+from stockage import (charger_table, exporter_excel, sauver_table, TABLE_RESUME, TABLE_R_COMPOSANTS,
+                      TABLE_R_SITES, TABLE_IMPORTANCE, TABLE_STRUCTURE)
 
 # ==============================
 # 0. Paramètres globaux
 # ==============================
 
-# Plage de temps
-t_min = 0
-t_max = 10000
-n_points = 200
-temps = np.linspace(t_min, t_max, n_points)
+# Plage de temps : grille adaptative commune à toutes les sorties (grille_temps),
+# construite plus bas à partir des lois ajustées
 
-# Variation pour la dérivée numérique
-delta = 1e-4
+# Export Excel en fin de traitement (les courbes restent dans le stockage Parquet)
+EXPORT_EXCEL = True
+CHEMIN_EXPORT = "Fiabilite_Sites_Composants.xlsx"
 
-# Chemin du fichier des meilleures lois
-fichier_lois = r"C:\Users\COMPUTER\Validation_Lois_Fiabilite.xlsx"
+# Structure des sites (blocs série, parallèle, k-sur-n, attente) : xlsx (feuille
+# "Structure") ou csv, colonnes Site, Bloc, Type, k, Elements ; None = tous en série
+FICHIER_STRUCTURE = None
 
-# ==============================
-# 1. Fonctions R(t)
-# ==============================
-
-def R_weibull_2p(t, alpha, beta):
-    return np.exp(-(t / alpha) ** beta)
-
-def R_weibull_3p(t, alpha, beta, gamma):
-    t_adj = np.maximum(t - gamma, 0)
-    return np.exp(-(t_adj / alpha) ** beta)
-
-def R_gamma(t, k, theta):
-    return 1 - gammainc(k, t / theta)
-
-def R_lognormale(t, mu_ln, sigma_ln):
-    with np.errstate(divide='ignore'):
-        return 1 - norm.cdf((np.log(t) - mu_ln) / sigma_ln)
-
-def R_gumbel(t, mu, beta):
-    # Corrige beta trop petit ou nul
-    beta = max(beta, 1e-6)
-    z = -(t - mu) / beta
-    z = np.clip(z, -700, 700)  # éviter overflow dans exp()
-    return np.exp(-np.exp(z))
-
-def R_exponentielle(t, lambda_):
-    return np.exp(-lambda_ * t)
-
-# ==============================
-# 2. Lecture des données
-# ==============================
-
-df_lois = pd.read_excel(fichier_lois, sheet_name="Résumé Meilleure Loi")
+# Monte Carlo des sites à redondance en attente : trajectoires, graine, processus
+N_SIMULATIONS = 1_000_000
+GRAINE_SIMULATION = 12345
+N_WORKERS = None
 
 # ==============================
-# 3. Fiabilités des composants
+# 1. Fonctions R(t)
 # ==============================
 
-resultats = []
-fiabilites_composants = {}
+# Les R(t) de toutes les lois sont évaluées par le registre commun (lois_fiabilite)
 
-for (site, composant), row in df_lois.groupby(["Site", "Composant"]):
-    loi = row["Loi"].values[0]
+if __name__ == "__main__":
 
-    try:
-        if loi == "Weibull 2P":
-            alpha = row["alpha"].values[0]
-            beta = row["beta"].values[0]
-            R_t = R_weibull_2p(temps, alpha, beta)
+    # Rapport d'exécution (durées des étapes)
+    demarrer_rapport("Base_fiabilite")
 
-        elif loi == "Weibull 3P":
-            alpha = row["alpha"].values[0]
-            beta = row["beta"].values[0]
-            gamma_ = row["gamma"].values[0]
-            R_t = R_weibull_3p(temps, alpha, beta, gamma_)
+    # ==============================
+    # 2. Lecture des données
+    # ==============================
 
-        elif loi == "Gamma":
-            k = row["k"].values[0]
-            theta = row["theta"].values[0]
-            R_t = R_gamma(temps, k, theta)
+    with etape("lecture"):
+        df_lois = charger_table(TABLE_RESUME)
 
-        elif loi == "Lognormale":
-            mu_ln = row["mu_ln"].values[0]
-            sigma_ln = row["sigma_ln"].values[0]
-            R_t = R_lognormale(temps, mu_ln, sigma_ln)
+    # ==============================
+    # 3. Fiabilités des composants
+    # ==============================
 
-        elif loi == "Gumbel":
-            mu = row["mu_gumbel"].values[0]
-            beta = row["beta_gumbel"].values[0]
-            R_t = R_gumbel(temps, mu, beta)
+    with etape("composants"):
+        resultats = []
+        fiabilites_composants = {}
 
-        elif loi == "Exponentielle":
-            lambda_ = row["lambda_"].values[0]
-            R_t = R_exponentielle(temps, lambda_)
+        # Un composant par couple (site, composant), dans l'ordre du groupby d'origine
+        df_composants = (df_lois.sort_values(["Site", "Composant"], kind="stable")
+                         .drop_duplicates(["Site", "Composant"]))
 
-        else:
+        for loi in df_composants.loc[~df_composants["Loi"].isin(LOIS), "Loi"]:
             print(f"[Info] Loi non supportée : {loi}")
-            continue
-
-        label = f"{site} | {composant}"
-        fiabilites_composants[label] = R_t
-
-    except Exception as e:
-        print(f"[Erreur] {site} - {composant} - {loi} : {e}")
-
-# ==============================
-# 4. Fiabilités des sites
-# ==============================
-
-fiabilites_sites = {}
-sites = df_lois["Site"].unique()
-
-for site in sites:
-    composants_site = [key for key in fiabilites_composants if key.startswith(site)]
-    R_site = np.ones_like(temps)
-    for comp in composants_site:
-        R_site *= fiabilites_composants[comp]
-    fiabilites_sites[site] = R_site
-
-# ==============================
-# 5. Facteurs d’importance
-# ==============================
-
-facteurs_importance = []
-
-for site in sites:
-    composants_site = [key for key in fiabilites_composants if key.startswith(site)]
-    R0 = fiabilites_sites[site]
-
-    for comp in composants_site:
-        R_i = fiabilites_composants[comp]
-
-        # Perturbation numérique
-        R_plus = {k: (v if k != comp else np.clip(v + delta, 0, 1)) for k, v in fiabilites_composants.items()}
-        R_minus = {k: (v if k != comp else np.clip(v - delta, 0, 1)) for k, v in fiabilites_composants.items()}
-
-        R_site_plus = np.ones_like(temps)
-        R_site_minus = np.ones_like(temps)
-
-        for k in composants_site:
-            R_site_plus *= R_plus[k]
-            R_site_minus *= R_minus[k]
-
-        importance = (R_site_plus - R_site_minus) / (2 * delta)
-
-        for t, val in zip(temps, importance):
-            facteurs_importance.append({
-                "Site": site,
-                "Composant": comp.split(" | ")[1],
-                "Temps": t,
-                "Importance_Marginale": val
+        df_composants = df_composants[df_composants["Loi"].isin(LOIS)]
+
+        # Points concentrés dans la chute des R(t), de R = 0.999 à R = 0.001
+        temps = grille_adaptative(df_composants)
+
+        # Évaluation groupée par loi : hasards cumulés H = -log R (n_composants × n_points)
+        H_composants = evaluer_lois(df_composants, temps, fonctions=("H",))["H"]
+
+        for (site, composant), H_t in zip(zip(df_composants["Site"], df_composants["Composant"]), H_composants):
+            R_t = np.exp(-H_t)
+            label = f"{site} | {composant}"
+            fiabilites_composants[label] = R_t
+
+    # ==============================
+    # 4. Fiabilités des sites
+    # ==============================
+
+    with etape("sites"):
+        # Index site -> composants : segments contigus de la matrice H_composants
+        ordre, sites_index, debuts = indexer_sites(df_composants["Site"])
+        H_composants = H_composants[ordre]
+        sites_composants = df_composants["Site"].to_numpy()[ordre]
+        composants_index = df_composants["Composant"].to_numpy()[ordre]
+
+        fiabilites_sites = {}
+        sites = df_lois["Site"].unique()
+        # Système en série : somme des hasards, R(t) = exp(-H) une seule fois par site
+        R_sites = dict(zip(sites_index, fiabilite_sites_serie(H_composants, debuts)))
+
+        # Sites structurés : forme analytique (série, parallèle, k-sur-n) ou Monte
+        # Carlo dès qu'une redondance en attente est présente
+        df_structure = (lire_structure(FICHIER_STRUCTURE) if FICHIER_STRUCTURE
+                        else pd.DataFrame(columns=COLONNES_STRUCTURE))
+        structures, erreurs = construire_structures(df_structure, sites_composants, composants_index, debuts)
+        for site, message in erreurs:
+            print(f"[Erreur] Structure du site {site} : {message} (site traité en série)")
+        R_structures = fiabilite_sites_structure(structures, df_composants.iloc[ordre], np.exp(-H_composants),
+                                                 debuts, temps, n_simulations=N_SIMULATIONS,
+                                                 graine=GRAINE_SIMULATION, n_workers=N_WORKERS)
+        for site, (R_t, methode) in R_structures.items():
+            R_sites[site] = R_t
+            print(f"[Info] Site {site} : structure évaluée par {methode}")
+
+        for site in sites:
+            # Un site sans composant supporté garde R(t) = 1
+            fiabilites_sites[site] = R_sites.get(site, np.ones_like(temps))
+
+    # ==============================
+    # 5. Facteurs d’importance
+    # ==============================
+
+    with etape("importance"):
+        # Importance marginale (Birnbaum), critique, RAW et RRW : forme analytique du
+        # système série, calculée en espace log segment par segment sur l'index des sites
+        mesures = importance_serie_sites(H_composants, debuts)
+
+        # Sites structurés : R_i fixé à 1 puis à 0 dans la forme analytique ; pas de
+        # forme analytique pour une redondance en attente (NaN)
+        for debut, fin in segments(debuts, len(H_composants)):
+            bloc = structures.get(sites_composants[debut])
+            if bloc is None:
+                continue
+            if contient_attente(bloc):
+                for m in mesures.values():
+                    m[debut:fin] = np.nan
+            else:
+                for nom, m in importance_structure(bloc, np.exp(-H_composants[debut:fin])).items():
+                    mesures[nom][debut:fin] = m
+        df_importance = importance_format_long(sites_composants, composants_index, temps, mesures)
+
+    # ==============================
+    # 6. Stockage et export Excel
+    # ==============================
+
+    with etape("stockage"):
+        df_fiabilite_comps = pd.DataFrame({
+            "Temps": temps,
+            **{k: v for k, v in fiabilites_composants.items()}
+        })
+
+        df_fiabilite_sites = pd.DataFrame({
+            "Temps": temps,
+            **{k: v for k, v in fiabilites_sites.items()}
+        })
+
+        sauver_table(TABLE_R_COMPOSANTS, df_fiabilite_comps)
+        sauver_table(TABLE_R_SITES, df_fiabilite_sites)
+        sauver_table(TABLE_IMPORTANCE, df_importance)
+        sauver_table(TABLE_STRUCTURE, df_structure)
+
+    with etape("export excel"):
+        if EXPORT_EXCEL:
+            exporter_excel(CHEMIN_EXPORT, {
+                "R_composants": df_fiabilite_comps,
+                "R_sites": df_fiabilite_sites,
+                "Importance": df_importance,
             })
-
-# ==============================
-# 6. Export Excel
-# ==============================
-
-df_fiabilite_comps = pd.DataFrame({
-    "Temps": temps,
-    **{k: v for k, v in fiabilites_composants.items()}
-})
-
-df_fiabilite_sites = pd.DataFrame({
-    "Temps": temps,
-    **{k: v for k, v in fiabilites_sites.items()}
-})
-
-df_importance = pd.DataFrame(facteurs_importance)
-
-chemin_export = r"C:\Users\COMPUTER\Fiabilite_Sites_Composants.xlsx"
-
-with pd.ExcelWriter(chemin_export, engine="openpyxl") as writer:
-    df_fiabilite_comps.to_excel(writer, sheet_name="R_composants", index=False)
-    df_fiabilite_sites.to_excel(writer, sheet_name="R_sites", index=False)
-    df_importance.to_excel(writer, sheet_name="Importance", index=False)
-
-print(f"✅ Export terminé : {chemin_export}")
+            print(f"✅ Export terminé : {CHEMIN_EXPORT}")
+        else:
+            print("✅ Courbes enregistrées dans le stockage")
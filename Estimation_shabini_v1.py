@@ -1,95 +1,99 @@
 import pandas as pd
 import numpy as np
-from scipy.stats import gamma, lognorm
-from scipy.special import gamma as gamma_func
-from reliability.Fitters import Fit_Weibull_2P, Fit_Weibull_3P
-
-# Charger les données
-df = pd.read_excel(r"C:\Users\COMPUTER\Documents\TFC\FINALY\DONNEES TTR ET TBF 2.xlsx",sheet_name="Données TTR")
-# Nettoyage des noms de colonnes (Solution 2)
-df.columns = df.columns.str.strip().str.replace(r'[^a-zA-Z0-9]', '', regex=True)
-# Colonnes du DataFrame final (14 colonnes sans MTBF)
-colonnes_resultats = [
-    "Site", "Composant", "Loi", "Méthode",
-    "alpha", "beta", "gamma",        # Weibull
-    "k", "theta",                    # Gamma
-    "mu_ln", "sigma_ln",             # Lognormale
-    "mu_gumbel", "beta_gumbel",      # Gumbel
-    "lambda_"                        # Exponentielle
-]
-
-# Liste des résultats
-resultats = []
-
-# Boucle sur chaque groupe Site-Composant
-for (site, composant), groupe in df.groupby(["Site", "Composant"]):
-    tbf = groupe["TBF"].dropna().values
-    if len(tbf) < 3:
-        continue
-
-    try:
-        mean = np.mean(tbf)
-        std = np.std(tbf, ddof=1)
-
-        ### WEIBULL 2P - Moments ###
-        def weibull_moments(data):
-            def objective(beta):
-                alpha = mean / gamma_func(1 + 1 / beta)
-                return (alpha ** 2 * (gamma_func(1 + 2 / beta) - gamma_func(1 + 1 / beta) ** 2) - std ** 2) ** 2
-            beta_grid = np.linspace(0.5, 10, 1000)
-            beta_best = beta_grid[np.argmin([objective(b) for b in beta_grid])]
-            alpha_best = mean / gamma_func(1 + 1 / beta_best)
-            return alpha_best, beta_best
-
-        alpha_mom, beta_mom = weibull_moments(tbf)
-        resultats.append([site, composant, "Weibull 2P", "Moments",
-                          alpha_mom, beta_mom, "", "", "", "", "", "", "", ""])
-
-        ### WEIBULL 2P - MLE ###
-        fit_mle = Fit_Weibull_2P(failures=tbf, method='MLE', show_probability_plot=False, print_results=False)
-        resultats.append([site, composant, "Weibull 2P", "MLE",
-                          fit_mle.alpha, fit_mle.beta, "", "", "", "", "", "", "", ""])
-
-        ### WEIBULL 2P - Régression ###
-        fit_ls = Fit_Weibull_2P(failures=tbf, method='LS', show_probability_plot=False, print_results=False)
-        resultats.append([site, composant, "Weibull 2P", "Régression",
-                          fit_ls.alpha, fit_ls.beta, "", "", "", "", "", "", "", ""])
-
-        ### WEIBULL 3P - Itération ###
-        fit_3p = Fit_Weibull_3P(failures=tbf, method='MLE', show_probability_plot=False, print_results=False)
-        resultats.append([site, composant, "Weibull 3P", "Itération",
-                          fit_3p.alpha, fit_3p.beta, fit_3p.gamma, "", "", "", "", "", ""])
-
-        ### GAMMA ###
-        k_hat = mean ** 2 / std ** 2
-        theta_hat = std ** 2 / mean
-        resultats.append([site, composant, "Gamma", "Moments",
-                          "", "", "", k_hat, theta_hat, "", "", "", "", ""])
-
-        ### LOGNORMALE ###
-        logs = np.log(tbf)
-        mu_ln = np.mean(logs)
-        sigma_ln = np.std(logs, ddof=1)
-        resultats.append([site, composant, "Lognormale", "Moments",
-                          "", "", "", "", "", mu_ln, sigma_ln, "", "", ""])
-
-        ### GUMBEL ###
-        beta_gumbel = std * np.sqrt(6) / np.pi
-        mu_gumbel = mean - 0.5772 * beta_gumbel
-        resultats.append([site, composant, "Gumbel", "Moments",
-                          "", "", "", "", "", "", "", mu_gumbel, beta_gumbel, ""])
-
-        ### EXPONENTIELLE ###
-        lambda_hat = 1 / mean
-        resultats.append([site, composant, "Exponentielle", "MLE",
-                          "", "", "", "", "", "", "", "", "", lambda_hat])
-
-    except Exception as e:
-        print(f"[Erreur] {site} - {composant} : {e}")
-
-# Création du DataFrame
-df_resultats = pd.DataFrame(resultats, columns=colonnes_resultats)
-
-# Export vers Excel
-df_resultats.to_excel("Parametres_Fiabilite_Sans_MTBF.xlsx", index=False)
-print("✅ Résultats exportés vers Parametres_Fiabilite_Sans_MTBF.xlsx")
+from estimateurs import colonnes_resultats, ajuster_stock, ESTIMATEUR_VERSION
+from stockage import sauver_table, source_donnees, TABLE_PARAMETRES
+from stockage_tbf import paquets_tbf
+from instrumentation import demarrer_rapport, etape
+from cache_estimation import (empreinte_groupe, charger_cache, fusionner, sauver_cache,
+                              TABLE_CACHE_PARAMETRES)
+
+# Source des TBF (xlsx, csv ou parquet), lue par blocs dans un TBFStore
+# (tampon unique, relu en mémoire projetée tant que la source ne change pas) ;
+# la variable d'environnement FIABILITE_SOURCE la remplace
+SOURCE_TBF = source_donnees(r"C:\Users\COMPUTER\Documents\TFC\FINALY\DONNEES TTR ET TBF 2.xlsx")
+# Source triée par (Site, Composant) : à mettre à True pour que chaque paquet
+# de groupes soit ajusté pendant la lecture de la suite. Avec False (source
+# quelconque, par défaut), les groupes ne sont complets qu'en fin de lecture
+# et l'ajustement ne recouvre pas la lecture. Même valeur que dans
+# validation_lois_fiabilite : le stock des TBF dépend du mode de lecture.
+DONNEES_TRIEES = False
+
+# Parallélisme : nombre de processus (None = tous les cœurs, 1 = série)
+# et nombre de groupes envoyés à chaque processus par lot
+N_WORKERS = None
+TAILLE_LOT = 4
+
+# Export Excel en fin de traitement (les étapes suivantes lisent le Parquet)
+EXPORT_EXCEL = True
+
+# Réestimation incrémentale : seuls les groupes nouveaux ou modifiés sont réajustés
+INCREMENTAL = True
+
+# Note sur le moteur Weibull natif (estimateurs.MOTEUR_WEIBULL) : une ligne
+# "Weibull 3P" avec gamma = 0 est l'ajustement 2P. C'est le cas si gamma < 0.01,
+# mais aussi lorsque le profil en gamma ne culmine que contre min(TBF) (beta < 1,
+# petits échantillons) : reliability peut alors donner une vraisemblance plus
+# haute (voir ajustement_weibull). Avec 3 paramètres comptés dans l'AIC et le
+# BIC, une telle ligne est classée après la Weibull 2P MLE identique.
+
+if __name__ == "__main__":
+    # Rapport d'exécution (durées des étapes, échecs par loi, ajustements les plus lents)
+    demarrer_rapport("Estimation_shabini_v1")
+
+    with etape("lecture"):
+        cache = charger_cache(TABLE_CACHE_PARAMETRES)
+        if not INCREMENTAL:
+            cache = cache.iloc[0:0]
+        connues = set(cache["Empreinte"])
+
+    # Groupes Site-Composant retenus (au moins 3 TBF), TBF déjà triés par
+    # groupe, par paquets : chaque paquet est ajusté dès qu'il est lu
+    empreintes, morceaux, echecs, n_ajustes = [], [], set(), 0
+    # (stockage_tbf.TAILLE_PAQUET groupes : la mémoire de travail de
+    # l'ajustement est bornée par un paquet)
+    for paquet in paquets_tbf(SOURCE_TBF, sheet_name="Données TTR", triees=DONNEES_TRIEES):
+        paquet = paquet.filtrer(3)
+
+        # Empreinte de chaque groupe (TBF triés + version des estimateurs) :
+        # seuls les groupes inconnus du cache sont réajustés
+        with etape("empreintes"):
+            empreintes_paquet = [empreinte_groupe(site, composant, tbf, ESTIMATEUR_VERSION)
+                                 for site, composant, tbf in paquet]
+            a_ajuster = [i for i, e in enumerate(empreintes_paquet) if e not in connues]
+        empreintes += empreintes_paquet
+        n_ajustes += len(a_ajuster)
+        if not a_ajuster:
+            continue
+
+        # Paramètres des groupes réajustés : formes fermées en lot pour tous les
+        # groupes du paquet, puis ajustements Weibull itératifs répartis sur le pool
+        with etape("ajustement"):
+            nouvelles, erreurs = ajuster_stock(paquet, a_ajuster, n_workers=N_WORKERS, taille_lot=TAILLE_LOT)
+            nouvelles.insert(0, "Empreinte",
+                             np.asarray(empreintes_paquet, dtype=object)[nouvelles.pop("Groupe").to_numpy()])
+            morceaux.append(nouvelles)
+            for i, site, composant, erreur in erreurs:
+                echecs.add(empreintes_paquet[i])
+                print(f"[Erreur] {site} - {composant} : {erreur}")
+
+    print(f"Groupes réajustés : {n_ajustes} / {len(empreintes)}")
+    nouvelles = (pd.concat(morceaux, ignore_index=True) if morceaux
+                 else pd.DataFrame(columns=["Empreinte"] + colonnes_resultats))
+
+    # Création du DataFrame : lignes en cache + lignes réajustées, dans l'ordre des groupes
+    with etape("stockage"):
+        df_resultats, cache = fusionner(empreintes, cache, nouvelles, colonnes_resultats)
+
+        # Les groupes en échec ne sont pas mis en cache : ils seront retentés
+        sauver_cache(TABLE_CACHE_PARAMETRES, cache[~cache["Empreinte"].isin(echecs)])
+
+        # Stockage typé pour les étapes suivantes
+        sauver_table(TABLE_PARAMETRES, df_resultats)
+
+    # Export vers Excel
+    with etape("export excel"):
+        if EXPORT_EXCEL:
+            df_resultats.to_excel("Parametres_Fiabilite_Sans_MTBF.xlsx", index=False)
+            print("✅ Résultats exportés vers Parametres_Fiabilite_Sans_MTBF.xlsx")
+        else:
+            print(f"✅ Résultats enregistrés dans le stockage ({TABLE_PARAMETRES})")
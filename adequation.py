@@ -0,0 +1,191 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy.stats import kstwo
+
+from estimateurs import reajuster_lot
+from instrumentation import compter, noter_ajustement
+from lois_fiabilite import LOIS, distribution_scipy, evaluer_lois, hasard_cumule
+from noyaux import MOTEUR, sommes_adequation
+
+# Borne des logarithmes : une probabilité nulle (point hors du support de la
+# loi) donne une statistique très grande mais finie, jamais NaN
+LOG_MIN = np.log(np.finfo(float).tiny)
+
+
+# ==============================
+# 1. Statistiques d'adéquation (matrice lois × observations triées)
+# ==============================
+
+def statistiques_adequation(log_F, log_S):
+    """KS, Anderson-Darling et Cramér-von Mises pour plusieurs lois à la fois.
+
+    `log_F` et `log_S` sont les matrices (n_lois × n) de log F(x_(i)) et
+    log R(x_(i)) évaluées sur l'échantillon trié. Les paramètres sont ceux
+    fournis (aucun réajustement). Renvoie un dict de vecteurs de longueur
+    n_lois : KS_Stat, KS_pval, AD_Stat, CvM_Stat. Les sommes passent par le
+    noyau compilé quand le moteur est numba (noyaux).
+    """
+    n = log_F.shape[1]
+    if MOTEUR == "numba":
+        ks, ad, cvm = sommes_adequation(log_F, log_S, LOG_MIN)
+    else:
+        log_F = np.maximum(log_F, LOG_MIN)
+        log_S = np.maximum(log_S, LOG_MIN)
+        i = np.arange(1, n + 1)
+        F = np.exp(log_F)
+
+        # Kolmogorov-Smirnov bilatéral
+        d_plus = np.max(i / n - F, axis=1)
+        d_moins = np.max(F - (i - 1) / n, axis=1)
+        ks = np.maximum(d_plus, d_moins)
+
+        # Anderson-Darling : A² = -n - (1/n) Σ (2i - 1) [ln F(x_i) + ln R(x_{n+1-i})]
+        ad = -n - np.sum((2 * i - 1) * (log_F + log_S[:, ::-1]), axis=1) / n
+
+        # Cramér-von Mises : W² = 1/(12n) + Σ (F(x_i) - (2i - 1)/(2n))²
+        cvm = 1 / (12 * n) + np.sum((F - (2 * i - 1) / (2 * n)) ** 2, axis=1)
+
+    return {
+        "KS_Stat": ks,
+        "KS_pval": kstwo.sf(ks, n),
+        "AD_Stat": ad,
+        "CvM_Stat": cvm,
+    }
+
+
+def criteres_information(log_f, n_parametres):
+    """Log-vraisemblance, AIC et BIC de plusieurs lois ajustées au même échantillon.
+
+    `log_f` est la matrice (n_lois × n) de log f(x_i) et `n_parametres` le
+    nombre de paramètres de chaque loi (Series, index conservé). AIC et BIC
+    sont à minimiser ; une observation hors du support donne +inf.
+    """
+    n = log_f.shape[1]
+    log_vraisemblance = np.sum(log_f, axis=1)
+    p = n_parametres.to_numpy(dtype=float)
+    return pd.DataFrame({
+        "LogL": log_vraisemblance,
+        "AIC": 2 * p - 2 * log_vraisemblance,
+        "BIC": p * np.log(n) - 2 * log_vraisemblance,
+    }, index=n_parametres.index)
+
+
+# ==============================
+# 2. Tests d'un groupe Site-Composant
+# ==============================
+
+def tester_groupe(tbf, df_lois, trie=False):
+    """Teste toutes les lois candidates d'un groupe en une passe.
+
+    `df_lois` contient une ligne par (Loi, Méthode) avec ses paramètres ; les
+    lois absentes du registre sont ignorées. Les TBF sont triés une seule
+    fois (aucune fois si `trie`, par exemple pour une vue de TBFStore) et
+    toutes les fonctions de répartition sont évaluées comme une matrice, avec
+    log f pour la log-vraisemblance, l'AIC et le BIC (criteres_information).
+    Renvoie (tests, x_trie, F) : un DataFrame aligné sur les lignes
+    retenues de `df_lois` (index conservé), l'échantillon trié et la matrice
+    F(x_(i)) utile aux PP-plots.
+    """
+    x_trie = np.asarray(tbf, dtype=float)
+    if not trie:
+        x_trie = np.sort(x_trie)
+    df_lois = df_lois[df_lois["Loi"].isin(LOIS)]
+
+    # H = -log R ; log F = log(1 - exp(-H)) calculé sans perte près de 0
+    # Grille propre au groupe : rien à réutiliser, pas de cache
+    courbes = evaluer_lois(df_lois, x_trie, fonctions=("H", "logf"), cache=False)
+    H = courbes["H"]
+    with np.errstate(divide='ignore'):
+        log_F = np.log(-np.expm1(-H))
+
+    tests = pd.DataFrame(statistiques_adequation(log_F, -H), index=df_lois.index)
+    tests = tests.join(criteres_information(courbes["logf"], df_lois["Loi"].map(lambda loi: len(LOIS[loi].colonnes))))
+    return tests, x_trie, np.exp(log_F)
+
+
+# ==============================
+# 3. Bootstrap paramétrique (paramètres estimés sur les données)
+# ==============================
+# Les p-valeurs KS classiques supposent des paramètres connus a priori ; ici
+# ils sont estimés sur les mêmes TBF (problème de Lilliefors). La loi nulle de
+# KS/AD est donc reconstruite en tirant B échantillons de la loi ajustée et en
+# les réajustant avec la même méthode que l'estimation.
+
+def _statistiques_lignes(loi, params, x_trie):
+    H = hasard_cumule(loi, params, x_trie)
+    with np.errstate(divide='ignore'):
+        log_F = np.log(-np.expm1(-H))
+    return statistiques_adequation(log_F, -H)
+
+
+def bootstrap_pvaleurs(loi, methode, params, tbf, n_replicats=200, graine=None):
+    """p-valeurs bootstrap de KS et AD pour une loi ajustée sur `tbf`.
+
+    Les B échantillons sont tirés en une seule matrice (B × n), triés ligne à
+    ligne, réajustés par estimateurs.reajuster_lot puis testés contre leurs
+    propres paramètres. Les réplicats dont l'ajustement échoue sont ignorés.
+    Renvoie (p_ks, p_ad).
+    """
+    rng = np.random.default_rng(graine)
+    params = np.asarray(params, dtype=float)
+    x_trie = np.sort(np.asarray(tbf, dtype=float))[None, :]
+    observe = _statistiques_lignes(loi, params, x_trie)
+
+    X = np.sort(distribution_scipy(loi, params).rvs(size=(n_replicats, x_trie.shape[1]), random_state=rng), axis=1)
+    P = reajuster_lot(loi, methode, X)
+    valides = np.isfinite(P).all(axis=1)
+    if not valides.any():
+        return np.nan, np.nan
+    nul = _statistiques_lignes(loi, P[valides], X[valides])
+
+    n_valides = valides.sum()
+    p_ks = (1 + np.sum(nul["KS_Stat"] >= observe["KS_Stat"][0])) / (1 + n_valides)
+    p_ad = (1 + np.sum(nul["AD_Stat"] >= observe["AD_Stat"][0])) / (1 + n_valides)
+    return p_ks, p_ad
+
+
+def _bootstrap_tache(args):
+    # Renvoie ((p_ks, p_ad), durée) : la durée va au rapport du processus principal
+    loi, methode, params, tbf, n_replicats, graine = args
+    debut = time.perf_counter()
+    try:
+        pvaleurs = bootstrap_pvaleurs(loi, methode, params, tbf, n_replicats, graine)
+    except Exception as e:
+        print(f"[Erreur] bootstrap {loi} ({methode}) : {e}")
+        pvaleurs = np.nan, np.nan
+    return pvaleurs, time.perf_counter() - debut
+
+
+def bootstrap_taches(taches, n_replicats=200, graine=0, n_workers=None, taille_lot=1, cles=None, groupes=None):
+    """Bootstrap d'une liste de tâches (loi, méthode, params, tbf).
+
+    Chaque tâche reçoit son propre flux aléatoire dérivé de `graine`
+    (SeedSequence.spawn) : le résultat ne dépend ni du nombre de processus ni
+    de l'ordre d'exécution. Avec `cles` (un entier par tâche), le flux est
+    dérivé de (graine, clé) et ne dépend plus de la position de la tâche.
+    Les tâches sont réparties sur un pool de `n_workers` processus (tous les
+    cœurs si None, série si 1). `groupes` donne le (site, composant) de
+    chaque tâche pour le rapport d'exécution (durée des réajustements, échecs
+    par loi). Renvoie la liste des (p_ks, p_ad) dans l'ordre des tâches.
+    """
+    if cles is None:
+        graines = np.random.SeedSequence(graine).spawn(len(taches))
+    else:
+        graines = [np.random.SeedSequence([graine, cle]) for cle in cles]
+    args = [(loi, methode, params, tbf, n_replicats, g)
+            for (loi, methode, params, tbf), g in zip(taches, graines)]
+
+    if n_workers == 1 or len(args) <= 1:
+        sorties = list(map(_bootstrap_tache, args))
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers) as pool:
+            sorties = list(pool.map(_bootstrap_tache, args, chunksize=max(1, taille_lot)))
+
+    groupes = [("", "")] * len(taches) if groupes is None else groupes
+    for (loi, methode, _, _), (site, composant), (pvaleurs, duree) in zip(taches, groupes, sorties):
+        noter_ajustement(site, composant, loi, methode, duree, origine="bootstrap")
+        compter("echecs_bootstrap", f"{loi} ({methode})", int(np.isnan(pvaleurs).any()))
+    return [pvaleurs for pvaleurs, _ in sorties]
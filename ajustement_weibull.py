@@ -0,0 +1,287 @@
+import numpy as np
+from scipy.special import gammaln
+
+from noyaux import MOTEUR, sommes_puissances
+from stockage_tbf import sommes_segments
+
+# ==============================
+# Ajustements Weibull vectorisés sur toute la flotte
+# ==============================
+# Les TBF de tous les groupes arrivent sous la forme d'un TBFStore :
+# `valeurs` (triées dans chaque groupe) et `offsets` (le groupe i occupe
+# valeurs[offsets[i]:offsets[i+1]]). Chaque itération de Newton traite tous
+# les groupes à la fois par réductions de segment ; un groupe qui ne converge
+# pas (données dégénérées, TBF <= 0) reçoit NaN et peut être repris par
+# reliability (voir estimateurs.ajuster_stock).
+#
+# Mêmes conventions que reliability.Fitters :
+# - 2P MLE : maximum de vraisemblance exact (équation de profil en beta)
+# - 2P LS  : régression sur rangs médians (i - 0.3) / (n + 0.4), RRX et RRY,
+#            en gardant celle dont |log-vraisemblance| est la plus petite
+# - 3P MLE : gamma dans [0, min(TBF) - 1e-4], remplacé par l'ajustement 2P
+#            (gamma = 0) lorsque gamma < 0.01
+#
+# Écart connu en 3P : si le profil en gamma décroît depuis gamma = 0 et ne
+# remonte que contre la borne min(TBF) (beta < 1, petits échantillons), le
+# moteur natif garde gamma = 0 (ajustement 2P) alors que l'optimiseur de
+# reliability peut suivre la borne jusqu'à une log-vraisemblance plus haute.
+# La méthode des moments (table CV -> beta) est ici aussi, pour le registre
+# des lois (lois_fiabilite).
+
+# Constante de Menon : beta ≈ π / (√6 · écart-type des log)
+_MENON = np.pi / np.sqrt(6)
+
+# Décalage minimal de gamma sous le plus petit TBF (borne de reliability)
+ECART_GAMMA = 1e-4
+
+# Positions relatives de gamma dans [0, gamma_max] explorées avant l'affinage :
+# régulières, puis resserrées près de la borne où le profil peut culminer
+_GRILLE_GAMMA = np.concatenate([np.linspace(0, 0.9, 10), 1 - np.geomspace(0.05, 1e-9, 12), [1.0]])
+
+
+def _index_groupes(offsets):
+    n = np.diff(offsets)
+    return n, np.repeat(np.arange(len(n)), n)
+
+
+def _maximums_segments(x, offsets):
+    n = np.diff(offsets)
+    if len(x) == 0:
+        return np.full(len(n), np.nan)
+    maximums = np.maximum.reduceat(x, np.minimum(offsets[:-1], len(x) - 1))
+    return np.where(n > 0, maximums, np.nan)
+
+
+# ==============================
+# 1. Log-vraisemblance
+# ==============================
+
+def log_vraisemblance_weibull(valeurs, offsets, alpha, beta, gamma=0.0):
+    """Log-vraisemblance Weibull de chaque groupe pour ses propres paramètres."""
+    n, g = _index_groupes(offsets)
+    gamma = np.broadcast_to(np.asarray(gamma, dtype=float), n.shape)
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        z = np.log(valeurs - gamma[g]) - np.log(alpha)[g]
+        b = beta[g]
+        termes = np.log(b) - np.log(alpha)[g] + (b - 1) * z - np.exp(b * z)
+    return sommes_segments(termes, offsets)
+
+
+# ==============================
+# 2. Weibull 2P - maximum de vraisemblance
+# ==============================
+
+def weibull_2p_mle_lot(valeurs, offsets, tol=1e-10, max_iter=100, pas=None):
+    """(alpha, beta) du maximum de vraisemblance Weibull 2P de chaque groupe.
+
+    beta est la racine de l'équation de profil
+        Σ x^β ln x / Σ x^β - 1/β - moyenne(ln x) = 0,
+    strictement croissante en β, résolue par Newton pour tous les groupes à
+    la fois, avec repli par bissection si un pas sort de l'encadrement. Les
+    log sont centrés par groupe et les puissances normalisées par leur
+    maximum : aucun dépassement, quelle que soit l'échelle des TBF.
+    Si `pas` est un tableau d'entiers (un par groupe), il est incrémenté du
+    nombre de pas de Newton de chaque groupe.
+    """
+    valeurs = np.asarray(valeurs, dtype=float)
+    offsets = np.asarray(offsets, dtype=np.int64)
+    n, g = _index_groupes(offsets)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        L = np.log(valeurs)
+        mu = sommes_segments(L, offsets) / n
+        Lc = L - mu[g]
+        Lmax = _maximums_segments(Lc, offsets)
+        beta = _MENON / np.sqrt(sommes_segments(Lc ** 2, offsets) / (n - 1))
+    beta = np.where(np.isfinite(beta) & (beta > 0) & np.isfinite(Lmax), beta, np.nan)
+
+    def sommes(beta):
+        if MOTEUR == "numba":
+            return sommes_puissances(Lc, Lmax, beta, offsets)
+        w = np.exp(beta[g] * (Lc - Lmax[g]))
+        return sommes_segments(w, offsets), sommes_segments(w * Lc, offsets), sommes_segments(w * Lc ** 2, offsets)
+
+    bas = np.zeros_like(beta)
+    haut = np.full_like(beta, np.inf)
+    converge = ~np.isfinite(beta)
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        for _ in range(max_iter):
+            A, B, C = sommes(beta)
+            m1 = B / A
+            fonction = m1 - 1 / beta
+            derivee = C / A - m1 ** 2 + 1 / beta ** 2
+
+            bas = np.where(fonction < 0, beta, bas)
+            haut = np.where(fonction >= 0, beta, haut)
+            nouveau = beta - fonction / derivee
+            milieu = np.where(np.isfinite(haut), np.where(bas > 0, np.sqrt(bas * haut), haut / 2), 2 * beta)
+            nouveau = np.where((nouveau > bas) & (nouveau < haut), nouveau, milieu)
+
+            if pas is not None:
+                pas += ~converge
+            converge |= np.abs(nouveau - beta) <= tol * beta
+            beta = np.where(converge, beta, nouveau)
+            if converge.all():
+                break
+
+        beta = np.where(converge, beta, np.nan)
+        A = sommes(beta)[0]
+        # α = (Σ x^β / n)^(1/β), recomposé depuis les log centrés
+        alpha = np.exp(mu + (np.log(A / n) + beta * Lmax) / beta)
+    return alpha, beta
+
+
+# ==============================
+# 3. Weibull 2P - régression sur rangs médians
+# ==============================
+
+def weibull_2p_ls_lot(valeurs, offsets):
+    """(alpha, beta) par régression de rang (RRX ou RRY) de chaque groupe.
+
+    Les TBF doivent être triés dans chaque groupe. Les deux régressions sont
+    calculées par sommes de segment ; la retenue est celle dont la valeur
+    absolue de la log-vraisemblance est la plus petite (choix de reliability).
+    """
+    valeurs = np.asarray(valeurs, dtype=float)
+    offsets = np.asarray(offsets, dtype=np.int64)
+    n, g = _index_groupes(offsets)
+
+    rang = np.arange(len(valeurs)) - offsets[:-1][g] + 1
+    F = (rang - 0.3) / (n[g] + 0.4)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        x = np.log(valeurs)
+        y = np.log(-np.log1p(-F))
+        x_moy = sommes_segments(x, offsets) / n
+        y_moy = sommes_segments(y, offsets) / n
+        xc, yc = x - x_moy[g], y - y_moy[g]
+        sxy = sommes_segments(xc * yc, offsets)
+        sxx = sommes_segments(xc ** 2, offsets)
+        syy = sommes_segments(yc ** 2, offsets)
+
+        # RRY : y = β x + c ; RRX : x = y / β + c_x
+        beta_rry = sxy / sxx
+        beta_rrx = syy / sxy
+        alpha_rry = np.exp(x_moy - y_moy / beta_rry)
+        alpha_rrx = np.exp(x_moy - y_moy / beta_rrx)
+
+        ll_rrx = log_vraisemblance_weibull(valeurs, offsets, alpha_rrx, beta_rrx)
+        ll_rry = log_vraisemblance_weibull(valeurs, offsets, alpha_rry, beta_rry)
+    rrx = np.abs(ll_rrx) < np.abs(ll_rry)
+    return np.where(rrx, alpha_rrx, alpha_rry), np.where(rrx, beta_rrx, beta_rry)
+
+
+# ==============================
+# 4. Weibull 3P - vraisemblance profilée en gamma
+# ==============================
+
+def weibull_3p_mle_lot(valeurs, offsets, iterations=40, pas=None):
+    """(alpha, beta, gamma) du maximum de vraisemblance Weibull 3P de chaque groupe.
+
+    Pour gamma fixé, (alpha, beta) est l'ajustement 2P MLE de x - gamma : la
+    vraisemblance profilée est évaluée sur une grille de gamma dans
+    [0, min(TBF) - 1e-4] pour tous les groupes, puis affinée par section dorée
+    autour du meilleur point. Les TBF doivent être triés dans chaque groupe.
+    Si gamma < 0.01, l'ajustement 2P est renvoyé avec gamma = 0 ; c'est
+    aussi le cas lorsque gamma = 0 est un maximum local du profil et que
+    celui-ci ne remonte qu'à l'approche de min(TBF) : le point de bord n'est
+    retenu que sans aucun maximum local, et la ligne "3P" vaut alors la 2P
+    (reliability peut y trouver une log-vraisemblance plus haute). `pas`
+    cumule les pas de Newton de tous les ajustements 2P du profil (voir
+    weibull_2p_mle_lot).
+    """
+    valeurs = np.asarray(valeurs, dtype=float)
+    offsets = np.asarray(offsets, dtype=np.int64)
+    n, g = _index_groupes(offsets)
+    t_min = valeurs[np.minimum(offsets[:-1], max(len(valeurs) - 1, 0))] if len(valeurs) else np.zeros(len(n))
+    gamma_max = np.maximum(0.0, t_min - ECART_GAMMA)
+
+    def profil(q):
+        gamma = q * gamma_max
+        x = valeurs - gamma[g]
+        alpha, beta = weibull_2p_mle_lot(x, offsets, pas=pas)
+        return log_vraisemblance_weibull(x, offsets, alpha, beta), alpha, beta
+
+    # Grille grossière. Lorsque beta < 1, la vraisemblance croît sans borne
+    # quand gamma approche min(TBF) : comme l'optimiseur local de reliability,
+    # on retient le meilleur maximum local intérieur, et la borne seulement si
+    # le profil y monte sans maximum intérieur.
+    ll_grille = np.column_stack([profil(np.full(len(n), q))[0] for q in _GRILLE_GAMMA])
+    ll_grille = np.where(np.isnan(ll_grille), -np.inf, ll_grille)
+    precedent = np.column_stack([np.full(len(n), -np.inf), ll_grille[:, :-1]])
+    suivant = np.column_stack([ll_grille[:, 1:], np.full(len(n), -np.inf)])
+    local = (ll_grille >= precedent) & (ll_grille >= suivant) & np.isfinite(ll_grille)
+    local[:, -1] = False
+    candidats = np.where(local, ll_grille, -np.inf)
+    meilleur = np.where(local.any(axis=1), np.argmax(candidats, axis=1), len(_GRILLE_GAMMA) - 1)
+    bas = _GRILLE_GAMMA[np.maximum(meilleur - 1, 0)]
+    haut = _GRILLE_GAMMA[np.minimum(meilleur + 1, len(_GRILLE_GAMMA) - 1)]
+
+    # Section dorée sur q (gamma = q · gamma_max), tous les groupes ensemble
+    r = (np.sqrt(5) - 1) / 2
+    c, d = haut - r * (haut - bas), bas + r * (haut - bas)
+    ll_c, ll_d = profil(c)[0], profil(d)[0]
+    for _ in range(iterations):
+        # Maximum dans [bas, d] si ll(c) >= ll(d), sinon dans [c, haut]
+        gauche = np.nan_to_num(ll_c, nan=-np.inf) >= np.nan_to_num(ll_d, nan=-np.inf)
+        haut = np.where(gauche, d, haut)
+        bas = np.where(gauche, bas, c)
+        nouveau = np.where(gauche, haut - r * (haut - bas), bas + r * (haut - bas))
+        ll_nouveau = profil(nouveau)[0]
+        c, d, ll_c, ll_d = (np.where(gauche, nouveau, d), np.where(gauche, c, nouveau),
+                            np.where(gauche, ll_nouveau, ll_d), np.where(gauche, ll_c, ll_nouveau))
+
+    # Meilleur point entre l'affinage et la grille (le profil peut être plat)
+    q_fin = np.where(np.nan_to_num(ll_c, nan=-np.inf) >= np.nan_to_num(ll_d, nan=-np.inf), c, d)
+    ll_fin, alpha, beta = profil(q_fin)
+    q_grille = _GRILLE_GAMMA[meilleur]
+    grille_meilleure = ll_grille[np.arange(len(n)), meilleur] > np.nan_to_num(ll_fin, nan=-np.inf)
+    if grille_meilleure.any():
+        _, alpha_g, beta_g = profil(np.where(grille_meilleure, q_grille, q_fin))
+        alpha = np.where(grille_meilleure, alpha_g, alpha)
+        beta = np.where(grille_meilleure, beta_g, beta)
+        q_fin = np.where(grille_meilleure, q_grille, q_fin)
+    gamma = q_fin * gamma_max
+    gamma = np.where(np.isfinite(alpha) & np.isfinite(beta), gamma, np.nan)
+
+    # gamma quasi nul : ajustement 2P (comme reliability)
+    petit = gamma < 0.01
+    if petit.any():
+        alpha_2p, beta_2p = weibull_2p_mle_lot(valeurs, offsets, pas=pas)
+        alpha = np.where(petit, alpha_2p, alpha)
+        beta = np.where(petit, beta_2p, beta)
+        gamma = np.where(petit, 0.0, gamma)
+    return alpha, beta, gamma
+
+
+# ==============================
+# 5. Weibull 2P - moments (table CV -> beta)
+# ==============================
+
+# Bornes identiques à l'ancienne grille np.linspace(0.5, 10, 1000)
+BETA_MIN = 0.5
+BETA_MAX = 10.0
+
+# Table dense en log(beta) : l'erreur d'interpolation sur beta reste < 1e-6,
+# contre un demi-pas (~0.005) pour l'ancienne recherche sur grille.
+_BETA_TABLE = np.geomspace(BETA_MIN, BETA_MAX, 20001)
+
+# ln(1 + CV²) = ln Γ(1 + 2/β) - 2 ln Γ(1 + 1/β), strictement décroissante en β
+_LOG_CV2_TABLE = gammaln(1 + 2 / _BETA_TABLE) - 2 * gammaln(1 + 1 / _BETA_TABLE)
+
+
+def weibull_moments_lot(moyennes, ecarts_types):
+    """Estime (alpha, beta) par la méthode des moments pour tous les groupes.
+
+    Résout l'équation du coefficient de variation sur beta par interpolation
+    dans une table pré-calculée ; beta est borné à [0.5, 10] comme l'ancienne
+    grille. Renvoie deux tableaux float64 de même forme que les entrées.
+    """
+    moyennes = np.asarray(moyennes, dtype=float)
+    ecarts_types = np.asarray(ecarts_types, dtype=float)
+
+    log_cv2 = np.log1p((ecarts_types / moyennes) ** 2)
+    # np.interp exige des abscisses croissantes : on parcourt la table à l'envers
+    beta = np.interp(log_cv2, _LOG_CV2_TABLE[::-1], _BETA_TABLE[::-1])
+    beta = np.where(np.isfinite(log_cv2), beta, np.nan)
+    alpha = moyennes / np.exp(gammaln(1 + 1 / beta))
+    return alpha, beta
@@ -0,0 +1,341 @@
+import argparse
+import json
+import os
+import platform
+import runpy
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from fiabilite import ETAPES as PIPELINE
+from lois_fiabilite import LOIS
+from noyaux import MOTEUR
+from stockage import DOSSIER_STOCKAGE, VARIABLE_SOURCE, charger_table, TABLE_PARAMETRES
+
+# ==============================
+# 0. Paramètres du benchmark
+# ==============================
+# Une flotte synthétique (sites × composants × défaillances) est tirée de lois
+# connues, écrite comme le classeur "Données TTR", puis chaque script du
+# pipeline est lancé tel quel dans un processus séparé, dans un dossier de
+# travail vierge (FIABILITE_SOURCE pointe sur les données synthétiques).
+# Pour chaque étape : durée, pic de mémoire (processus principal et pool),
+# code de retour et rapport d'exécution du script (instrumentation). Les paramètres estimés sont ensuite comparés aux vrais ;
+# tout est écrit en JSON pour comparer deux exécutions (--reference).
+
+N_SITES = 10
+N_COMPOSANTS = 20
+N_DEFAILLANCES = 50
+GRAINE = 2024
+FORMAT_DONNEES = "csv"
+PLOTS = "best"
+SORTIE = "benchmark_fiabilite.json"
+
+DOSSIER_SCRIPTS = os.path.dirname(os.path.abspath(__file__))
+
+# (étape, script, arguments), dans l'ordre du pipeline (fiabilite.ETAPES) ;
+# lancées l'une après l'autre, sans le cache du pipeline, pour les mesurer
+ETAPES = [(nom, etape.script, list(etape.arguments)) for nom, etape in PIPELINE.items()]
+
+# Lois de la flotte synthétique : plage des vrais paramètres (tirés
+# uniformément, dans l'ordre des colonnes du registre) et méthode d'estimation
+# dont on contrôle la récupération
+LOIS_SYNTHETIQUES = {
+    "Weibull 2P": ([(100, 2000), (0.8, 3.0)], "MLE"),
+    "Exponentielle": ([(1 / 2000, 1 / 100)], "MLE"),
+    "Lognormale": ([(4.5, 7.5), (0.3, 1.0)], "Moments"),
+    "Gamma": ([(1.0, 5.0), (50, 500)], "Moments"),
+    "Gumbel": ([(500, 2000), (50, 120)], "Moments"),
+}
+
+# Écart-type relatif asymptotique de chaque paramètre estimé, en fonction des
+# vrais paramètres et du nombre n de défaillances : information de Fisher
+# pour le MLE, méthode delta pour les moments (vérifiés par simulation à
+# n = 30, 50 et 200)
+ECARTS_TYPES_RELATIFS = {
+    ("Weibull 2P", "MLE"): lambda alpha, beta, n: (1.053 / (beta * np.sqrt(n)), 0.780 / np.sqrt(n)),
+    ("Exponentielle", "MLE"): lambda lambda_, n: (1 / np.sqrt(n),),
+    ("Lognormale", "Moments"): lambda mu_ln, sigma_ln, n: (sigma_ln / (np.abs(mu_ln) * np.sqrt(n)),
+                                                          1 / np.sqrt(2 * n)),
+    ("Gamma", "Moments"): lambda k, theta, n: (np.sqrt(2 * (k + 1) / (k * n)), np.sqrt((2 * k + 3) / (k * n))),
+    ("Gumbel", "Moments"): lambda mu, beta, n: (1.081 * beta / (mu * np.sqrt(n)), np.sqrt(1.1 / n)),
+}
+
+# Récupération acceptée si la médiane de |erreur relative| / écart-type
+# relatif reste sous TOLERANCE_RECUPERATION (≈ 0.67 pour un estimateur
+# conforme) ; sans écart-type connu, si l'erreur relative médiane reste sous
+# SEUIL_RELATIF
+TOLERANCE_RECUPERATION = 1.2
+SEUIL_RELATIF = 0.15
+
+
+# ==============================
+# 1. Flotte synthétique
+# ==============================
+
+def generer_flotte(n_sites, n_composants, n_defaillances, lois=LOIS_SYNTHETIQUES, graine=GRAINE):
+    """Données TBF/TTR d'une flotte synthétique et table des vrais paramètres.
+
+    Chaque composant reçoit une loi de `lois` (à tour de rôle) et des
+    paramètres tirés dans ses plages ; ses `n_defaillances` TBF sont tirés par
+    inversion (ppf du registre) et ses TTR d'une lognormale. Renvoie
+    (df_donnees, df_verite) : colonnes Site, Composant, TBF, TTR (minutes),
+    et une ligne par composant avec Loi, Méthode et les vrais paramètres.
+    """
+    rng = np.random.default_rng(graine)
+    noms_lois = list(lois)
+    donnees, verite = [], []
+    for s in range(n_sites):
+        for c in range(n_composants):
+            site, composant = f"Site{s + 1:03d}", f"Comp {c:03d}"
+            loi = noms_lois[(s * n_composants + c) % len(noms_lois)]
+            plages, methode = lois[loi]
+            params = [rng.uniform(bas, haut) for bas, haut in plages]
+            tbf = np.maximum(LOIS[loi].ppf(rng.random(n_defaillances), *params), 1e-3)
+            ttr = rng.lognormal(np.log(60), 0.6, n_defaillances)
+            donnees.append(pd.DataFrame({"Site": site, "Composant": composant, "TBF": tbf, "TTR (minutes)": ttr}))
+            verite.append({"Site": site, "Composant": composant, "Loi": loi, "Méthode": methode,
+                           **dict(zip(LOIS[loi].colonnes, params))})
+    return pd.concat(donnees, ignore_index=True), pd.DataFrame(verite)
+
+
+def ecrire_donnees(df, dossier, format_donnees=FORMAT_DONNEES):
+    """Écrit les données synthétiques (xlsx : feuille "Données TTR", csv ou parquet) ; renvoie le chemin."""
+    chemin = os.path.join(dossier, f"donnees_synthetiques.{format_donnees}")
+    if format_donnees == "xlsx":
+        df.to_excel(chemin, sheet_name="Données TTR", index=False)
+    elif format_donnees == "csv":
+        df.to_csv(chemin, index=False)
+    elif format_donnees == "parquet":
+        df.to_parquet(chemin, index=False)
+    else:
+        raise ValueError(f"Format non supporté : {format_donnees}")
+    return chemin
+
+
+# ==============================
+# 2. Exécution et mesure des étapes
+# ==============================
+
+def memoire_max_mib():
+    """Pic de mémoire résidente (Mio) du processus courant et de ses enfants terminés.
+
+    Renvoie (processus, enfants) ; None si la mesure n'est pas disponible
+    (module resource sous Unix, psutil sous Windows).
+    """
+    try:
+        import resource
+    except ImportError:
+        try:
+            import psutil
+            return psutil.Process().memory_info().peak_wset / 2 ** 20, None
+        except (ImportError, AttributeError):
+            return None, None
+    # ru_maxrss : Kio sous Linux, octets sous macOS
+    unite = 2 ** 20 if sys.platform == "darwin" else 2 ** 10
+    return (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / unite,
+            resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / unite)
+
+
+def _executer_script(script, arguments, chemin_mesure):
+    """Point d'entrée du processus d'une étape : lance le script puis écrit son pic de mémoire."""
+    sys.argv = [script] + list(arguments)
+    try:
+        runpy.run_path(script, run_name="__main__")
+    finally:
+        processus, enfants = memoire_max_mib()
+        with open(chemin_mesure, "w", encoding="utf-8") as f:
+            json.dump({"memoire_max_mib": processus, "memoire_max_pool_mib": enfants}, f)
+
+
+def executer_etape(etape, script, arguments, dossier, source):
+    """Lance un script du pipeline dans `dossier` ; renvoie la mesure de l'étape."""
+    chemin_mesure = os.path.join(dossier, f"mesure_{etape}.json")
+    environnement = dict(os.environ, MPLBACKEND="Agg", PYTHONWARNINGS="ignore")
+    environnement[VARIABLE_SOURCE] = source
+    commande = [sys.executable, os.path.abspath(__file__), "--executer", os.path.join(DOSSIER_SCRIPTS, script),
+                chemin_mesure, "--", *arguments]
+
+    debut = time.perf_counter()
+    processus = subprocess.run(commande, cwd=dossier, env=environnement, capture_output=True, text=True,
+                               encoding="utf-8", errors="replace")
+    duree = time.perf_counter() - debut
+
+    mesure = {"etape": etape, "script": script, "duree_s": round(duree, 3), "code_retour": processus.returncode,
+              "memoire_max_mib": None, "memoire_max_pool_mib": None, "erreur": None}
+    if os.path.exists(chemin_mesure):
+        with open(chemin_mesure, encoding="utf-8") as f:
+            mesure.update(json.load(f))
+    # Rapport d'exécution écrit par le script (durées des étapes internes, échecs)
+    chemin_rapport = os.path.join(dossier, f"rapport_{os.path.splitext(script)[0]}.json")
+    if os.path.exists(chemin_rapport):
+        with open(chemin_rapport, encoding="utf-8") as f:
+            mesure["rapport"] = json.load(f)
+    if processus.returncode != 0:
+        mesure["erreur"] = "\n".join(processus.stderr.strip().splitlines()[-5:])
+    return mesure
+
+
+# ==============================
+# 3. Récupération des paramètres
+# ==============================
+
+def verifier_recuperation(df_verite, df_parametres, n_defaillances, tolerance=TOLERANCE_RECUPERATION):
+    """Compare les paramètres estimés aux vrais, par loi et par paramètre.
+
+    Pour chaque composant, la ligne (Loi, Méthode) de sa loi génératrice est
+    cherchée dans `df_parametres`. L'erreur relative de chaque composant est
+    rapportée à l'écart-type relatif attendu (ECARTS_TYPES_RELATIFS). Renvoie
+    une liste de dicts : erreurs relatives médiane et au 90e centile, écart
+    réduit médian, échecs d'ajustement (NaN ou ligne absente), seuil et
+    verdict `ok`.
+    """
+    cles = ["Site", "Composant", "Loi", "Méthode"]
+    fusion = df_verite.merge(df_parametres, on=cles, how="left", suffixes=("_vrai", ""))
+    controles = []
+    for (loi, methode), groupe in fusion.groupby(["Loi", "Méthode"], sort=False):
+        colonnes = LOIS[loi].colonnes
+        vrais = [groupe[f"{colonne}_vrai"].to_numpy(dtype=float) for colonne in colonnes]
+        ecarts_types = ECARTS_TYPES_RELATIFS.get((loi, methode))
+        ecarts_types = ecarts_types(*vrais, n_defaillances) if ecarts_types else [None] * len(colonnes)
+        for colonne, vrai, ecart_type in zip(colonnes, vrais, ecarts_types):
+            erreur = np.abs(groupe[colonne].to_numpy(dtype=float) / vrai - 1)
+            valides = np.isfinite(erreur)
+            if not valides.any():
+                mediane = p90 = ecart_reduit = None
+            else:
+                mediane = float(np.median(erreur[valides]))
+                p90 = float(np.quantile(erreur[valides], 0.9))
+                ecart_reduit = (float(np.median((erreur / ecart_type)[valides])) if ecart_type is not None
+                                else None)
+            critere, seuil = (ecart_reduit, tolerance) if ecart_type is not None else (mediane, SEUIL_RELATIF)
+            controles.append({
+                "loi": loi, "methode": methode, "parametre": colonne,
+                "n_composants": int(len(groupe)), "n_echecs": int((~valides).sum()),
+                "erreur_mediane": mediane, "erreur_p90": p90, "ecart_reduit_median": ecart_reduit,
+                "seuil": float(seuil),
+                "ok": bool(valides.all() and critere <= seuil),
+            })
+    return controles
+
+
+# ==============================
+# 4. Comparaison avec une exécution de référence
+# ==============================
+
+def comparer(resultats, reference):
+    """Affiche la durée de chaque étape face à celle d'un JSON de référence."""
+    durees_ref = {m["etape"]: m["duree_s"] for m in reference.get("etapes", [])}
+    print(f"{'Étape':<14}{'Référence (s)':>15}{'Actuel (s)':>12}{'Rapport':>10}")
+    for mesure in resultats["etapes"]:
+        ref = durees_ref.get(mesure["etape"])
+        rapport = f"{mesure['duree_s'] / ref:.2f}" if ref else "-"
+        print(f"{mesure['etape']:<14}{ref if ref is not None else '-':>15}{mesure['duree_s']:>12}{rapport:>10}")
+
+
+# ==============================
+# 5. Benchmark complet
+# ==============================
+
+def lancer_benchmark(n_sites=N_SITES, n_composants=N_COMPOSANTS, n_defaillances=N_DEFAILLANCES, graine=GRAINE,
+                     format_donnees=FORMAT_DONNEES, plots=PLOTS, etapes=None, dossier=None):
+    """Génère la flotte, lance les étapes demandées et contrôle les paramètres estimés.
+
+    `etapes` : noms parmi ETAPES (toutes si None ; l'ordre du pipeline est
+    conservé et chaque étape lit les tables des précédentes). Le dossier de
+    travail est temporaire si `dossier` est None. Renvoie le dict des
+    résultats (configuration, environnement, étapes, récupération).
+    """
+    temporaire = dossier is None
+    dossier = tempfile.mkdtemp(prefix="benchmark_fiabilite_") if temporaire else os.path.abspath(dossier)
+    os.makedirs(dossier, exist_ok=True)
+    try:
+        debut = time.perf_counter()
+        df_donnees, df_verite = generer_flotte(n_sites, n_composants, n_defaillances, graine=graine)
+        source = ecrire_donnees(df_donnees, dossier, format_donnees)
+        duree_generation = time.perf_counter() - debut
+
+        mesures = []
+        for etape, script, arguments in ETAPES:
+            if etapes is not None and etape not in etapes:
+                continue
+            mesure = executer_etape(etape, script, [a.format(plots=plots) for a in arguments], dossier, source)
+            mesures.append(mesure)
+            print(f"[Info] {etape:<13} {mesure['duree_s']:>8.2f} s  "
+                  f"{mesure['memoire_max_mib'] or float('nan'):>8.1f} Mio")
+            if mesure["erreur"]:
+                print(f"[Erreur] {etape} ({script}) :\n{mesure['erreur']}")
+
+        recuperation = []
+        if any(m["etape"] == "estimation" and m["code_retour"] == 0 for m in mesures):
+            df_parametres = charger_table(TABLE_PARAMETRES, os.path.join(dossier, DOSSIER_STOCKAGE))
+            recuperation = verifier_recuperation(df_verite, df_parametres, n_defaillances)
+    finally:
+        if temporaire:
+            shutil.rmtree(dossier, ignore_errors=True)
+
+    return {
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "configuration": {"n_sites": n_sites, "n_composants": n_composants, "n_defaillances": n_defaillances,
+                          "n_lignes": int(len(df_donnees)), "graine": graine, "format": format_donnees,
+                          "plots": plots},
+        "environnement": {"python": platform.python_version(), "numpy": np.__version__, "pandas": pd.__version__,
+                          "plateforme": platform.platform(), "processeurs": os.cpu_count(), "noyaux": MOTEUR},
+        "generation_s": round(duree_generation, 3),
+        "etapes": mesures,
+        "total_s": round(sum(m["duree_s"] for m in mesures), 3),
+        "recuperation": recuperation,
+    }
+
+
+if __name__ == "__main__":
+    # Processus d'une étape (voir executer_etape)
+    if len(sys.argv) > 1 and sys.argv[1] == "--executer":
+        _executer_script(sys.argv[2], sys.argv[5:], sys.argv[3])
+        sys.exit(0)
+
+    parser = argparse.ArgumentParser(description="Benchmark du pipeline de fiabilité sur une flotte synthétique")
+    parser.add_argument("--sites", type=int, default=N_SITES, help="nombre de sites (défaut : %(default)s)")
+    parser.add_argument("--composants", type=int, default=N_COMPOSANTS,
+                        help="composants par site (défaut : %(default)s)")
+    parser.add_argument("--defaillances", type=int, default=N_DEFAILLANCES,
+                        help="défaillances par composant (défaut : %(default)s)")
+    parser.add_argument("--graine", type=int, default=GRAINE, help="graine aléatoire (défaut : %(default)s)")
+    parser.add_argument("--format", choices=["xlsx", "csv", "parquet"], default=FORMAT_DONNEES,
+                        help="format des données synthétiques (défaut : %(default)s)")
+    parser.add_argument("--plots", choices=["none", "best", "all"], default=PLOTS,
+                        help="graphes QQ/PP de la validation (défaut : %(default)s)")
+    parser.add_argument("--etapes", nargs="+", choices=[e for e, _, _ in ETAPES],
+                        help="étapes à lancer (défaut : toutes)")
+    parser.add_argument("--dossier", help="dossier de travail conservé (défaut : temporaire)")
+    parser.add_argument("--sortie", default=SORTIE, help="fichier JSON des résultats (défaut : %(default)s)")
+    parser.add_argument("--reference", help="JSON d'une exécution précédente à comparer")
+    args = parser.parse_args()
+
+    resultats = lancer_benchmark(args.sites, args.composants, args.defaillances, args.graine, args.format,
+                                 args.plots, args.etapes, args.dossier)
+    with open(args.sortie, "w", encoding="utf-8") as f:
+        json.dump(resultats, f, ensure_ascii=False, indent=2)
+
+    for controle in resultats["recuperation"]:
+        if not controle["ok"]:
+            print(f"[Erreur] Récupération {controle['loi']} ({controle['methode']}) {controle['parametre']} : "
+                  f"erreur médiane {controle['erreur_mediane']}, écart réduit médian "
+                  f"{controle['ecart_reduit_median']}, seuil {controle['seuil']:.4f}, "
+                  f"{controle['n_echecs']} échec(s)")
+    if args.reference:
+        with open(args.reference, encoding="utf-8") as f:
+            comparer(resultats, json.load(f))
+
+    echecs = [m for m in resultats["etapes"] if m["code_retour"] != 0]
+    echecs += [c for c in resultats["recuperation"] if not c["ok"]]
+    if echecs:
+        print(f"[Erreur] {len(echecs)} étape(s) ou contrôle(s) en échec ; résultats dans '{args.sortie}'")
+        sys.exit(1)
+    print(f"✅ Benchmark terminé en {resultats['total_s']:.1f} s ; résultats dans '{args.sortie}'")
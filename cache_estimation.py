@@ -0,0 +1,99 @@
+import hashlib
+import os
+
+import numpy as np
+import pandas as pd
+
+from lois_fiabilite import colonnes_parametres
+from stockage import DOSSIER_STOCKAGE, charger_table, sauver_table, typer_colonnes
+
+# ==============================
+# 0. Tables du cache
+# ==============================
+
+# Lignes de paramètres (une colonne par paramètre du registre des lois) et
+# de tests, par empreinte de groupe
+TABLE_CACHE_PARAMETRES = "cache_parametres"
+TABLE_CACHE_VALIDATION = "cache_validation"
+
+
+# ==============================
+# 1. Empreintes
+# ==============================
+
+def empreinte_groupe(site, composant, tbf, version):
+    """Empreinte d'un groupe Site-Composant.
+
+    Hachage SHA-256 de (site, composant, version de l'estimateur) et des TBF
+    triés en float64 : elle ne change que si les données du groupe ou la
+    méthode d'estimation changent, quel que soit l'ordre des lignes.
+    """
+    h = hashlib.sha256()
+    h.update(repr((str(site), str(composant), str(version))).encode("utf-8"))
+    h.update(np.sort(np.asarray(tbf, dtype=np.float64)).tobytes())
+    return h.hexdigest()
+
+
+def empreinte_parametres(param_group):
+    """Empreinte des lignes de paramètres d'un groupe (Loi, Méthode et paramètres).
+
+    Indépendante de l'ordre des lignes ; change dès qu'un paramètre change
+    (réajustement de reprise, mise à jour d'une bibliothèque, édition de la table).
+    """
+    colonnes = [c for c in colonnes_parametres() if c in param_group.columns]
+    lignes = param_group.sort_values(["Loi", "Méthode"], kind="stable")
+    valeurs = lignes[colonnes].to_numpy(dtype=np.float64)
+    h = hashlib.sha256()
+    h.update(repr((colonnes, list(zip(lignes["Loi"].astype(str), lignes["Méthode"].astype(str))))).encode("utf-8"))
+    # NaN ramenés à une seule représentation binaire
+    h.update(np.where(np.isnan(valeurs), np.nan, valeurs).tobytes())
+    return h.hexdigest()
+
+
+def empreinte_derivee(empreinte, *elements):
+    """Empreinte dérivée (configuration de validation, loi, méthode...)."""
+    return hashlib.sha256(repr((empreinte,) + elements).encode("utf-8")).hexdigest()
+
+
+def graine_empreinte(empreinte):
+    """Entier de 64 bits tiré d'une empreinte (graine aléatoire reproductible)."""
+    return int(empreinte[:16], 16)
+
+
+# ==============================
+# 2. Lecture / écriture
+# ==============================
+
+def charger_cache(nom, dossier=DOSSIER_STOCKAGE):
+    """Table de cache (colonne "Empreinte" + lignes), vide si absente."""
+    if not os.path.exists(os.path.join(dossier, f"{nom}.parquet")):
+        return pd.DataFrame(columns=["Empreinte"])
+    return charger_table(nom, dossier)
+
+
+def fusionner(empreintes, cache, nouvelles, colonnes):
+    """Assemble la table finale dans l'ordre des groupes.
+
+    `empreintes` donne l'ordre des groupes, `cache` les lignes réutilisées et
+    `nouvelles` (DataFrame avec colonne "Empreinte") les lignes recalculées ;
+    l'ordre des lignes à l'intérieur d'un groupe est conservé. Renvoie
+    (table, cache_a_jour) : la table sans colonne Empreinte, et les lignes à
+    garder en cache (groupes courants seulement).
+    """
+    rang = pd.Series(np.arange(len(empreintes)), index=pd.Index(empreintes))
+    rang = rang[~rang.index.duplicated()]
+
+    reutilisees = cache[cache["Empreinte"].isin(rang.index)]
+    morceaux = [typer_colonnes(t[["Empreinte"] + colonnes]) for t in (reutilisees, nouvelles) if len(t)]
+    if not morceaux:
+        vide = pd.DataFrame(columns=["Empreinte"] + colonnes)
+        return vide[colonnes], vide
+
+    toutes = pd.concat(morceaux, ignore_index=True)
+    ordre = np.argsort(rang.reindex(toutes["Empreinte"]).to_numpy(), kind="stable")
+    toutes = toutes.iloc[ordre].reset_index(drop=True)
+    return toutes[colonnes], toutes
+
+
+def sauver_cache(nom, df, dossier=DOSSIER_STOCKAGE):
+    return sauver_table(nom, df, dossier)
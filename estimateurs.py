@@ -0,0 +1,308 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import compter, etape, noter_ajustement, noter_iterations
+from lois_fiabilite import LOIS, colonnes_parametres
+
+# Moteur des ajustements Weibull itératifs (2P MLE, 2P Régression, 3P) :
+# "natif" (ajustement_weibull, vectorisé sur toute la flotte) ou
+# "reliability" (reliability.Fitters, un appel par groupe, pour validation)
+MOTEUR_WEIBULL = "natif"
+
+# Version des estimateurs : à incrémenter dès qu'une méthode d'ajustement
+# change, pour invalider les paramètres mis en cache (cache_estimation)
+ESTIMATEUR_VERSION = f"3-{MOTEUR_WEIBULL}"
+
+# Ajustements itératifs repris par reliability (moteur "reliability", ou
+# groupes non résolus par le moteur natif)
+AJUSTEMENTS_ITERATIFS = [("Weibull 2P", "MLE"), ("Weibull 2P", "Régression"), ("Weibull 3P", "Itération")]
+
+# Estimateurs natifs résolus par itérations (Newton), dont le nombre de pas
+# par groupe alimente les ajustements les plus lents du rapport d'exécution
+ESTIMATEURS_ITERES = [("Weibull 2P", "MLE"), ("Weibull 3P", "Itération")]
+
+
+# ==============================
+# 1. Lignes et colonnes de la table des paramètres (registre des lois)
+# ==============================
+
+# Ordre des lignes d'un groupe : (Loi, Méthode, colonnes de paramètres),
+# dans l'ordre d'enregistrement des lois et de leurs estimateurs
+LIGNES_GROUPE = [(loi, methode, famille.colonnes)
+                 for loi, famille in LOIS.items() for methode in famille.estimateurs]
+
+# Colonnes du DataFrame final : clés, puis paramètres dans l'ordre d'apparition
+COLONNES_PARAMETRES = colonnes_parametres()
+colonnes_resultats = ["Site", "Composant", "Loi", "Méthode"] + COLONNES_PARAMETRES
+
+
+# ==============================
+# 2. Estimateurs du registre (toute la flotte en lot)
+# ==============================
+
+def estimer_lot(stock, sauf=(), travail=None):
+    """Applique tous les estimateurs du registre aux groupes d'un TBFStore.
+
+    Chaque estimateur traite tous les groupes en une fois (réductions de
+    segment du stock). Les couples (loi, méthode) de `sauf` sont omis.
+    Renvoie {(loi, méthode): matrice (n_groupes × p)} dans l'ordre des
+    colonnes de la loi ; une estimation indéfinie vaut NaN ou inf. Si
+    `travail` est un dict, il reçoit pour chaque estimateur de
+    ESTIMATEURS_ITERES le couple (pas de Newton par groupe, durée du lot).
+    """
+    estimations = {}
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        for loi, methode, colonnes in LIGNES_GROUPE:
+            if (loi, methode) in sauf:
+                continue
+            estimateur = LOIS[loi].estimateurs[methode]
+            with etape(f"estimateur {loi} ({methode})"):
+                if travail is not None and (loi, methode) in ESTIMATEURS_ITERES:
+                    debut = time.perf_counter()
+                    pas = np.zeros(len(stock), dtype=np.int64)
+                    valeurs = estimateur(stock, pas=pas)
+                    travail[(loi, methode)] = pas, time.perf_counter() - debut
+                else:
+                    valeurs = estimateur(stock)
+            estimations[(loi, methode)] = np.asarray(valeurs, dtype=float).reshape(len(stock), len(colonnes))
+    return estimations
+
+
+def table_parametres(sites, composants, estimations):
+    """Table typée des paramètres, lignes dans l'ordre historique des groupes.
+
+    `estimations` associe à (loi, méthode) une matrice (n_groupes × p) ; une
+    ligne entièrement NaN (ajustement absent ou en échec) n'est pas produite.
+    Les colonnes de paramètres sont en float64, NaN hors de la loi de la
+    ligne. Une colonne "Groupe" donne la position du groupe dans `sites`.
+    """
+    n = len(sites)
+    morceaux = []
+    for rang, (loi, methode, colonnes) in enumerate(LIGNES_GROUPE):
+        valeurs = estimations.get((loi, methode))
+        if valeurs is None:
+            continue
+        valeurs = np.asarray(valeurs, dtype=float).reshape(n, len(colonnes))
+        presents = ~np.isnan(valeurs).all(axis=1)
+        bloc = {"Groupe": np.flatnonzero(presents), "_rang": rang}
+        bloc.update({c: valeurs[presents, j] for j, c in enumerate(colonnes)})
+        morceaux.append(pd.DataFrame(bloc))
+
+    table = pd.concat(morceaux, ignore_index=True) if morceaux else pd.DataFrame({"Groupe": [], "_rang": []})
+    table = table.sort_values(["Groupe", "_rang"], kind="stable").reset_index(drop=True)
+    rangs = table["_rang"].to_numpy(dtype=int)
+    groupes = table["Groupe"].to_numpy(dtype=np.int64)
+
+    resultat = pd.DataFrame({
+        "Groupe": groupes,
+        "Site": np.asarray(sites, dtype=object)[groupes],
+        "Composant": np.asarray(composants, dtype=object)[groupes],
+        "Loi": np.array([l for l, _, _ in LIGNES_GROUPE], dtype=object)[rangs],
+        "Méthode": np.array([m for _, m, _ in LIGNES_GROUPE], dtype=object)[rangs],
+    })
+    for c in COLONNES_PARAMETRES:
+        resultat[c] = table[c].to_numpy(dtype=float) if c in table else np.nan
+    return resultat
+
+
+# ==============================
+# 3. Ajustements itératifs (Weibull, par groupe)
+# ==============================
+
+def ajuster_groupe(site, composant, tbf, durees=None):
+    """Ajustements itératifs d'un groupe par reliability : Weibull 2P (MLE, Régression) et 3P.
+
+    Référence du moteur natif, et reprise des groupes qu'il ne résout pas. Renvoie (estimations, erreur) : un dict
+    {(loi, méthode): paramètres} des ajustements réussis et le message
+    d'erreur éventuel (les ajustements déjà faits sont conservés). Si
+    `durees` est un dict, il reçoit la durée de chaque ajustement tenté.
+    """
+    # Import différé : reliability n'est chargé que s'il sert
+    from reliability.Fitters import Fit_Weibull_2P, Fit_Weibull_3P
+
+    estimations = {}
+    durees = {} if durees is None else durees
+    debut = time.perf_counter()
+
+    try:
+        ### WEIBULL 2P - MLE ###
+        fit_mle = Fit_Weibull_2P(failures=tbf, method='MLE', show_probability_plot=False, print_results=False)
+        estimations[("Weibull 2P", "MLE")] = (fit_mle.alpha, fit_mle.beta)
+        durees[("Weibull 2P", "MLE")], debut = time.perf_counter() - debut, time.perf_counter()
+
+        ### WEIBULL 2P - Régression ###
+        fit_ls = Fit_Weibull_2P(failures=tbf, method='LS', show_probability_plot=False, print_results=False)
+        estimations[("Weibull 2P", "Régression")] = (fit_ls.alpha, fit_ls.beta)
+        durees[("Weibull 2P", "Régression")], debut = time.perf_counter() - debut, time.perf_counter()
+
+        ### WEIBULL 3P - Itération ###
+        fit_3p = Fit_Weibull_3P(failures=tbf, method='MLE', show_probability_plot=False, print_results=False)
+        estimations[("Weibull 3P", "Itération")] = (fit_3p.alpha, fit_3p.beta, fit_3p.gamma)
+        durees[("Weibull 3P", "Itération")] = time.perf_counter() - debut
+
+    except Exception as e:
+        # Durée de l'ajustement en échec
+        durees[next(cle for cle in AJUSTEMENTS_ITERATIFS if cle not in durees)] = time.perf_counter() - debut
+        return estimations, str(e)
+
+    return estimations, None
+
+
+def _ajuster_groupe_args(args):
+    # Les durées reviennent avec le résultat : le rapport est tenu par le processus principal
+    durees = {}
+    estimations, erreur = ajuster_groupe(*args, durees=durees)
+    return estimations, erreur, durees
+
+
+# ==============================
+# 4. Ajustement de toute la flotte (pool de processus)
+# ==============================
+
+def ajuster_stock(stock, indices=None, n_workers=None, taille_lot=4, moteur=None):
+    """Ajuste les groupes `indices` d'un TBFStore (tous si None).
+
+    Tous les estimateurs du registre des lois sont appliqués en lot
+    (estimer_lot) ; les ajustements Weibull itératifs passent par le moteur
+    `moteur` (MOTEUR_WEIBULL si None). Les appels à reliability (moteur "reliability", ou groupes non
+    résolus par le moteur natif) sont répartis par lots de `taille_lot` sur
+    `n_workers` processus (tous les cœurs si None, série si 1). Un groupe en
+    échec n'interrompt pas les autres.
+
+    Renvoie (table, erreurs) : la table typée de table_parametres, où
+    "Groupe" est l'indice du groupe dans le stock, et la liste des
+    (groupe, site, composant, message) des groupes en échec.
+    """
+    indices = np.arange(len(stock)) if indices is None else np.asarray(indices, dtype=np.int64)
+    cles = [stock.cle(i) for i in indices]
+    sites = [site for site, _ in cles]
+    composants = [composant for _, composant in cles]
+
+    # Moteur natif : tous les groupes en lot ; ceux qu'il ne résout pas (NaN)
+    # sont repris par reliability, qui en donne aussi la cause
+    moteur = MOTEUR_WEIBULL if moteur is None else moteur
+    if moteur not in ("natif", "reliability"):
+        raise ValueError(f"Moteur Weibull inconnu : {moteur}")
+    selection = stock.selection(indices)
+    travail = {}
+    estimations = estimer_lot(selection, sauf=AJUSTEMENTS_ITERATIFS if moteur == "reliability" else (),
+                              travail=travail)
+    a_reprendre = np.arange(len(indices))
+    if moteur == "natif":
+        a_reprendre = np.flatnonzero(np.column_stack(
+            [~np.isfinite(estimations[cle]).all(axis=1) for cle in AJUSTEMENTS_ITERATIFS]).any(axis=1))
+
+    args = [(sites[j], composants[j], stock.groupe(indices[j])) for j in a_reprendre]
+    with etape("reprise reliability"):
+        if n_workers == 1 or len(args) <= 1:
+            sorties = list(map(_ajuster_groupe_args, args))
+        else:
+            with ProcessPoolExecutor(max_workers=n_workers) as pool:
+                sorties = list(pool.map(_ajuster_groupe_args, args, chunksize=max(1, taille_lot)))
+
+    # Moteur natif : pas de durée par groupe, mais ses pas de Newton (la part
+    # du lot au prorata pas × nombre de TBF n'est qu'une estimation, rangée à
+    # part des durées mesurées)
+    tailles = np.diff(selection.offsets)
+    for (loi, methode), (pas, duree) in travail.items():
+        cout = pas * tailles
+        parts = duree * cout / max(cout.sum(), 1)
+        for j in np.flatnonzero(pas):
+            noter_iterations(sites[j], composants[j], loi, methode, int(pas[j]), parts[j])
+
+    erreurs = []
+    for loi, methode, colonnes in LIGNES_GROUPE:
+        if (loi, methode) not in estimations:
+            estimations[(loi, methode)] = np.full((len(indices), len(colonnes)), np.nan)
+    for j, (iteratifs, erreur, durees) in zip(a_reprendre, sorties):
+        for cle in AJUSTEMENTS_ITERATIFS:
+            estimations[cle][j] = np.nan
+        for cle, params in iteratifs.items():
+            estimations[cle][j] = params
+        for (loi, methode), duree in durees.items():
+            noter_ajustement(sites[j], composants[j], loi, methode, duree, origine="reliability")
+        if erreur is not None:
+            erreurs.append((indices[j], sites[j], composants[j], erreur))
+
+    # Échecs par loi (paramètres non finis après reprise), pour le rapport d'exécution
+    for (loi, methode), params in estimations.items():
+        compter("echecs_ajustement", f"{loi} ({methode})", np.sum(~np.isfinite(params).all(axis=1)))
+
+    table = table_parametres(sites, composants, estimations)
+    table["Groupe"] = indices[table["Groupe"].to_numpy()]
+    return table, erreurs
+
+
+def ajuster_groupes(groupes, n_workers=None, taille_lot=4, moteur=None, taille_paquet=None):
+    """ajuster_stock appliqué à une suite de groupes (site, composant, tbf).
+
+    Les groupes sont ajustés par paquets de `taille_paquet`
+    (stockage_tbf.TAILLE_PAQUET si None), au fur et à mesure que la suite
+    les produit : un générateur (lecture_donnees.groupes_tbf) n'est jamais
+    matérialisé en entier. "Groupe" est le rang du groupe dans la suite.
+    """
+    from stockage_tbf import TAILLE_PAQUET, TBFStore
+
+    taille_paquet = TAILLE_PAQUET if taille_paquet is None else taille_paquet
+    groupes = iter(groupes)
+    tables, erreurs, debut = [], [], 0
+    while True:
+        stock = TBFStore.depuis_groupes(islice(groupes, taille_paquet))
+        if len(stock) == 0 and tables:
+            break
+        table, erreurs_paquet = ajuster_stock(stock, n_workers=n_workers, taille_lot=taille_lot, moteur=moteur)
+        table["Groupe"] += debut
+        tables.append(table)
+        erreurs += [(i + debut, site, composant, erreur) for i, site, composant, erreur in erreurs_paquet]
+        debut += len(stock)
+        if len(stock) < taille_paquet:
+            break
+    return pd.concat(tables, ignore_index=True), erreurs
+
+
+# ==============================
+# 5. Réajustement d'échantillons en lot (bootstrap)
+# ==============================
+
+def _ajuster_weibull_lignes(X, methode):
+    # Moteur reliability : un appel par échantillon, NaN si échec
+    from reliability.Fitters import Fit_Weibull_2P, Fit_Weibull_3P
+
+    params = np.full((len(X), 3 if methode == "Itération" else 2), np.nan)
+    for i, x in enumerate(X):
+        try:
+            if methode == "Itération":
+                fit = Fit_Weibull_3P(failures=x, method='MLE', show_probability_plot=False, print_results=False)
+                params[i] = fit.alpha, fit.beta, fit.gamma
+            else:
+                fit = Fit_Weibull_2P(failures=x, method='MLE' if methode == "MLE" else 'LS',
+                                     show_probability_plot=False, print_results=False)
+                params[i] = fit.alpha, fit.beta
+        except Exception:
+            pass
+    return params
+
+
+def reajuster_lot(loi, methode, X):
+    """Réajuste (loi, méthode) sur chaque ligne de X (B échantillons × n).
+
+    Utilise le même estimateur du registre que l'estimation : les B lignes
+    forment un TBFStore de B groupes de même taille, traités en un appel.
+    Renvoie une matrice (B × p) dans l'ordre des colonnes du registre des lois.
+    """
+    famille = LOIS.get(loi)
+    if famille is None or methode not in famille.estimateurs:
+        raise ValueError(f"Loi/méthode non supportée : {loi} ({methode})")
+    X = np.asarray(X, dtype=float)
+    if (loi, methode) in AJUSTEMENTS_ITERATIFS and MOTEUR_WEIBULL != "natif":
+        return _ajuster_weibull_lignes(X, methode)
+
+    from stockage_tbf import TBFStore
+
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        params = famille.estimateurs[methode](TBFStore.depuis_matrice(X))
+    return np.asarray(params, dtype=float).reshape(len(X), len(famille.colonnes))
@@ -0,0 +1,360 @@
+import argparse
+import ast
+import hashlib
+import importlib
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+
+from stockage import (DOSSIER_STOCKAGE, VARIABLE_SOURCE, TABLE_PARAMETRES, TABLE_TESTS, TABLE_TOP3, TABLE_RESUME,
+                      TABLE_R_COMPOSANTS, TABLE_R_SITES, TABLE_IMPORTANCE, TABLE_STATISTIQUES, TABLE_STRUCTURE)
+
+# ==============================
+# 0. Paramètres du pipeline
+# ==============================
+# Point d'entrée unique du pipeline : python -m fiabilite run [étapes...]
+#
+# Les scripts sont les étapes d'un graphe de dépendances (estimation ->
+# validation et choix de la meilleure loi -> importance, statistiques,
+# graphes -> agrégation des sites ; ABC à part). Chaque étape est lancée
+# dans un processus séparé, dans le dossier de travail, et échange ses
+# résultats par les tables Parquet du stockage. Les étapes dont les
+# dépendances sont terminées tournent en parallèle.
+#
+# Cache par étape : la clé d'une étape est l'empreinte (SHA-256) du code
+# qu'elle exécute (script et modules du dépôt importés), des tables qu'elle
+# lit, de ses fichiers sources et de ses arguments. Une étape dont la clé n'a
+# pas changé et dont les sorties existent n'est pas relancée. Une étape
+# relancée qui réécrit des tables identiques ne périme donc pas la suite.
+#
+# Avec des étapes nommées, seules celles-ci sont (re)lancées : les étapes en
+# amont ne le sont que si leurs sorties manquent (--amont pour les remettre
+# aussi à jour).
+
+DOSSIER_SCRIPTS = os.path.dirname(os.path.abspath(__file__))
+
+# État du cache (clé et date de chaque étape), dans le stockage du dossier de travail
+FICHIER_ETAT = "pipeline.json"
+
+# Étapes lancées en même temps au plus (chaque script répartit déjà ses
+# calculs sur un pool de processus)
+N_PARALLELES = 3
+
+PLOTS = "best"
+
+
+class Etape:
+    """Étape du pipeline : un script, ses dépendances, ses entrées et ses sorties.
+
+    - `entrees`, `sorties` : tables du stockage lues et écrites
+    - `sources` : fichiers lus hors du stockage, donnés par (module, constante)
+      pour suivre la configuration du script (None = pas de fichier)
+    - `fichiers` : autres sorties (fichier ou dossier), données de la même façon
+    - `arguments` : arguments du script ; "{plots}" est remplacé par l'option --plots
+    """
+
+    def __init__(self, nom, script, dependances=(), entrees=(), sorties=(), sources=(), fichiers=(),
+                 arguments=()):
+        self.nom = nom
+        self.script = script
+        self.dependances = tuple(dependances)
+        self.entrees = tuple(entrees)
+        self.sorties = tuple(sorties)
+        self.sources = tuple(sources)
+        self.fichiers = tuple(fichiers)
+        self.arguments = tuple(arguments)
+
+
+# Dans l'ordre du pipeline (ordre topologique)
+ETAPES = {etape.nom: etape for etape in [
+    Etape("estimation", "Estimation_shabini_v1.py",
+          sources=[("Estimation_shabini_v1", "SOURCE_TBF")],
+          sorties=[TABLE_PARAMETRES]),
+    Etape("validation", "validation_lois_fiabilite.py", ["estimation"],
+          sources=[("validation_lois_fiabilite", "SOURCE_TBF")],
+          entrees=[TABLE_PARAMETRES], sorties=[TABLE_TESTS, TABLE_TOP3, TABLE_RESUME],
+          arguments=["--plots", "{plots}"]),
+    Etape("importance", "Base_fiabilite.py", ["validation"],
+          sources=[("Base_fiabilite", "FICHIER_STRUCTURE")],
+          entrees=[TABLE_RESUME], sorties=[TABLE_R_COMPOSANTS, TABLE_R_SITES, TABLE_IMPORTANCE, TABLE_STRUCTURE]),
+    Etape("statistiques", "Analyse_stat_v1.py", ["validation"],
+          entrees=[TABLE_RESUME], sorties=[TABLE_STATISTIQUES]),
+    Etape("agregation", "Statistiques_Sites_Fiabilite.py", ["importance"],
+          entrees=[TABLE_RESUME, TABLE_STRUCTURE],
+          fichiers=[("Statistiques_Sites_Fiabilite", "FIGURE_SITES")]),
+    # Lit la même source que l'estimation (cache brut du classeur partagé) :
+    # lancée après elle pour ne pas écrire ce cache en même temps
+    Etape("abc", "Analyse_ABC_SHABANI.py", ["estimation"],
+          sources=[("Analyse_ABC_SHABANI", "SOURCE_TTR")],
+          fichiers=[("Analyse_ABC_SHABANI", "FICHIER_ABC")]),
+    Etape("graphes", "visualisation_shabani_v1.py", ["validation"],
+          entrees=[TABLE_RESUME], fichiers=[("graphes", "DOSSIER_SITES")]),
+]}
+
+
+# ==============================
+# 1. Empreintes (clés du cache)
+# ==============================
+
+def modules_locaux(script):
+    """Fichiers .py du dépôt exécutés par `script` : lui-même et ses imports, transitivement."""
+    a_voir, vus = [os.path.join(DOSSIER_SCRIPTS, script)], set()
+    while a_voir:
+        chemin = a_voir.pop()
+        if chemin in vus:
+            continue
+        vus.add(chemin)
+        with open(chemin, encoding="utf-8") as f:
+            arbre = ast.parse(f.read())
+        # Imports différés compris (ast.walk parcourt aussi le corps des fonctions)
+        for noeud in ast.walk(arbre):
+            if isinstance(noeud, ast.Import):
+                noms = [alias.name for alias in noeud.names]
+            elif isinstance(noeud, ast.ImportFrom) and noeud.module and not noeud.level:
+                noms = [noeud.module]
+            else:
+                continue
+            for nom in noms:
+                candidat = os.path.join(DOSSIER_SCRIPTS, nom.split(".")[0] + ".py")
+                if os.path.exists(candidat):
+                    a_voir.append(candidat)
+    return sorted(vus)
+
+
+def _hacher_fichier(h, chemin):
+    with open(chemin, "rb") as f:
+        for bloc in iter(lambda: f.read(1 << 20), b""):
+            h.update(bloc)
+
+
+def resoudre(reference, dossier):
+    """Chemin d'un fichier donné par (module, constante), relatif au dossier de travail ; None si non défini."""
+    module, constante = reference
+    chemin = getattr(importlib.import_module(module), constante)
+    return None if chemin is None else os.path.join(dossier, chemin)
+
+
+def chemin_table(nom, dossier):
+    return os.path.join(dossier, DOSSIER_STOCKAGE, f"{nom}.parquet")
+
+
+def cle_etape(etape, dossier, arguments):
+    """Empreinte de tout ce dont dépend le résultat de l'étape (code, tables lues, sources, arguments)."""
+    h = hashlib.sha256()
+    h.update(json.dumps([etape.nom, list(arguments)]).encode())
+    for chemin in modules_locaux(etape.script):
+        h.update(os.path.basename(chemin).encode())
+        _hacher_fichier(h, chemin)
+    entrees = [(f"table {nom}", chemin_table(nom, dossier)) for nom in etape.entrees]
+    entrees += [(f"source {module}.{constante}", resoudre((module, constante), dossier))
+                for module, constante in etape.sources]
+    for libelle, chemin in entrees:
+        h.update(libelle.encode())
+        if chemin is None or not os.path.exists(chemin):
+            h.update(b"absent")
+        else:
+            _hacher_fichier(h, chemin)
+    return h.hexdigest()
+
+
+def sorties_presentes(etape, dossier):
+    """Vrai si toutes les sorties de l'étape existent dans le dossier de travail."""
+    chemins = [chemin_table(nom, dossier) for nom in etape.sorties]
+    chemins += [resoudre(reference, dossier) for reference in etape.fichiers]
+    return all(os.path.exists(c) for c in chemins if c is not None)
+
+
+# ==============================
+# 2. État du cache
+# ==============================
+
+def charger_etat(dossier):
+    chemin = os.path.join(dossier, DOSSIER_STOCKAGE, FICHIER_ETAT)
+    if not os.path.exists(chemin):
+        return {}
+    with open(chemin, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def sauver_etat(etat, dossier):
+    os.makedirs(os.path.join(dossier, DOSSIER_STOCKAGE), exist_ok=True)
+    with open(os.path.join(dossier, DOSSIER_STOCKAGE, FICHIER_ETAT), "w", encoding="utf-8") as f:
+        json.dump(etat, f, ensure_ascii=False, indent=2)
+
+
+def a_jour(etape, cle, etat, dossier):
+    return etat.get(etape.nom, {}).get("cle") == cle and sorties_presentes(etape, dossier)
+
+
+# ==============================
+# 3. Sélection et exécution des étapes
+# ==============================
+
+def selectionner(cibles=None, amont=False, dossier="."):
+    """Étapes à considérer, dans l'ordre du pipeline.
+
+    Sans cible : toutes. Avec des cibles : celles-ci, plus les étapes en
+    amont dont les sorties manquent (ou toutes celles en amont si `amont`).
+    """
+    if not cibles:
+        return list(ETAPES)
+    inconnues = [nom for nom in cibles if nom not in ETAPES]
+    if inconnues:
+        raise ValueError(f"Étapes inconnues : {inconnues} (attendu parmi {list(ETAPES)})")
+
+    selection = set(cibles)
+    a_voir = list(cibles)
+    while a_voir:
+        for dependance in ETAPES[a_voir.pop()].dependances:
+            if dependance not in selection and (amont or not sorties_presentes(ETAPES[dependance], dossier)):
+                selection.add(dependance)
+                a_voir.append(dependance)
+    return [nom for nom in ETAPES if nom in selection]
+
+
+def lancer_etape(etape, arguments, dossier, environnement):
+    """Lance le script de l'étape dans `dossier` ; renvoie (code de retour, durée, sortie)."""
+    commande = [sys.executable, os.path.join(DOSSIER_SCRIPTS, etape.script), *arguments]
+    debut = time.perf_counter()
+    processus = subprocess.run(commande, cwd=dossier, env=environnement, capture_output=True, text=True,
+                               encoding="utf-8", errors="replace")
+    return processus.returncode, time.perf_counter() - debut, processus.stdout + processus.stderr
+
+
+def executer_pipeline(cibles=None, dossier=".", source=None, plots=PLOTS, forcer=False, amont=False,
+                      n_paralleles=N_PARALLELES):
+    """Exécute les étapes sélectionnées dans l'ordre du graphe ; renvoie {étape: statut}.
+
+    Statuts : "cache" (à jour, non relancée), "ok", "échec" ou "non lancée"
+    (dépendance en échec). `forcer` relance les étapes même à jour.
+    """
+    dossier = os.path.abspath(dossier)
+    if source is not None:
+        # Lue par les scripts (stockage.source_donnees) et par les clés du cache
+        os.environ[VARIABLE_SOURCE] = os.path.abspath(source)
+    environnement = dict(os.environ)
+    environnement.setdefault("MPLBACKEND", "Agg")
+
+    selection = selectionner(cibles, amont, dossier)
+    etat = charger_etat(dossier)
+    statuts = {}
+    en_attente = list(selection)
+    en_cours = {}
+
+    with ThreadPoolExecutor(max_workers=max(1, n_paralleles)) as pool:
+        while en_attente or en_cours:
+            for nom in list(en_attente):
+                etape = ETAPES[nom]
+                dependances = [d for d in etape.dependances if d in selection]
+                if any(statuts.get(d) in ("échec", "non lancée") for d in dependances):
+                    statuts[nom] = "non lancée"
+                    en_attente.remove(nom)
+                    print(f"[Erreur] {nom} : non lancée (dépendance en échec)")
+                    continue
+                if not all(d in statuts for d in dependances) or len(en_cours) >= n_paralleles:
+                    continue
+
+                en_attente.remove(nom)
+                arguments = [a.format(plots=plots) for a in etape.arguments]
+                cle = cle_etape(etape, dossier, arguments)
+                if not forcer and a_jour(etape, cle, etat, dossier):
+                    statuts[nom] = "cache"
+                    print(f"[Info] {nom:<13} à jour (cache)")
+                    continue
+                print(f"[Info] {nom:<13} lancée ({etape.script})")
+                en_cours[pool.submit(lancer_etape, etape, arguments, dossier, environnement)] = (nom, cle)
+
+            if not en_cours:
+                continue
+            terminees, _ = wait(en_cours, return_when=FIRST_COMPLETED)
+            for futur in terminees:
+                nom, cle = en_cours.pop(futur)
+                code, duree, sortie = futur.result()
+                for ligne in sortie.rstrip().splitlines():
+                    print(f"    [{nom}] {ligne}")
+                if code == 0:
+                    statuts[nom] = "ok"
+                    # Clé calculée avant le lancement : une entrée modifiée pendant
+                    # l'exécution périme l'étape au prochain passage
+                    etat[nom] = {"cle": cle, "fin": datetime.now().isoformat(timespec="seconds"),
+                                 "duree_s": round(duree, 3)}
+                    sauver_etat(etat, dossier)
+                    print(f"[Info] {nom:<13} terminée en {duree:.2f} s")
+                else:
+                    statuts[nom] = "échec"
+                    etat.pop(nom, None)
+                    sauver_etat(etat, dossier)
+                    print(f"[Erreur] {nom} : code de retour {code}")
+    return statuts
+
+
+def decrire_etapes(dossier=".", plots=PLOTS):
+    """Affiche le graphe et l'état du cache de chaque étape."""
+    dossier = os.path.abspath(dossier)
+    etat = charger_etat(dossier)
+    for nom, etape in ETAPES.items():
+        arguments = [a.format(plots=plots) for a in etape.arguments]
+        if nom not in etat:
+            statut = "jamais lancée"
+        elif a_jour(etape, cle_etape(etape, dossier, arguments), etat, dossier):
+            statut = f"à jour ({etat[nom]['fin']})"
+        else:
+            statut = "périmée"
+        amont = ", ".join(etape.dependances) or "-"
+        print(f"{nom:<13} {etape.script:<34} après : {amont:<22} {statut}")
+
+
+# ==============================
+# 4. Ligne de commande
+# ==============================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m fiabilite",
+                                     description="Pipeline de fiabilité : étapes en graphe, avec cache par étape")
+    commandes = parser.add_subparsers(dest="commande", required=True)
+
+    run = commandes.add_parser("run", help="exécute le pipeline (toutes les étapes, ou celles nommées)")
+    run.add_argument("etapes", nargs="*", metavar="etape",
+                     help=f"étapes à exécuter, parmi {', '.join(ETAPES)} (défaut : toutes)")
+    run.add_argument("--dossier", default=".", help="dossier de travail (stockage et sorties)")
+    run.add_argument("--source", default=None,
+                     help=f"source des données TBF/TTR (défaut : {VARIABLE_SOURCE}, sinon celle de chaque script)")
+    run.add_argument("--plots", choices=["none", "best", "all"], default=PLOTS,
+                     help="graphes QQ/PP de la validation (défaut : %(default)s)")
+    run.add_argument("--forcer", action="store_true", help="relance les étapes même à jour")
+    run.add_argument("--amont", action="store_true", help="remet aussi à jour les étapes en amont des cibles")
+    run.add_argument("--paralleles", type=int, default=N_PARALLELES,
+                     help="étapes lancées en même temps au plus (défaut : %(default)s)")
+
+    etapes = commandes.add_parser("etapes", help="affiche les étapes, leurs dépendances et l'état du cache")
+    etapes.add_argument("--dossier", default=".", help="dossier de travail (stockage et sorties)")
+    etapes.add_argument("--plots", choices=["none", "best", "all"], default=PLOTS)
+
+    args = parser.parse_args(argv)
+    if args.commande == "etapes":
+        decrire_etapes(args.dossier, args.plots)
+        return 0
+
+    debut = time.perf_counter()
+    try:
+        statuts = executer_pipeline(args.etapes, args.dossier, args.source, args.plots, args.forcer, args.amont,
+                                    args.paralleles)
+    except ValueError as e:
+        print(f"[Erreur] {e}")
+        return 2
+    lancees = sum(s == "ok" for s in statuts.values())
+    en_cache = sum(s == "cache" for s in statuts.values())
+    if any(s in ("échec", "non lancée") for s in statuts.values()):
+        print(f"[Erreur] Pipeline interrompu : {statuts}")
+        return 1
+    print(f"✅ Pipeline terminé en {time.perf_counter() - debut:.1f} s : "
+          f"{lancees} étape(s) lancée(s), {en_cache} à jour")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,365 @@
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+# ==============================
+# 1. Index site -> composants
+# ==============================
+
+def indexer_sites(sites):
+    """Indexe les composants par site.
+
+    `sites` donne le site de chaque composant (une entrée par ligne de la
+    matrice des fiabilités). Renvoie (ordre, noms, debuts) : la permutation
+    qui rend les composants d'un même site contigus (ordre d'origine conservé
+    dans chaque site), les noms des sites triés et l'indice de début de chaque
+    segment dans la matrice permutée. L'appartenance est exacte ("Site1" et
+    "Site10" restent distincts).
+    """
+    codes, noms = pd.factorize(np.asarray(sites, dtype=object), sort=True)
+    ordre = np.argsort(codes, kind="stable")
+    debuts = np.searchsorted(codes[ordre], np.arange(len(noms)))
+    return ordre, np.asarray(noms, dtype=object), debuts
+
+
+def segments(debuts, n):
+    """Bornes (debut, fin) de chaque segment d'un tableau de longueur n."""
+    fins = np.append(debuts[1:], n)
+    return zip(debuts, fins)
+
+
+def hasard_sites_serie(H, debuts):
+    """Hasard cumulé H(t) = -log R(t) de chaque site série.
+
+    En série les hasards s'additionnent : `H` est la matrice des composants
+    déjà permutée par indexer_sites ; renvoie une matrice (n_sites × n_temps)
+    calculée en une seule passe, sans sous-dépassement même lorsque R(t) du
+    site est inférieur au plus petit double.
+    """
+    H = np.asarray(H, dtype=float)
+    if len(debuts) == 0:
+        return np.empty((0, H.shape[1]))
+    return np.add.reduceat(H, debuts, axis=0)
+
+
+def fiabilite_sites_serie(H, debuts):
+    """R(t) de chaque site série, l'exponentielle n'étant payée qu'une fois par site."""
+    return np.exp(-hasard_sites_serie(H, debuts))
+
+
+# ==============================
+# 2. Facteurs d'importance (système série)
+# ==============================
+
+def _rapport(num, den):
+    # num / den, NaN là où den <= 0 (rapport indéfini, par exemple Q_s = 0 à t = 0)
+    num, den = np.broadcast_arrays(num, den)
+    return np.divide(num, den, out=np.full(num.shape, np.nan), where=(den > 0))
+
+
+def importance_serie(H):
+    """Facteurs d'importance des composants d'un système série.
+
+    `H` est la matrice (n_composants × n_temps) des hasards cumulés -log R(t).
+    L'importance marginale de Birnbaum vaut le produit des R(t) des autres
+    composants, soit exp(-Σ_{j≠i} H_j) ; la somme des autres hasards est
+    obtenue pour tous les composants à la fois par sommes préfixes et
+    suffixes, sans soustraction, ce qui reste exact lorsque certains R_i
+    valent 0 (H_i infini).
+
+    Renvoie un dict de matrices (n_composants × n_temps) :
+    - "Importance_Marginale" : I_B = ∂R_s / ∂R_i
+    - "Importance_Critique"  : I_B · (1 - R_i) / (1 - R_s)
+    - "RAW" : Q_s(R_i = 0) / Q_s, soit 1 / Q_s en série
+    - "RRW" : Q_s / Q_s(R_i = 1), soit Q_s / (1 - I_B) en série
+    Les rapports indéfinis (Q_s = 0, par exemple à t = 0) valent NaN.
+    """
+    H = np.asarray(H, dtype=float)
+    n, T = H.shape
+
+    # prefixe[i] = Σ_{j<i} H_j ; suffixe[i] = Σ_{j>=i} H_j
+    prefixe = np.zeros((n + 1, T))
+    suffixe = np.zeros((n + 1, T))
+    np.cumsum(H, axis=0, out=prefixe[1:])
+    suffixe[:-1] = np.cumsum(H[::-1], axis=0)[::-1]
+
+    H_autres = prefixe[:-1] + suffixe[1:]
+    marginale = np.exp(-H_autres)
+    # 1 - exp(-x) calculé par expm1 : précis lorsque R est proche de 1
+    Q_s = -np.expm1(-suffixe[0])
+    Q_i = -np.expm1(-H)
+
+    return {
+        "Importance_Marginale": marginale,
+        "Importance_Critique": _rapport(marginale * Q_i, Q_s),
+        "RAW": _rapport(np.ones_like(H), Q_s),
+        "RRW": _rapport(Q_s, -np.expm1(-H_autres)),
+    }
+
+
+def importance_serie_sites(H, debuts):
+    """importance_serie appliquée à chaque segment de site de `H` (déjà permutée).
+
+    Renvoie un dict de matrices alignées sur les lignes de `H`.
+    """
+    mesures = {}
+    for debut, fin in segments(debuts, len(H)):
+        for nom, m in importance_serie(H[debut:fin]).items():
+            mesures.setdefault(nom, np.empty(np.shape(H)))[debut:fin] = m
+    return mesures
+
+
+def importance_format_long(sites, composants, temps, mesures):
+    """Table longue (Site, Composant, Temps, mesures...) construite en bloc.
+
+    `sites` et `composants` donnent une entrée par ligne des matrices de
+    `mesures`.
+    """
+    n, T = len(composants), len(temps)
+    colonnes = {
+        "Site": np.repeat(np.asarray(sites, dtype=object), T),
+        "Composant": np.repeat(np.asarray(composants, dtype=object), T),
+        "Temps": np.tile(np.asarray(temps, dtype=float), n),
+    }
+    colonnes.update({nom: np.asarray(m).ravel() for nom, m in mesures.items()})
+    return pd.DataFrame(colonnes)
+
+
+# ==============================
+# 3. Structure des sites (blocs série, parallèle, k-sur-n, attente)
+# ==============================
+# Table de structure, une ligne par bloc : Site, Bloc, Type, k, Elements.
+# - Type : "série", "parallèle", "k/n" (au moins k éléments sur n en
+#   fonctionnement) ou "attente" (redondance froide, commutation parfaite :
+#   les éléments servent l'un après l'autre)
+# - Elements : composants du site ou autres blocs, séparés par ";" ou ","
+# Les blocs qu'aucun autre bloc ne contient, et les composants qu'aucun bloc
+# ne cite, sont montés en série au niveau du site. Un site absent de la table
+# reste un système série pur.
+#
+# Un bloc compilé est un tuple (type, k, elements), chaque élément étant un
+# indice de ligne dans la matrice des composants du site ou un bloc compilé.
+
+COLONNES_STRUCTURE = ["Site", "Bloc", "Type", "k", "Elements"]
+
+_TYPES_BLOCS = {
+    "serie": "série", "série": "série",
+    "parallele": "parallèle", "parallèle": "parallèle",
+    "k/n": "k/n", "kn": "k/n", "k_sur_n": "k/n",
+    "attente": "attente", "standby": "attente",
+}
+
+
+def lire_structure(chemin, sheet_name="Structure"):
+    """Lit une table de structure (xlsx : feuille `sheet_name`, ou csv)."""
+    if os.path.splitext(chemin)[1].lower() == ".csv":
+        df = pd.read_csv(chemin)
+    else:
+        df = pd.read_excel(chemin, sheet_name=sheet_name)
+    manquantes = [c for c in COLONNES_STRUCTURE if c not in df.columns and c != "k"]
+    if manquantes:
+        raise KeyError(f"Colonnes absentes de {chemin} : {manquantes}")
+    if "k" not in df.columns:
+        df["k"] = np.nan
+    return df[COLONNES_STRUCTURE]
+
+
+def _compiler_bloc(nom, blocs, composants, en_cours):
+    if nom in blocs:
+        if nom in en_cours:
+            raise ValueError(f"Bloc {nom} contenu dans lui-même")
+        ligne = blocs[nom]
+        type_bloc = _TYPES_BLOCS.get(str(ligne["Type"]).strip().lower())
+        if type_bloc is None:
+            raise ValueError(f"Type de bloc inconnu pour {nom} : {ligne['Type']}")
+        noms = [e.strip() for e in re.split(r"[;,]", str(ligne["Elements"])) if e.strip()]
+        elements = tuple(_compiler_bloc(e, blocs, composants, en_cours | {nom}) for e in noms)
+        k = None
+        if type_bloc == "k/n":
+            k = int(ligne["k"])
+            if not 1 <= k <= len(elements):
+                raise ValueError(f"Bloc {nom} : k = {k} hors de [1, {len(elements)}]")
+        return (type_bloc, k, elements)
+    if nom in composants:
+        return composants[nom]
+    raise ValueError(f"Élément inconnu : {nom}")
+
+
+def _feuilles(bloc):
+    if isinstance(bloc, tuple):
+        return [i for e in bloc[2] for i in _feuilles(e)]
+    return [bloc]
+
+
+def construire_structures(df_structure, sites, composants, debuts):
+    """Compile la table de structure pour chaque site cité.
+
+    `sites` et `composants` donnent, ligne à ligne, la matrice des composants
+    déjà permutée par indexer_sites et `debuts` le début de chaque segment.
+    Les indices des blocs compilés sont relatifs au début du segment du
+    site. Renvoie (structures, erreurs) : {site: bloc racine} et la liste des
+    (site, message) des structures invalides (ces sites restent en série).
+    """
+    sites = np.asarray(sites, dtype=object)
+    composants = np.asarray(composants, dtype=object)
+    structures, erreurs = {}, []
+    for debut, fin in segments(debuts, len(sites)):
+        site = sites[debut]
+        lignes = df_structure[df_structure["Site"] == site]
+        if lignes.empty:
+            continue
+        try:
+            blocs = {str(ligne["Bloc"]).strip(): ligne for _, ligne in lignes.iterrows()}
+            index = {str(c).strip(): i for i, c in enumerate(composants[debut:fin])}
+            cites = {e.strip() for elements in lignes["Elements"] for e in re.split(r"[;,]", str(elements))}
+            racines = [_compiler_bloc(nom, blocs, index, frozenset()) for nom in blocs if nom not in cites]
+            if not racines:
+                raise ValueError("Aucun bloc racine (blocs cités en boucle)")
+            utilises = {i for r in racines for i in _feuilles(r)}
+            libres = [i for i in range(fin - debut) if i not in utilises]
+            structures[site] = ("série", None, tuple(racines) + tuple(libres))
+        except (ValueError, TypeError) as e:
+            erreurs.append((site, str(e)))
+    return structures, erreurs
+
+
+def contient_attente(bloc):
+    """Vrai si le bloc comporte une redondance en attente (sans forme analytique)."""
+    return isinstance(bloc, tuple) and (bloc[0] == "attente" or any(contient_attente(e) for e in bloc[2]))
+
+
+def fiabilite_structure(bloc, R):
+    """R(t) analytique d'un bloc, composants indépendants.
+
+    `R` est la matrice (n_composants × n_temps) des fiabilités du site. Série :
+    produit ; parallèle : 1 - Π(1 - R_i) ; k-sur-n : loi de Poisson-binomiale
+    du nombre d'éléments en fonctionnement (éléments non identiques). Une
+    redondance en attente n'a pas de forme générale : ValueError (voir
+    simulation_systeme).
+    """
+    if not isinstance(bloc, tuple):
+        return R[bloc]
+    type_bloc, k, elements = bloc
+    X = np.array([fiabilite_structure(e, R) for e in elements])
+    if type_bloc == "série":
+        return np.prod(X, axis=0)
+    if type_bloc == "parallèle":
+        return 1 - np.prod(1 - X, axis=0)
+    if type_bloc == "k/n":
+        # distribution[j] = P(j éléments en fonctionnement), élément par élément
+        distribution = np.zeros((len(X) + 1, X.shape[1]))
+        distribution[0] = 1.0
+        for r in X:
+            distribution[1:] = distribution[1:] * (1 - r) + distribution[:-1] * r
+            distribution[0] *= 1 - r
+        return distribution[k:].sum(axis=0)
+    raise ValueError("Redondance en attente : pas de forme analytique, utiliser la simulation")
+
+
+def _produits_autres(X):
+    # Π_{l≠j} X_l pour chaque ligne j, par produits préfixes et suffixes (sans division)
+    prefixe = np.ones((len(X) + 1,) + X.shape[1:])
+    suffixe = np.ones((len(X) + 1,) + X.shape[1:])
+    np.cumprod(X, axis=0, out=prefixe[1:])
+    suffixe[:-1] = np.cumprod(X[::-1], axis=0)[::-1]
+    return prefixe[:-1] * suffixe[1:]
+
+
+def _distributions(X):
+    # distributions[j] = loi du nombre d'éléments en fonctionnement parmi X[:j]
+    distributions = np.zeros((len(X) + 1, len(X) + 1) + X.shape[1:])
+    distributions[0, 0] = 1.0
+    for j, r in enumerate(X):
+        distributions[j + 1] = distributions[j] * (1 - r)
+        distributions[j + 1, 1:] += distributions[j, :-1] * r
+    return distributions
+
+
+def _valeurs_structure(bloc, R):
+    # Arbre des R(t) : une feuille vaut R[i], un bloc (valeur, valeurs des éléments)
+    if not isinstance(bloc, tuple):
+        return R[bloc]
+    arbres = [_valeurs_structure(e, R) for e in bloc[2]]
+    X = np.array([a[0] if isinstance(a, tuple) else a for a in arbres])
+    type_bloc, k = bloc[0], bloc[1]
+    if type_bloc == "série":
+        valeur = np.prod(X, axis=0)
+    elif type_bloc == "parallèle":
+        valeur = 1 - np.prod(1 - X, axis=0)
+    elif type_bloc == "k/n":
+        valeur = _distributions(X)[-1, k:].sum(axis=0)
+    else:
+        raise ValueError("Redondance en attente : pas de forme analytique, utiliser la simulation")
+    return valeur, X, arbres
+
+
+def _propager_marginale(bloc, arbre, poids, marginale):
+    # poids = ∂R_s / ∂(R du bloc) ; chaque élément reçoit poids × ∂R_bloc / ∂R_élément
+    if not isinstance(bloc, tuple):
+        marginale[bloc] += poids
+        return
+    type_bloc, k, elements = bloc
+    _, X, arbres = arbre
+    if type_bloc == "série":
+        derivees = _produits_autres(X)
+    elif type_bloc == "parallèle":
+        derivees = _produits_autres(1 - X)
+    else:
+        # k-sur-n : ∂P(≥ k) / ∂R_j = P(exactement k - 1 des autres éléments)
+        avant = _distributions(X)
+        apres = _distributions(X[::-1])[::-1]
+        m = len(X)
+        derivees = np.array([sum(avant[j, a] * apres[j + 1, k - 1 - a]
+                                 for a in range(max(0, k - 1 - (m - j - 1)), min(j, k - 1) + 1))
+                             for j in range(m)])
+    for element, sous_arbre, derivee in zip(elements, arbres, derivees):
+        _propager_marginale(element, sous_arbre, poids * derivee, marginale)
+
+
+def importance_structure(bloc, R):
+    """Facteurs d'importance des composants d'un site structuré (forme analytique).
+
+    Mêmes mesures qu'importance_serie. R_s étant multilinéaire en les R_i
+    (chaque composant figure une fois dans la structure), I_B = ∂R_s / ∂R_i
+    est obtenu pour tous les composants en une passe descendante de l'arbre,
+    puis R_s(R_i = 1) = R_s + (1 - R_i) I_B et R_s(R_i = 0) = R_s - R_i I_B.
+    Coût O(N · T) pour N composants et T temps (O(n² · T) par bloc k-sur-n
+    de n éléments) ; la mémoire est de quelques matrices N × T par site
+    (8 · N · T octets chacune, soit 80 Mo pour N = 10 000 et T = 1 000) :
+    au-delà, traiter le site sur des grilles de temps plus courtes. Un
+    composant cité dans plusieurs blocs rompt la multilinéarité : il est
+    alors fixé à 1 puis à 0 composant par composant, en O(N² · T).
+    Renvoie un dict de matrices (n_composants × n_temps).
+    """
+    R = np.asarray(R, dtype=float)
+    feuilles = _feuilles(bloc)
+    if len(feuilles) == len(set(feuilles)):
+        arbre = _valeurs_structure(bloc, R)
+        R_s = arbre[0] if isinstance(arbre, tuple) else arbre
+        marginale = np.zeros_like(R)
+        _propager_marginale(bloc, arbre, np.ones(R.shape[1:]), marginale)
+        Q_s = 1 - R_s
+        Q_parfait = Q_s - (1 - R) * marginale
+        Q_defaillant = Q_s + R * marginale
+    else:
+        # Un seul tampon : seule la ligne i est modifiée puis restaurée
+        Q_s = 1 - fiabilite_structure(bloc, R)
+        Q_parfait = np.empty_like(R)
+        Q_defaillant = np.empty_like(R)
+        R_i = R.copy()
+        for i in range(len(R)):
+            R_i[i] = 1.0
+            Q_parfait[i] = 1 - fiabilite_structure(bloc, R_i)
+            R_i[i] = 0.0
+            Q_defaillant[i] = 1 - fiabilite_structure(bloc, R_i)
+            R_i[i] = R[i]
+        marginale = Q_defaillant - Q_parfait
+
+    return {
+        "Importance_Marginale": marginale,
+        "Importance_Critique": _rapport(marginale * (1 - R), Q_s),
+        "RAW": _rapport(Q_defaillant, Q_s),
+        "RRW": _rapport(Q_s, Q_parfait),
+    }
@@ -0,0 +1,209 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from matplotlib.figure import Figure
+
+from lois_fiabilite import distribution_scipy
+
+# ==============================
+# 1. QQ-plots et PP-plots de validation (rendu différé)
+# ==============================
+# Les graphes ne sont plus tracés dans la boucle des tests : la validation
+# met en file des tâches (une par loi/méthode retenue), puis elles sont
+# rendues ensuite, sans pyplot (canevas Agg), avec une Figure/Axes réutilisée
+# par processus.
+
+DOSSIER_VALIDATION = "graphes_validation"
+
+# Figure réutilisée par le processus courant (créée à la première tâche)
+_FIGURE = None
+
+
+def chemins_qq_pp(site, composant, loi, methode, dossier=DOSSIER_VALIDATION):
+    """Chemins des PNG QQ et PP d'une ligne de validation."""
+    qq_path = f"{dossier}/QQ_{site}_{composant}_{loi}_{methode}.png".replace(" ", "_")
+    pp_path = f"{dossier}/PP_{site}_{composant}_{loi}_{methode}.png".replace(" ", "_")
+    return qq_path, pp_path
+
+
+def _figure():
+    global _FIGURE
+    if _FIGURE is None:
+        _FIGURE = Figure()
+        _FIGURE.add_subplot()
+    return _FIGURE, _FIGURE.axes[0]
+
+
+def tracer_qq_pp(tache):
+    """Trace le QQ-plot et le PP-plot d'une tâche.
+
+    `tache` = (site, composant, loi, methode, params, tbf, qq_path, pp_path).
+    Renvoie None si tout s'est bien passé, sinon le message d'erreur.
+    """
+    site, composant, loi, methode, params, tbf, qq_path, pp_path = tache
+    fig, ax = _figure()
+
+    try:
+        dist = distribution_scipy(loi, params)
+        sorted_tbf = np.sort(tbf)
+        n = len(tbf)
+        prob = np.arange(1, n+1) / (n + 1)
+
+        # QQ-Plot
+        theo_quantiles = dist.ppf(prob)
+        ax.clear()
+        ax.scatter(theo_quantiles, sorted_tbf, color='blue')
+        ax.plot([min(theo_quantiles), max(theo_quantiles)],
+                [min(theo_quantiles), max(theo_quantiles)], color='red', linestyle='--')
+        ax.set_title(f"QQ-Plot - {site} - {composant} - {loi} ({methode})")
+        ax.set_xlabel("Quantiles théoriques")
+        ax.set_ylabel("Quantiles empiriques")
+        fig.savefig(qq_path)
+
+        # PP-Plot
+        theo_cdf = dist.cdf(sorted_tbf)
+        ax.clear()
+        ax.plot(prob, theo_cdf, 'o', color='green')
+        ax.plot([0, 1], [0, 1], 'r--')
+        ax.set_title(f"PP-Plot - {site} - {composant} - {loi} ({methode})")
+        ax.set_xlabel("Probabilités empiriques")
+        ax.set_ylabel("Probabilités théoriques")
+        fig.savefig(pp_path)
+
+    except Exception as e:
+        return f"{site}-{composant}-{loi}: {e}"
+
+    return None
+
+
+def rendre_qq_pp(taches, n_workers=None, taille_lot=8):
+    """Rend toutes les tâches QQ/PP, en parallèle sur `n_workers` processus.
+
+    Tous les cœurs si None, rendu série si 1. Une tâche en échec n'arrête pas
+    les autres ; les messages d'erreur sont renvoyés dans l'ordre des tâches.
+    """
+    for tache in taches:
+        os.makedirs(os.path.dirname(tache[6]) or ".", exist_ok=True)
+
+    if n_workers == 1 or len(taches) <= 1:
+        erreurs = map(tracer_qq_pp, taches)
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers) as pool:
+            erreurs = list(pool.map(tracer_qq_pp, taches, chunksize=max(1, taille_lot)))
+
+    return [e for e in erreurs if e is not None]
+
+
+# ==============================
+# 2. Courbes R, f, λ par composant et grilles par site
+# ==============================
+# Les panneaux de chaque composant sont tracés directement dans une
+# cellule de la figure du site (plus de relecture des PNG individuels),
+# à partir des courbes déjà évaluées sur la grille commune. Une tâche par
+# site, rendue par un processus du pool ; le format (png, pdf, svg) suit
+# l'extension des chemins.
+
+DOSSIER_INDIVIDUELLES = "figures_individuelles"
+DOSSIER_SITES = "figures_par_site"
+COLONNES_GRILLE = 2
+
+# Figure individuelle réutilisée par le processus courant
+_FIGURE_COMPOSANT = None
+
+
+def chemins_courbes(site, composants, lois, extension="png",
+                    dossier_individuelles=DOSSIER_INDIVIDUELLES, dossier_sites=DOSSIER_SITES):
+    """Chemin de la grille du site et chemins des figures individuelles de ses composants."""
+    chemin_site = os.path.join(dossier_sites, f"{site}_grille_composants.{extension}".replace(" ", "_"))
+    chemins = [os.path.join(dossier_individuelles, f"{site}_{composant}_{loi}_courbes.{extension}".replace(" ", "_"))
+               for composant, loi in zip(composants, lois)]
+    return chemin_site, chemins
+
+
+def tracer_panneaux(axs, t, R, f, lam):
+    """Trace R(t), f(t) et λ(t) dans les trois axes `axs` (partageant l'axe t)."""
+    for ax, y, couleur, etiquette in zip(axs, (R, f, lam), ("blue", "green", "red"),
+                                          (r"$R(t)$", r"$f(t)$", r"$\lambda(t)$")):
+        ax.plot(t, y, color=couleur)
+        ax.set_ylabel(etiquette)
+        ax.grid(True)
+    axs[-1].set_xlabel(r"$t$ (min)")
+
+
+def _figure_composant():
+    global _FIGURE_COMPOSANT
+    if _FIGURE_COMPOSANT is None:
+        _FIGURE_COMPOSANT = Figure(figsize=(8, 10))
+        _FIGURE_COMPOSANT.subplots(3, 1, sharex=True, gridspec_kw=dict(
+            left=0.12, right=0.96, bottom=0.06, top=0.92, hspace=0.08))
+    return _FIGURE_COMPOSANT, _FIGURE_COMPOSANT.axes
+
+
+def tracer_site(tache):
+    """Trace la grille d'un site et, si demandé, la figure de chacun de ses composants.
+
+    `tache` = (site, composants, lois, t, R, f, lam, chemin_site, chemins), où
+    R, f et lam sont des tableaux (composants × len(t)) et `chemins` les
+    figures individuelles (None pour ne tracer que la grille). Renvoie la
+    liste des messages d'erreur (vide si tout s'est bien passé).
+    """
+    site, composants, lois, t, R, f, lam, chemin_site, chemins = tache
+    erreurs = []
+
+    # Figures individuelles
+    if chemins is not None:
+        fig, axs = _figure_composant()
+        for i, (composant, loi, chemin) in enumerate(zip(composants, lois, chemins)):
+            try:
+                for ax in axs:
+                    ax.clear()
+                fig.suptitle(f"{site} - {composant} ({loi})", fontsize=14, weight='bold')
+                tracer_panneaux(axs, t, R[i], f[i], lam[i])
+                fig.savefig(chemin)
+            except Exception as e:
+                erreurs.append(f"{site} - {composant} ({loi}) : {e}")
+
+    # Grille du site : trois panneaux par composant dans une cellule d'un
+    # GridSpec ; marges fixes en pouces (pas de moteur de mise en page, dont
+    # le coût croît vite avec le nombre d'axes)
+    try:
+        lignes = int(np.ceil(len(composants) / COLONNES_GRILLE))
+        hauteur = 5 * lignes + 1
+        fig = Figure(figsize=(7 * COLONNES_GRILLE, hauteur))
+        fig.suptitle(f"Courbes R(t), f(t), λ(t) - Site {site}", fontsize=16, fontweight='bold',
+                     y=1 - 0.3 / hauteur)
+        grille = fig.add_gridspec(lignes, COLONNES_GRILLE, left=0.07, right=0.98, wspace=0.25,
+                                  top=1 - 1.1 / hauteur, bottom=0.6 / hauteur, hspace=0.35)
+        for i, (composant, loi) in enumerate(zip(composants, lois)):
+            cellule = grille[i // COLONNES_GRILLE, i % COLONNES_GRILLE].subgridspec(3, 1, hspace=0.08)
+            axs = [fig.add_subplot(cellule[0])]
+            axs += [fig.add_subplot(cellule[j], sharex=axs[0]) for j in (1, 2)]
+            for ax in axs[:2]:
+                ax.tick_params(labelbottom=False)
+            axs[0].set_title(f"{composant} ({loi})")
+            tracer_panneaux(axs, t, R[i], f[i], lam[i])
+        fig.savefig(chemin_site)
+    except Exception as e:
+        erreurs.append(f"{site} (grille) : {e}")
+
+    return erreurs
+
+
+def rendre_sites(taches, n_workers=None):
+    """Rend les grilles de tous les sites, en parallèle sur `n_workers` processus.
+
+    Tous les cœurs si None, rendu série si 1. Renvoie les messages d'erreur,
+    dans l'ordre des tâches.
+    """
+    for tache in taches:
+        for chemin in [tache[7]] + list(tache[8] or []):
+            os.makedirs(os.path.dirname(chemin) or ".", exist_ok=True)
+
+    if n_workers == 1 or len(taches) <= 1:
+        resultats = map(tracer_site, taches)
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers) as pool:
+            resultats = list(pool.map(tracer_site, taches))
+
+    return [e for erreurs in resultats for e in erreurs]
@@ -0,0 +1,96 @@
+import numpy as np
+
+from lois_fiabilite import LOIS, evaluer_lois
+
+# ==============================
+# 0. Paramètres de la grille
+# ==============================
+# Une seule grille de temps pour toutes les sorties (courbes R_composants et
+# R_sites, importance, graphes) : elle couvre la chute des R(t) ajustés, de
+# R = R_HAUT à R = R_BAS, puis elle est raffinée là où les courbes sont le
+# plus courbées, jusqu'à ce qu'une interpolation linéaire entre deux points
+# s'écarte de moins de TOLERANCE de la vraie courbe.
+
+R_HAUT = 0.999
+R_BAS = 0.001
+N_INITIAL = 24
+N_MAX = 160
+TOLERANCE = 0.005
+
+
+# ==============================
+# 1. Points initiaux : quantiles des lois ajustées
+# ==============================
+
+def _quantiles_composants(df, niveaux_R):
+    """Temps t où R(t) atteint chacun des `niveaux_R`, pour toutes les lignes de `df`."""
+    p = (1 - np.asarray(niveaux_R, dtype=float))[None, :]
+    lois = df["Loi"].to_numpy()
+    morceaux = []
+    for loi, famille in LOIS.items():
+        masque = lois == loi
+        if not masque.any():
+            continue
+        params = df.loc[masque, list(famille.colonnes)].to_numpy(dtype=float).T[:, :, None]
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            morceaux.append(np.ravel(famille.ppf(p, *params)))
+    t = np.concatenate(morceaux) if morceaux else np.empty(0)
+    return np.maximum(t[np.isfinite(t)], 0.0)
+
+
+def _fiabilites(df, t):
+    return np.exp(-evaluer_lois(df, t, fonctions=("H",))["H"])
+
+
+# ==============================
+# 2. Grille adaptative
+# ==============================
+
+def grille_adaptative(df, r_haut=R_HAUT, r_bas=R_BAS, n_initial=N_INITIAL, n_max=N_MAX,
+                      tolerance=TOLERANCE, origine=True):
+    """Grille de temps commune aux composants de `df` (une ligne par loi ajustée).
+
+    Les points de départ sont les quantiles de chaque loi pour n_initial
+    niveaux de R entre `r_haut` et `r_bas` (réguliers en log H), ramenés à
+    n_initial points pour toute la flotte. Chaque intervalle est ensuite coupé
+    en deux tant que R au milieu s'écarte de plus de `tolerance` de
+    l'interpolation linéaire, pour au moins une courbe, sans dépasser n_max
+    points. Avec `origine`, t = 0 est inclus. Le résultat ne dépend que des
+    lois et paramètres distincts de `df` : deux scripts lisant la même table
+    obtiennent la même grille.
+    """
+    colonnes = ["Loi"] + sorted({c for famille in LOIS.values() for c in famille.colonnes if c in df.columns})
+    df = df[df["Loi"].isin(LOIS)].drop_duplicates(colonnes)
+    niveaux_R = np.exp(-np.geomspace(-np.log(r_haut), -np.log(r_bas), n_initial))
+    points = _quantiles_composants(df, niveaux_R)
+    if len(points) == 0:
+        raise ValueError("Aucune loi supportée pour construire la grille de temps")
+
+    # Une flotte nombreuse donne beaucoup de quantiles : on en garde n_initial,
+    # répartis comme eux (denses là où les composants chutent)
+    points = np.unique(points)
+    if len(points) > n_initial:
+        points = np.unique(np.quantile(points, np.linspace(0, 1, n_initial)))
+    if origine:
+        points = np.union1d([0.0], points)
+
+    # Raffinement par la courbure : bissection des intervalles mal interpolés
+    t = points
+    R = _fiabilites(df, t)
+    while len(t) < n_max and len(t) > 1:
+        milieux = (t[:-1] + t[1:]) / 2
+        R_milieux = _fiabilites(df, milieux)
+        with np.errstate(invalid='ignore'):
+            ecarts = np.nanmax(np.abs(R_milieux - (R[:, :-1] + R[:, 1:]) / 2), axis=0, initial=0.0)
+        a_couper = np.flatnonzero(ecarts > tolerance)
+        if len(a_couper) == 0:
+            break
+        budget = n_max - len(t)
+        if len(a_couper) > budget:
+            a_couper = a_couper[np.argsort(ecarts[a_couper])[::-1][:budget]]
+
+        t = np.concatenate([t, milieux[a_couper]])
+        R = np.concatenate([R, R_milieux[:, a_couper]], axis=1)
+        ordre = np.argsort(t, kind="stable")
+        t, R = t[ordre], R[:, ordre]
+    return t
@@ -0,0 +1,288 @@
+import atexit
+import contextlib
+import heapq
+import io
+import json
+import os
+import sys
+import time
+from collections import Counter, defaultdict
+from datetime import datetime
+
+# ==============================
+# 0. Paramètres de l'instrumentation
+# ==============================
+# Chaque script ouvre un rapport d'exécution (demarrer_rapport) ; les étapes
+# sont chronométrées par `with etape("...")` (ou @etape("...")), les modules
+# de calcul y ajoutent la durée mesurée des ajustements faits groupe par
+# groupe (noter_ajustement), le nombre d'itérations de chaque groupe dans les
+# ajustements en lot du moteur natif (noter_iterations) et leurs échecs
+# (compter). Le rapport est écrit en JSON
+# à côté des sorties, à la fin du script, même en cas d'erreur.
+# Hors d'un script instrumenté (processus du pool, import dans un notebook),
+# ces fonctions ne font rien.
+#
+# Profilage optionnel, par la variable d'environnement FIABILITE_PROFIL
+# (liste séparée par des virgules) : "cprofile" (fichier .prof et fonctions
+# les plus coûteuses dans le rapport), "tracemalloc" (pic de mémoire Python
+# par étape et lignes qui allouent le plus).
+
+VARIABLE_PROFIL = "FIABILITE_PROFIL"
+PROFILS = ("cprofile", "tracemalloc")
+
+# Nombre d'ajustements les plus lents (et les plus itérés), de fonctions
+# (cProfile) et de lignes (tracemalloc) conservés dans le rapport
+N_LENTS = 20
+N_FONCTIONS = 25
+N_LIGNES = 10
+
+DOSSIER_RAPPORTS = "."
+
+_RAPPORT = None
+
+
+def _profils(profil):
+    demande = os.environ.get(VARIABLE_PROFIL, "") if profil is None else profil
+    if isinstance(demande, str):
+        demande = [p.strip().lower() for p in demande.split(",") if p.strip()]
+    inconnus = [p for p in demande if p not in PROFILS]
+    if inconnus:
+        raise ValueError(f"Profil inconnu : {inconnus} (attendu parmi {PROFILS})")
+    return tuple(demande)
+
+
+# ==============================
+# 1. Rapport d'exécution
+# ==============================
+
+class Rapport:
+    """Mesures d'une exécution de script : étapes, compteurs, ajustements les plus lents.
+
+    - `etapes` : nom -> [durée cumulée, appels, pic tracemalloc (octets)]
+    - `compteurs` : catégorie -> Counter (par exemple échecs par loi)
+    - `lents` : tas des N_LENTS ajustements les plus longs (durées mesurées)
+    - `iteres` : tas des N_LENTS groupes les plus itérés des ajustements en lot
+    """
+
+    def __init__(self, script, profil=None, dossier=DOSSIER_RAPPORTS):
+        self.script = script
+        self.dossier = dossier
+        self.profils = _profils(profil)
+        self.debut = datetime.now()
+        self._t0 = time.perf_counter()
+        self.etapes = {}
+        self.compteurs = defaultdict(Counter)
+        self.lents = []
+        self.n_ajustements = 0
+        self.iteres = []
+        self.n_iteres = 0
+        self.exception = None
+        self._pics = []
+        self._pid = os.getpid()
+        self._ecrit = False
+
+        self._profileur = None
+        if "cprofile" in self.profils:
+            import cProfile
+            self._profileur = cProfile.Profile()
+            self._profileur.enable()
+        if "tracemalloc" in self.profils:
+            import tracemalloc
+            tracemalloc.start()
+
+    # ---------- Mesures ----------
+
+    @contextlib.contextmanager
+    def etape(self, nom):
+        tracemalloc = sys.modules.get("tracemalloc") if "tracemalloc" in self.profils else None
+        if tracemalloc is not None:
+            # Pic propre à l'étape ; l'étape englobante en hérite à la sortie
+            if self._pics:
+                self._pics[-1] = max(self._pics[-1], tracemalloc.get_traced_memory()[1])
+            self._pics.append(0)
+            tracemalloc.reset_peak()
+        debut = time.perf_counter()
+        try:
+            yield
+        finally:
+            mesure = self.etapes.setdefault(nom, [0.0, 0, None])
+            mesure[0] += time.perf_counter() - debut
+            mesure[1] += 1
+            if tracemalloc is not None:
+                pic = max(tracemalloc.get_traced_memory()[1], self._pics.pop())
+                mesure[2] = max(mesure[2] or 0, pic)
+                if self._pics:
+                    self._pics[-1] = max(self._pics[-1], pic)
+                tracemalloc.reset_peak()
+
+    def compter(self, categorie, cle, n=1):
+        self.compteurs[categorie][str(cle)] += int(n)
+
+    def noter_ajustement(self, site, composant, loi, methode, duree, origine):
+        self.n_ajustements += 1
+        entree = (duree, self.n_ajustements, (str(site), str(composant), loi, methode, origine))
+        if len(self.lents) < N_LENTS:
+            heapq.heappush(self.lents, entree)
+        elif duree > self.lents[0][0]:
+            heapq.heapreplace(self.lents, entree)
+
+    def noter_iterations(self, site, composant, loi, methode, iterations, duree_estimee, origine):
+        self.n_iteres += 1
+        entree = (iterations, self.n_iteres, (str(site), str(composant), loi, methode, origine, duree_estimee))
+        if len(self.iteres) < N_LENTS:
+            heapq.heappush(self.iteres, entree)
+        elif iterations > self.iteres[0][0]:
+            heapq.heapreplace(self.iteres, entree)
+
+    # ---------- Écriture ----------
+
+    def chemin(self, extension="json"):
+        return os.path.join(self.dossier, f"rapport_{self.script}.{extension}")
+
+    def contenu(self):
+        """Rapport sous forme de dict sérialisable en JSON."""
+        contenu = {
+            "script": self.script,
+            "debut": self.debut.isoformat(timespec="seconds"),
+            "duree_s": round(time.perf_counter() - self._t0, 3),
+            "exception": self.exception,
+            "profils": list(self.profils),
+            "etapes": [{"nom": nom, "duree_s": round(duree, 4), "appels": appels,
+                        **({"pic_memoire_mio": round(pic / 2 ** 20, 2)} if pic is not None else {})}
+                       for nom, (duree, appels, pic) in self.etapes.items()],
+            "compteurs": {categorie: dict(compteur) for categorie, compteur in self.compteurs.items()},
+            "n_ajustements_chronometres": self.n_ajustements,
+            "ajustements_lents": [{"site": site, "composant": composant, "loi": loi, "methode": methode,
+                                   "origine": origine, "duree_s": round(duree, 4)}
+                                  for duree, _, (site, composant, loi, methode, origine)
+                                  in sorted(self.lents, reverse=True)],
+            "n_ajustements_iteres": self.n_iteres,
+            "ajustements_plus_iteres": [{"site": site, "composant": composant, "loi": loi, "methode": methode,
+                                         "origine": origine, "iterations": iterations,
+                                         "duree_estimee_s": round(duree_estimee, 4)}
+                                        for iterations, _, (site, composant, loi, methode, origine, duree_estimee)
+                                        in sorted(self.iteres, reverse=True)],
+        }
+        if self._profileur is not None:
+            contenu["cprofile"] = self._resume_cprofile()
+        if "tracemalloc" in self.profils:
+            contenu["tracemalloc"] = self._resume_tracemalloc()
+        return contenu
+
+    def _resume_cprofile(self):
+        import pstats
+
+        self._profileur.disable()
+        chemin = self.chemin("prof")
+        self._profileur.dump_stats(chemin)
+        statistiques = pstats.Stats(self._profileur, stream=io.StringIO()).sort_stats("cumulative")
+        fonctions = []
+        for (fichier, ligne, nom) in statistiques.fcn_list[:N_FONCTIONS]:
+            _, appels, propre, cumul, _ = statistiques.stats[(fichier, ligne, nom)]
+            fonctions.append({"fonction": f"{os.path.basename(fichier)}:{ligne}({nom})", "appels": appels,
+                              "propre_s": round(propre, 4), "cumul_s": round(cumul, 4)})
+        return {"fichier": chemin, "fonctions": fonctions}
+
+    def _resume_tracemalloc(self):
+        import tracemalloc
+
+        if not tracemalloc.is_tracing():
+            return None
+        courant = tracemalloc.get_traced_memory()[0]
+        lignes = tracemalloc.take_snapshot().statistics("lineno")[:N_LIGNES]
+        tracemalloc.stop()
+        return {"memoire_mio": round(courant / 2 ** 20, 2),
+                "lignes": [{"ligne": str(s.traceback[0]), "taille_mio": round(s.size / 2 ** 20, 3),
+                            "blocs": s.count} for s in lignes]}
+
+    def ecrire(self):
+        """Écrit le rapport JSON (une seule fois, dans le processus qui l'a ouvert)."""
+        if self._ecrit or os.getpid() != self._pid:
+            return None
+        self._ecrit = True
+        os.makedirs(self.dossier, exist_ok=True)
+        with open(self.chemin(), "w", encoding="utf-8") as f:
+            json.dump(self.contenu(), f, ensure_ascii=False, indent=2)
+        print(f"[Info] Rapport d'exécution : {self.chemin()}")
+        return self.chemin()
+
+
+# ==============================
+# 2. Rapport courant (fonctions appelées par les scripts et les modules)
+# ==============================
+
+def demarrer_rapport(script, profil=None, dossier=DOSSIER_RAPPORTS):
+    """Ouvre le rapport d'exécution de `script`, écrit automatiquement à la sortie.
+
+    `profil` : liste parmi PROFILS (FIABILITE_PROFIL si None). Une exception
+    non rattrapée est consignée dans le rapport.
+    """
+    global _RAPPORT
+    _RAPPORT = Rapport(script, profil, dossier)
+
+    crochet = sys.excepthook
+
+    def consigner(type_exception, exception, trace):
+        if _RAPPORT is not None:
+            _RAPPORT.exception = f"{type_exception.__name__}: {exception}"
+        crochet(type_exception, exception, trace)
+
+    sys.excepthook = consigner
+    atexit.register(ecrire_rapport)
+    return _RAPPORT
+
+
+def rapport_courant():
+    """Rapport ouvert dans ce processus, ou None."""
+    return _RAPPORT
+
+
+def ecrire_rapport():
+    """Écrit le rapport courant (sans effet s'il n'y en a pas ou s'il est déjà écrit)."""
+    return _RAPPORT.ecrire() if _RAPPORT is not None else None
+
+
+class etape(contextlib.ContextDecorator):
+    """Chronomètre une étape du rapport courant : `with etape("lecture"):` ou `@etape("lecture")`."""
+
+    def __init__(self, nom):
+        self.nom = nom
+        self._mesure = None
+
+    def _recreate_cm(self):
+        # Une mesure par appel de la fonction décorée (appels imbriqués ou récursifs)
+        return etape(self.nom)
+
+    def __enter__(self):
+        if _RAPPORT is not None:
+            self._mesure = _RAPPORT.etape(self.nom)
+            self._mesure.__enter__()
+        return self
+
+    def __exit__(self, *exception):
+        if self._mesure is not None:
+            mesure, self._mesure = self._mesure, None
+            mesure.__exit__(*exception)
+        return False
+
+
+def compter(categorie, cle, n=1):
+    """Incrémente un compteur du rapport courant (par exemple échecs d'ajustement par loi)."""
+    if _RAPPORT is not None and n:
+        _RAPPORT.compter(categorie, cle, n)
+
+
+def noter_ajustement(site, composant, loi, methode, duree, origine="estimation"):
+    """Durée mesurée d'un ajustement fait pour un seul groupe ; les N_LENTS plus longs sont gardés."""
+    if _RAPPORT is not None:
+        _RAPPORT.noter_ajustement(site, composant, loi, methode, duree, origine)
+
+
+def noter_iterations(site, composant, loi, methode, iterations, duree_estimee, origine="natif"):
+    """Itérations d'un groupe dans un ajustement en lot ; les N_LENTS plus itérés sont gardés.
+
+    La durée d'un groupe n'y est pas mesurée : `duree_estimee` est sa part de
+    la durée du lot, indicative, rangée à part des durées de noter_ajustement.
+    """
+    if _RAPPORT is not None:
+        _RAPPORT.noter_iterations(site, composant, loi, methode, iterations, duree_estimee, origine)
@@ -0,0 +1,188 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from stockage import DOSSIER_STOCKAGE, cache_brut, normaliser_noms
+
+# ==============================
+# 1. Lecture par blocs (xlsx, CSV, Parquet)
+# ==============================
+# Les sources ne sont jamais chargées entières : les lignes arrivent par blocs
+# de `taille_bloc`, noms de colonnes déjà normalisés (voir normaliser_noms).
+# Un classeur Excel est lu en mode lecture seule (openpyxl) et recopié au fil
+# de l'eau dans le cache Parquet de stockage.charger_tbf ; les lectures
+# suivantes repartent directement de ce cache.
+
+TAILLE_BLOC = 100_000
+
+
+def _blocs_parquet(chemin, taille_bloc):
+    import pyarrow.parquet as pq
+
+    fichier = pq.ParquetFile(chemin)
+    for lot in fichier.iter_batches(batch_size=taille_bloc):
+        yield lot.to_pandas()
+
+
+def _blocs_csv(chemin, taille_bloc):
+    yield from pd.read_csv(chemin, chunksize=taille_bloc)
+
+
+def _lignes_excel(chemin, sheet_name, taille_bloc):
+    from openpyxl import load_workbook
+
+    classeur = load_workbook(chemin, read_only=True, data_only=True)
+    try:
+        lignes = classeur[sheet_name].iter_rows(values_only=True)
+        entete = next(lignes, None)
+        if entete is None:
+            return
+        # Même nommage que pd.read_excel pour les en-têtes vides
+        entete = [f"Unnamed: {i}" if v is None else str(v) for i, v in enumerate(entete)]
+
+        bloc = []
+        for ligne in lignes:
+            bloc.append(ligne[:len(entete)])
+            if len(bloc) == taille_bloc:
+                yield pd.DataFrame(bloc, columns=entete)
+                bloc = []
+        if bloc:
+            yield pd.DataFrame(bloc, columns=entete)
+    finally:
+        classeur.close()
+
+
+def _blocs_excel(chemin, sheet_name, taille_bloc, dossier):
+    """Blocs d'une feuille Excel, en alimentant le cache Parquet brut."""
+    chemin_cache, chemin_meta, signature, valide = cache_brut(chemin, sheet_name, dossier)
+    if valide:
+        yield from _blocs_parquet(chemin_cache, taille_bloc)
+        return
+
+    import json
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    os.makedirs(dossier, exist_ok=True)
+    temporaire = chemin_cache + ".tmp"
+    ecrivain, schema, complet = None, None, False
+    try:
+        for bloc in _lignes_excel(chemin, sheet_name, taille_bloc):
+            if schema is not None or ecrivain is None:
+                try:
+                    table = pa.Table.from_pandas(bloc, schema=schema, preserve_index=False)
+                    if ecrivain is None:
+                        schema = table.schema
+                        ecrivain = pq.ParquetWriter(temporaire, schema)
+                    ecrivain.write_table(table)
+                except (ValueError, TypeError, NotImplementedError, pa.ArrowException) as e:
+                    # Types incohérents d'un bloc à l'autre : pas de cache
+                    print(f"[Info] Cache Parquet indisponible pour {chemin} : {e}")
+                    schema = None
+                    if ecrivain is None:
+                        ecrivain = False
+            yield bloc
+        complet = schema is not None
+    finally:
+        if ecrivain:
+            ecrivain.close()
+        if complet:
+            os.replace(temporaire, chemin_cache)
+            with open(chemin_meta, "w", encoding="utf-8") as f:
+                json.dump(signature, f)
+        elif os.path.exists(temporaire):
+            os.remove(temporaire)
+
+
+def lire_par_blocs(chemin, sheet_name="Données TTR", taille_bloc=TAILLE_BLOC,
+                   colonnes=None, dossier=DOSSIER_STOCKAGE):
+    """Lit une source de données par blocs de `taille_bloc` lignes.
+
+    Formats : .xlsx/.xlsm (feuille `sheet_name`), .csv et .parquet. Chaque
+    bloc est un DataFrame aux noms de colonnes normalisés ; avec `colonnes`
+    (noms normalisés), seules ces colonnes sont conservées.
+    """
+    extension = os.path.splitext(chemin)[1].lower()
+    if extension in (".xlsx", ".xlsm"):
+        blocs = _blocs_excel(chemin, sheet_name, taille_bloc, dossier)
+    elif extension == ".csv":
+        blocs = _blocs_csv(chemin, taille_bloc)
+    elif extension == ".parquet":
+        blocs = _blocs_parquet(chemin, taille_bloc)
+    else:
+        raise ValueError(f"Format non supporté : {chemin}")
+
+    for bloc in blocs:
+        bloc.columns = normaliser_noms(bloc.columns)
+        if colonnes is not None:
+            manquantes = [c for c in colonnes if c not in bloc.columns]
+            if manquantes:
+                raise KeyError(f"Colonnes absentes de {chemin} : {manquantes}")
+            bloc = bloc[list(colonnes)]
+        yield bloc
+
+
+# ==============================
+# 2. TBF par groupe Site-Composant
+# ==============================
+
+def groupes_tbf(chemin, sheet_name="Données TTR", triees=False, taille_bloc=TAILLE_BLOC,
+                dossier=DOSSIER_STOCKAGE):
+    """Génère (site, composant, tbf) pour chaque groupe de la source.
+
+    Seules les colonnes Site, Composant et TBF sont lues ; les TBF manquants
+    ou non numériques sont écartés, comme les lignes sans site ou composant.
+
+    - `triees=False` : les TBF de chaque groupe sont accumulés en float64 et
+      les groupes rendus en fin de lecture, dans l'ordre trié des clés (comme
+      groupby). La mémoire est bornée par la seule colonne TBF.
+    - `triees=True` : la source est supposée triée par (Site, Composant) ; un
+      groupe est rendu dès que la clé change, sans attendre la fin du fichier,
+      et la mémoire ne dépasse pas un bloc plus un groupe. Une clé qui
+      réapparaît plus loin lève une ValueError.
+    """
+    accumules = {}
+    cle_courante, morceaux_courants, vues = None, [], set()
+
+    for bloc in lire_par_blocs(chemin, sheet_name, taille_bloc, ("Site", "Composant", "TBF"), dossier):
+        bloc = bloc.dropna(subset=["Site", "Composant"])
+        tbf = pd.to_numeric(bloc["TBF"], errors="coerce").to_numpy(dtype=np.float64)
+        garder = ~np.isnan(tbf)
+        sites = bloc["Site"].to_numpy()[garder]
+        composants = bloc["Composant"].to_numpy()[garder]
+        tbf = tbf[garder]
+        if len(tbf) == 0:
+            continue
+
+        # Ruptures de clé à l'intérieur du bloc (lignes consécutives)
+        rupture = np.ones(len(tbf), dtype=bool)
+        rupture[1:] = (sites[1:] != sites[:-1]) | (composants[1:] != composants[:-1])
+        debuts = np.flatnonzero(rupture)
+        fins = np.append(debuts[1:], len(tbf))
+
+        for debut, fin in zip(debuts, fins):
+            cle = (sites[debut], composants[debut])
+            if not triees:
+                accumules.setdefault(cle, []).append(tbf[debut:fin])
+                continue
+            if cle != cle_courante:
+                if cle_courante is not None:
+                    yield cle_courante[0], cle_courante[1], np.concatenate(morceaux_courants)
+                if cle in vues:
+                    raise ValueError(f"Source non triée par (Site, Composant) : {cle} réapparaît")
+                vues.add(cle)
+                cle_courante, morceaux_courants = cle, []
+            morceaux_courants.append(tbf[debut:fin])
+
+    if triees:
+        if cle_courante is not None:
+            yield cle_courante[0], cle_courante[1], np.concatenate(morceaux_courants)
+        return
+
+    try:
+        cles = sorted(accumules)
+    except TypeError:
+        cles = list(accumules)
+    for cle in cles:
+        yield cle[0], cle[1], np.concatenate(accumules.pop(cle))
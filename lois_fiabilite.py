@@ -0,0 +1,653 @@
+import hashlib
+from collections import OrderedDict
+from functools import partial
+
+import numpy as np
+import pandas as pd
+from scipy.special import (expit, exprel, gamma as fonction_gamma, gammaincc, gammaincinv, gammaln,
+                           log_ndtr, ndtr, ndtri, xlogy)
+from scipy.stats import expon, fisk, gamma as gamma_dist, lognorm, gumbel_r, norm, weibull_min
+
+from ajustement_weibull import weibull_2p_ls_lot, weibull_2p_mle_lot, weibull_3p_mle_lot, weibull_moments_lot
+from noyaux import MOTEUR, courbe_exponentielle, courbe_gumbel, courbe_weibull
+
+# ==============================
+# 1. R(t), f(t), log f(t) et H(t) vectorisés par loi
+# ==============================
+# Chaque fonction reçoit t de forme (1, T) et des paramètres de forme (n, 1) :
+# le broadcast produit directement une matrice (n_composants × n_temps).
+# H(t) = -log R(t) est le hasard cumulé : il ne sous-déborde pas dans les
+# queues, là où R(t) tombe à 0 en double précision. De même, log f(t) reste
+# fini là où f(t) vaut 0 (log-vraisemblance, AIC, BIC), et le taux de
+# défaillance est calculé en log : log λ = log f - log R = log f + H, sous
+# forme analytique pour Weibull, exponentielle et Gumbel.
+
+def _sf_weibull_2p(t, alpha, beta):
+    x = np.maximum(t, 0) / alpha
+    return np.exp(-x ** beta)
+
+def _pdf_weibull_2p(t, alpha, beta):
+    x = np.maximum(t, 0) / alpha
+    with np.errstate(divide='ignore', invalid='ignore'):
+        f = (beta / alpha) * x ** (beta - 1) * np.exp(-x ** beta)
+    return np.where(t >= 0, f, 0.0)
+
+def _logpdf_weibull_2p(t, alpha, beta):
+    x = np.maximum(t, 0) / alpha
+    with np.errstate(divide='ignore', invalid='ignore'):
+        log_f = np.log(beta / alpha) + xlogy(beta - 1, x) - x ** beta
+    return np.where(t >= 0, log_f, -np.inf)
+
+def _H_weibull_2p(t, alpha, beta):
+    return (np.maximum(t, 0) / alpha) ** beta
+
+def _log_lambda_weibull_2p(t, alpha, beta):
+    x = np.maximum(t, 0) / alpha
+    with np.errstate(divide='ignore', invalid='ignore'):
+        log_l = np.log(beta / alpha) + xlogy(beta - 1, x)
+    return np.where(t >= 0, log_l, -np.inf)
+
+def _ppf_weibull_2p(p, alpha, beta):
+    return alpha * (-np.log1p(-p)) ** (1 / beta)
+
+def _sf_weibull_3p(t, alpha, beta, gamma):
+    return _sf_weibull_2p(t - gamma, alpha, beta)
+
+def _pdf_weibull_3p(t, alpha, beta, gamma):
+    return _pdf_weibull_2p(t - gamma, alpha, beta)
+
+def _logpdf_weibull_3p(t, alpha, beta, gamma):
+    return _logpdf_weibull_2p(t - gamma, alpha, beta)
+
+def _H_weibull_3p(t, alpha, beta, gamma):
+    return _H_weibull_2p(t - gamma, alpha, beta)
+
+def _log_lambda_weibull_3p(t, alpha, beta, gamma):
+    return _log_lambda_weibull_2p(t - gamma, alpha, beta)
+
+def _ppf_weibull_3p(p, alpha, beta, gamma):
+    return gamma + _ppf_weibull_2p(p, alpha, beta)
+
+def _sf_gamma(t, k, theta):
+    return gammaincc(k, np.maximum(t, 0) / theta)
+
+def _pdf_gamma(t, k, theta):
+    x = np.maximum(t, 0)
+    with np.errstate(divide='ignore', over='ignore'):
+        f = np.exp(xlogy(k - 1, x) - x / theta - gammaln(k) - k * np.log(theta))
+    return np.where(t >= 0, f, 0.0)
+
+def _logpdf_gamma(t, k, theta):
+    x = np.maximum(t, 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        log_f = xlogy(k - 1, x) - x / theta - gammaln(k) - k * np.log(theta)
+    return np.where(t >= 0, log_f, -np.inf)
+
+def _H_gamma(t, k, theta):
+    return -gamma_dist.logsf(np.maximum(t, 0), k, scale=theta)
+
+def _ppf_gamma(p, k, theta):
+    return theta * gammaincinv(k, p)
+
+def _sf_gamma_3p(t, k, theta, gamma):
+    return _sf_gamma(t - gamma, k, theta)
+
+def _logpdf_gamma_3p(t, k, theta, gamma):
+    return _logpdf_gamma(t - gamma, k, theta)
+
+def _H_gamma_3p(t, k, theta, gamma):
+    return _H_gamma(t - gamma, k, theta)
+
+def _ppf_gamma_3p(p, k, theta, gamma):
+    return gamma + _ppf_gamma(p, k, theta)
+
+def _sf_lognormale(t, mu_ln, sigma_ln):
+    with np.errstate(divide='ignore'):
+        z = (np.log(np.maximum(t, 0)) - mu_ln) / sigma_ln
+    return ndtr(-z)
+
+def _pdf_lognormale(t, mu_ln, sigma_ln):
+    x = np.maximum(t, 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        z = (np.log(x) - mu_ln) / sigma_ln
+        f = np.exp(-0.5 * z ** 2) / (x * sigma_ln * np.sqrt(2 * np.pi))
+    return np.where(t > 0, f, 0.0)
+
+def _logpdf_lognormale(t, mu_ln, sigma_ln):
+    x = np.maximum(t, 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        z = (np.log(x) - mu_ln) / sigma_ln
+        log_f = -0.5 * z ** 2 - np.log(x * sigma_ln) - 0.5 * np.log(2 * np.pi)
+    return np.where(t > 0, log_f, -np.inf)
+
+def _H_lognormale(t, mu_ln, sigma_ln):
+    with np.errstate(divide='ignore'):
+        z = (np.log(np.maximum(t, 0)) - mu_ln) / sigma_ln
+    return -log_ndtr(-z)
+
+def _ppf_lognormale(p, mu_ln, sigma_ln):
+    return np.exp(mu_ln + sigma_ln * ndtri(p))
+
+def _sf_gumbel(t, mu, beta):
+    # Corrige beta trop petit ou nul
+    beta = np.maximum(beta, 1e-6)
+    z = np.clip((t - mu) / beta, -700, 700)  # éviter overflow dans exp()
+    return -np.expm1(-np.exp(-z))
+
+def _pdf_gumbel(t, mu, beta):
+    beta = np.maximum(beta, 1e-6)
+    z = np.clip((t - mu) / beta, -700, 700)
+    return np.exp(-z - np.exp(-z)) / beta
+
+def _logpdf_gumbel(t, mu, beta):
+    beta = np.maximum(beta, 1e-6)
+    z = np.clip((t - mu) / beta, -700, 700)
+    return -z - np.exp(-z) - np.log(beta)
+
+def _H_gumbel(t, mu, beta):
+    beta = np.maximum(beta, 1e-6)
+    z = np.maximum((t - mu) / beta, -700)
+    u = np.exp(-z)
+    # -log(1 - exp(-u)) ≈ z + u/2 dans la queue droite (u → 0)
+    with np.errstate(divide='ignore'):
+        return np.where(z > 30, z + u / 2, -np.log(-np.expm1(-u)))
+
+def _log_lambda_gumbel(t, mu, beta):
+    # λ = (u / β) / (exp(u) - 1) avec u = exp(-z) : exprel(u) = (exp(u) - 1) / u
+    beta = np.maximum(beta, 1e-6)
+    u = np.exp(-np.clip((t - mu) / beta, -700, 700))
+    with np.errstate(over='ignore', divide='ignore'):
+        log_exprel = np.where(u > 700, u - np.log(u), np.log(exprel(np.minimum(u, 700))))
+    return -np.log(beta) - log_exprel
+
+def _ppf_gumbel(p, mu, beta):
+    return mu - beta * np.log(-np.log(p))
+
+def _sf_exponentielle(t, lambda_):
+    return np.exp(-lambda_ * np.maximum(t, 0))
+
+def _pdf_exponentielle(t, lambda_):
+    return np.where(t >= 0, lambda_ * np.exp(-lambda_ * np.maximum(t, 0)), 0.0)
+
+def _logpdf_exponentielle(t, lambda_):
+    with np.errstate(divide='ignore'):
+        return np.where(t >= 0, np.log(lambda_) - lambda_ * np.maximum(t, 0), -np.inf)
+
+def _H_exponentielle(t, lambda_):
+    return lambda_ * np.maximum(t, 0)
+
+def _log_lambda_exponentielle(t, lambda_):
+    with np.errstate(divide='ignore'):
+        return np.where(t >= 0, np.log(lambda_), -np.inf)
+
+def _ppf_exponentielle(p, lambda_):
+    return -np.log1p(-p) / lambda_
+
+def _sf_exponentielle_2p(t, lambda_, gamma):
+    return _sf_exponentielle(t - gamma, lambda_)
+
+def _logpdf_exponentielle_2p(t, lambda_, gamma):
+    return _logpdf_exponentielle(t - gamma, lambda_)
+
+def _H_exponentielle_2p(t, lambda_, gamma):
+    return _H_exponentielle(t - gamma, lambda_)
+
+def _log_lambda_exponentielle_2p(t, lambda_, gamma):
+    return _log_lambda_exponentielle(t - gamma, lambda_)
+
+def _ppf_exponentielle_2p(p, lambda_, gamma):
+    return gamma + _ppf_exponentielle(p, lambda_)
+
+def _z_loglogistique(t, alpha_ll, beta_ll):
+    # β ln(t/α), -inf pour t <= 0
+    with np.errstate(divide='ignore'):
+        return beta_ll * (np.log(np.maximum(t, 0)) - np.log(alpha_ll))
+
+def _sf_loglogistique(t, alpha_ll, beta_ll):
+    return expit(-_z_loglogistique(t, alpha_ll, beta_ll))
+
+def _logpdf_loglogistique(t, alpha_ll, beta_ll):
+    z = _z_loglogistique(t, alpha_ll, beta_ll)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        log_f = np.log(beta_ll) + (1 - 1 / beta_ll) * z - np.log(alpha_ll) - 2 * np.logaddexp(0, z)
+    return np.where(t > 0, log_f, -np.inf)
+
+def _H_loglogistique(t, alpha_ll, beta_ll):
+    return np.logaddexp(0, _z_loglogistique(t, alpha_ll, beta_ll))
+
+def _ppf_loglogistique(p, alpha_ll, beta_ll):
+    return alpha_ll * (p / (1 - p)) ** (1 / beta_ll)
+
+def _sf_normale(t, mu_norm, sigma_norm):
+    return ndtr(-(t - mu_norm) / sigma_norm)
+
+def _logpdf_normale(t, mu_norm, sigma_norm):
+    z = (t - mu_norm) / sigma_norm
+    return -0.5 * z ** 2 - np.log(sigma_norm) - 0.5 * np.log(2 * np.pi)
+
+def _H_normale(t, mu_norm, sigma_norm):
+    return -log_ndtr(-(t - mu_norm) / sigma_norm)
+
+def _ppf_normale(p, mu_norm, sigma_norm):
+    return mu_norm + sigma_norm * ndtri(p)
+
+
+# ==============================
+# 2. Statistiques caractéristiques à forme fermée
+# ==============================
+# Moyenne (MTBF), variance et mode de chaque loi, vectorisés sur les
+# paramètres ; inf lorsque le moment n'existe pas.
+
+def _moments_weibull_2p(alpha, beta):
+    g1 = fonction_gamma(1 + 1 / beta)
+    return alpha * g1, alpha ** 2 * (fonction_gamma(1 + 2 / beta) - g1 ** 2)
+
+def _mode_weibull_2p(alpha, beta):
+    with np.errstate(invalid='ignore'):
+        return np.where(beta > 1, alpha * ((beta - 1) / beta) ** (1 / beta), 0.0)
+
+def _moments_loglogistique(alpha_ll, beta_ll):
+    b = np.pi / beta_ll
+    with np.errstate(divide='ignore', invalid='ignore'):
+        moyenne = np.where(beta_ll > 1, alpha_ll * b / np.sin(b), np.inf)
+        variance = np.where(beta_ll > 2, alpha_ll ** 2 * (2 * b / np.sin(2 * b) - b ** 2 / np.sin(b) ** 2), np.inf)
+    return moyenne, variance
+
+def _mode_loglogistique(alpha_ll, beta_ll):
+    with np.errstate(invalid='ignore'):
+        return np.where(beta_ll > 1, alpha_ll * ((beta_ll - 1) / (beta_ll + 1)) ** (1 / beta_ll), 0.0)
+
+# Loi -> (moyenne, variance, mode), chacune f(*paramètres) ; passé à Famille
+_STATISTIQUES = {
+    "Weibull 2P": (
+        lambda alpha, beta: _moments_weibull_2p(alpha, beta)[0],
+        lambda alpha, beta: _moments_weibull_2p(alpha, beta)[1],
+        _mode_weibull_2p),
+    "Weibull 3P": (
+        lambda alpha, beta, gamma: gamma + _moments_weibull_2p(alpha, beta)[0],
+        lambda alpha, beta, gamma: _moments_weibull_2p(alpha, beta)[1],
+        lambda alpha, beta, gamma: gamma + _mode_weibull_2p(alpha, beta)),
+    "Gamma": (
+        lambda k, theta: k * theta,
+        lambda k, theta: k * theta ** 2,
+        lambda k, theta: np.where(k >= 1, (k - 1) * theta, 0.0)),
+    "Lognormale": (
+        lambda mu_ln, sigma_ln: np.exp(mu_ln + sigma_ln ** 2 / 2),
+        lambda mu_ln, sigma_ln: np.expm1(sigma_ln ** 2) * np.exp(2 * mu_ln + sigma_ln ** 2),
+        lambda mu_ln, sigma_ln: np.exp(mu_ln - sigma_ln ** 2)),
+    "Gumbel": (
+        lambda mu, beta: mu + np.euler_gamma * beta,
+        lambda mu, beta: (np.pi * beta) ** 2 / 6,
+        lambda mu, beta: mu + 0 * beta),
+    "Exponentielle": (
+        lambda lambda_: 1 / lambda_,
+        lambda lambda_: 1 / lambda_ ** 2,
+        lambda lambda_: 0 * lambda_),
+    "Loglogistique": (
+        lambda alpha_ll, beta_ll: _moments_loglogistique(alpha_ll, beta_ll)[0],
+        lambda alpha_ll, beta_ll: _moments_loglogistique(alpha_ll, beta_ll)[1],
+        _mode_loglogistique),
+    "Normale": (
+        lambda mu_norm, sigma_norm: mu_norm + 0 * sigma_norm,
+        lambda mu_norm, sigma_norm: sigma_norm ** 2 + 0 * mu_norm,
+        lambda mu_norm, sigma_norm: mu_norm + 0 * sigma_norm),
+    "Gamma 3P": (
+        lambda k, theta, gamma: gamma + k * theta,
+        lambda k, theta, gamma: k * theta ** 2,
+        lambda k, theta, gamma: gamma + np.where(k >= 1, (k - 1) * theta, 0.0)),
+    "Exponentielle 2P": (
+        lambda lambda_, gamma: gamma + 1 / lambda_,
+        lambda lambda_, gamma: 1 / lambda_ ** 2 + 0 * gamma,
+        lambda lambda_, gamma: gamma + 0 * lambda_),
+}
+
+
+# ==============================
+# 3. Estimateurs (tous les groupes d'un TBFStore en lot)
+# ==============================
+# Chaque estimateur reçoit un TBFStore et renvoie la matrice
+# (n_groupes × p) des paramètres, dans l'ordre des colonnes de la loi ;
+# NaN ou inf si l'estimation est indéfinie pour un groupe. Les estimateurs
+# itératifs acceptent en plus `pas`, compteur de pas de Newton par groupe.
+
+def _ecarts_types(stock):
+    return np.sqrt(stock.variances())
+
+def _weibull_2p_moments(stock):
+    return np.column_stack(weibull_moments_lot(stock.moyennes(), _ecarts_types(stock)))
+
+def _weibull_2p_mle(stock, pas=None):
+    return np.column_stack(weibull_2p_mle_lot(stock.valeurs, stock.offsets, pas=pas))
+
+def _weibull_2p_regression(stock):
+    return np.column_stack(weibull_2p_ls_lot(stock.valeurs, stock.offsets))
+
+def _weibull_3p_mle(stock, pas=None):
+    return np.column_stack(weibull_3p_mle_lot(stock.valeurs, stock.offsets, pas=pas))
+
+def _gamma_moments(stock):
+    m, s = stock.moyennes(), _ecarts_types(stock)
+    return np.column_stack([m ** 2 / s ** 2, s ** 2 / m])
+
+def _lognormale_moments(stock):
+    return np.column_stack([stock.moyennes_log(), np.sqrt(stock.variances_log())])
+
+def _gumbel_moments(stock):
+    m, s = stock.moyennes(), _ecarts_types(stock)
+    beta_gumbel = s * np.sqrt(6) / np.pi
+    return np.column_stack([m - 0.5772 * beta_gumbel, beta_gumbel])
+
+def _exponentielle_mle(stock):
+    return (1 / stock.moyennes())[:, None]
+
+def _loglogistique_moments(stock):
+    # ln T suit une loi logistique : moyenne ln α, écart-type π / (β √3)
+    return np.column_stack([np.exp(stock.moyennes_log()), np.pi / (np.sqrt(3) * np.sqrt(stock.variances_log()))])
+
+def _normale_moments(stock):
+    return np.column_stack([stock.moyennes(), _ecarts_types(stock)])
+
+def _gamma_3p_moments(stock):
+    # Asymétrie = 2 / √k : k, theta et gamma s'en déduisent (asymétrie > 0 seulement)
+    m, s, g = stock.moyennes(), _ecarts_types(stock), stock.asymetries()
+    g = np.where(g > 0, g, np.nan)
+    k = 4 / g ** 2
+    theta = s * g / 2
+    return np.column_stack([k, theta, m - k * theta])
+
+def _exponentielle_2p_mle(stock):
+    # Maximum de vraisemblance corrigé du biais : gamma reste sous le plus petit TBF
+    n, m, t_min = stock.n, stock.moyennes(), stock.minimums()
+    lambda_ = (n - 1) / (n * (m - t_min))
+    return np.column_stack([lambda_, t_min - 1 / (n * lambda_)])
+
+
+# ==============================
+# 4. Registre des lois
+# ==============================
+
+def _pdf_depuis_log(logpdf, t, *params):
+    return np.exp(logpdf(t, *params))
+
+
+def _log_lambda_depuis_log(logpdf, H, t, *params):
+    # log λ = log f - log R, sans former R (nul dans la queue)
+    with np.errstate(invalid='ignore'):
+        return logpdf(t, *params) + H(t, *params)
+
+
+class Famille:
+    """Une loi du registre.
+
+    - `colonnes` : paramètres, dans l'ordre des colonnes des tables
+    - `sf`, `pdf`, `logpdf`, `H`, `log_lambda` : R(t), f(t), log f(t), H(t)
+      et log λ(t) vectorisés (log_lambda par défaut : log f + H),
+      `ppf(p, *params)` : quantiles
+    - `scipy` : distribution scipy figée (tirages, contrôles)
+    - `statistiques` : (moyenne, variance, mode) à forme fermée
+    - `estimateurs` : {méthode: estimateur(TBFStore)}, dans l'ordre des
+      lignes de la table des paramètres
+    - `noyau` : optionnel, `noyau(fonction, t, params)` rend la courbe
+      (m × T) par un noyau compilé, utilisé si le moteur est numba (noyaux)
+    """
+
+    def __init__(self, nom, colonnes, sf, logpdf, H, ppf, scipy, statistiques, estimateurs, pdf=None,
+                 log_lambda=None, noyau=None):
+        self.nom = nom
+        self.colonnes = tuple(colonnes)
+        self.sf = sf
+        self.logpdf = logpdf
+        self.pdf = pdf if pdf is not None else partial(_pdf_depuis_log, logpdf)
+        self.H = H
+        self.log_lambda = log_lambda if log_lambda is not None else partial(_log_lambda_depuis_log, logpdf, H)
+        self.ppf = ppf
+        self.scipy = scipy
+        self.moyenne, self.variance, self.mode = statistiques
+        self.estimateurs = dict(estimateurs)
+        self.noyau = noyau
+
+    def __repr__(self):
+        return f"Famille({self.nom!r}, {self.colonnes})"
+
+
+# Loi -> Famille, dans l'ordre historique des lignes d'un groupe
+LOIS = {}
+
+
+def enregistrer_loi(famille):
+    """Ajoute une loi au registre (ses colonnes rejoignent colonnes_parametres)."""
+    LOIS[famille.nom] = famille
+    return famille
+
+
+def colonnes_parametres():
+    """Colonnes de paramètres des lois du registre, dans l'ordre d'enregistrement, sans doublon."""
+    return list(dict.fromkeys(c for famille in LOIS.values() for c in famille.colonnes))
+
+
+enregistrer_loi(Famille(
+    "Weibull 2P", ("alpha", "beta"), _sf_weibull_2p, _logpdf_weibull_2p, _H_weibull_2p, _ppf_weibull_2p,
+    lambda alpha, beta: weibull_min(c=beta, scale=alpha),
+    _STATISTIQUES["Weibull 2P"],
+    {"Moments": _weibull_2p_moments, "MLE": _weibull_2p_mle, "Régression": _weibull_2p_regression},
+    pdf=_pdf_weibull_2p,
+    log_lambda=_log_lambda_weibull_2p, noyau=courbe_weibull))
+enregistrer_loi(Famille(
+    "Weibull 3P", ("alpha", "beta", "gamma"), _sf_weibull_3p, _logpdf_weibull_3p, _H_weibull_3p, _ppf_weibull_3p,
+    lambda alpha, beta, gamma: weibull_min(c=beta, scale=alpha, loc=gamma),
+    _STATISTIQUES["Weibull 3P"], {"Itération": _weibull_3p_mle}, pdf=_pdf_weibull_3p,
+    log_lambda=_log_lambda_weibull_3p, noyau=courbe_weibull))
+enregistrer_loi(Famille(
+    "Gamma", ("k", "theta"), _sf_gamma, _logpdf_gamma, _H_gamma, _ppf_gamma,
+    lambda k, theta: gamma_dist(a=k, scale=theta),
+    _STATISTIQUES["Gamma"], {"Moments": _gamma_moments}, pdf=_pdf_gamma))
+enregistrer_loi(Famille(
+    "Lognormale", ("mu_ln", "sigma_ln"), _sf_lognormale, _logpdf_lognormale, _H_lognormale, _ppf_lognormale,
+    lambda mu_ln, sigma_ln: lognorm(s=sigma_ln, scale=np.exp(mu_ln)),
+    _STATISTIQUES["Lognormale"], {"Moments": _lognormale_moments}, pdf=_pdf_lognormale))
+enregistrer_loi(Famille(
+    "Gumbel", ("mu_gumbel", "beta_gumbel"), _sf_gumbel, _logpdf_gumbel, _H_gumbel, _ppf_gumbel,
+    lambda mu, beta: gumbel_r(loc=mu, scale=beta),
+    _STATISTIQUES["Gumbel"], {"Moments": _gumbel_moments}, pdf=_pdf_gumbel,
+    log_lambda=_log_lambda_gumbel, noyau=courbe_gumbel))
+enregistrer_loi(Famille(
+    "Exponentielle", ("lambda_",), _sf_exponentielle, _logpdf_exponentielle, _H_exponentielle,
+    _ppf_exponentielle, lambda lambda_: expon(scale=1 / lambda_),
+    _STATISTIQUES["Exponentielle"], {"MLE": _exponentielle_mle}, pdf=_pdf_exponentielle,
+    log_lambda=_log_lambda_exponentielle, noyau=courbe_exponentielle))
+enregistrer_loi(Famille(
+    "Loglogistique", ("alpha_ll", "beta_ll"), _sf_loglogistique, _logpdf_loglogistique, _H_loglogistique,
+    _ppf_loglogistique, lambda alpha_ll, beta_ll: fisk(c=beta_ll, scale=alpha_ll),
+    _STATISTIQUES["Loglogistique"], {"Moments": _loglogistique_moments}))
+enregistrer_loi(Famille(
+    "Normale", ("mu_norm", "sigma_norm"), _sf_normale, _logpdf_normale, _H_normale, _ppf_normale,
+    lambda mu_norm, sigma_norm: norm(loc=mu_norm, scale=sigma_norm),
+    _STATISTIQUES["Normale"], {"Moments": _normale_moments}))
+enregistrer_loi(Famille(
+    "Gamma 3P", ("k", "theta", "gamma"), _sf_gamma_3p, _logpdf_gamma_3p, _H_gamma_3p, _ppf_gamma_3p,
+    lambda k, theta, gamma: gamma_dist(a=k, scale=theta, loc=gamma),
+    _STATISTIQUES["Gamma 3P"], {"Moments": _gamma_3p_moments}))
+enregistrer_loi(Famille(
+    "Exponentielle 2P", ("lambda_", "gamma"), _sf_exponentielle_2p, _logpdf_exponentielle_2p,
+    _H_exponentielle_2p, _ppf_exponentielle_2p, lambda lambda_, gamma: expon(scale=1 / lambda_, loc=gamma),
+    _STATISTIQUES["Exponentielle 2P"], {"MLE": _exponentielle_2p_mle},
+    log_lambda=_log_lambda_exponentielle_2p, noyau=courbe_exponentielle))
+
+
+# ==============================
+# 5. Évaluation de toute la flotte
+# ==============================
+
+# Courbes déjà évaluées, partagées entre statistiques, graphes et agrégation
+# par site : (loi, fonction, paramètres, grille) -> matrice en lecture seule,
+# les moins récemment utilisées étant écartées au-delà de TAILLE_CACHE_COURBES.
+# Seules les grilles partagées (grille de temps commune) sont mises en cache :
+# une courbe évaluée sur les TBF d'un seul groupe ne serait jamais relue.
+TAILLE_CACHE_COURBES = 256 * 2 ** 20  # octets
+_CACHE_COURBES = OrderedDict()
+_TAILLE_COURBES = 0  # octets occupés par _CACHE_COURBES, tenu à jour
+
+# Fonction demandée -> attribut de Famille
+_FONCTIONS = {"R": "sf", "f": "pdf", "H": "H", "logf": "logpdf", "loglambda": "log_lambda"}
+
+
+def identifiant_grille(t):
+    """Identifiant d'une grille de temps : empreinte de ses valeurs."""
+    t = np.ascontiguousarray(t, dtype=float)
+    return t.shape, hashlib.sha1(t.tobytes()).hexdigest()
+
+
+def courbe_loi(loi, fonction, params, t, grille=None):
+    """Matrice (m × T) de `fonction` ("R", "f", "H", "logf", "loglambda") d'une loi.
+
+    `params` est une matrice (m × p) dans l'ordre des colonnes du registre et
+    `t` une grille (T,). Si `grille` (identifiant_grille de `t`) est donné,
+    le résultat est mis en cache (LRU) et rendu en lecture seule : un second
+    appel avec les mêmes paramètres sur la même grille ne recalcule rien.
+    Sans `grille` (grille propre à un échantillon), rien n'est mis en cache.
+    Avec le moteur numba, les lois dotées d'un noyau sont évaluées par celui-ci.
+    """
+    global _TAILLE_COURBES
+
+    famille = LOIS[loi]
+    params = np.ascontiguousarray(params, dtype=float).reshape(-1, len(famille.colonnes))
+    cle = None
+    if grille is not None:
+        cle = (loi, fonction, params.shape, params.tobytes(), grille)
+        courbe = _CACHE_COURBES.get(cle)
+        if courbe is not None:
+            _CACHE_COURBES.move_to_end(cle)
+            return courbe
+
+    if MOTEUR == "numba" and famille.noyau is not None:
+        courbe = famille.noyau(fonction, np.ascontiguousarray(t, dtype=float), params)
+    else:
+        t = np.asarray(t, dtype=float)[None, :]
+        courbe = np.array(np.broadcast_to(getattr(famille, _FONCTIONS[fonction])(t, *params.T[:, :, None]),
+                                          (len(params), t.shape[1])), dtype=float)
+    courbe.setflags(write=False)
+    if cle is None:
+        return courbe
+    _CACHE_COURBES[cle] = courbe
+    _TAILLE_COURBES += courbe.nbytes
+    while _TAILLE_COURBES > TAILLE_CACHE_COURBES and len(_CACHE_COURBES) > 1:
+        _TAILLE_COURBES -= _CACHE_COURBES.popitem(last=False)[1].nbytes
+    return courbe
+
+
+def taux_defaillance(loi, params, t, log=False, grille=None):
+    """λ(t) = f(t) / R(t) (log λ si `log`) de m jeux de paramètres sur la grille `t`.
+
+    Calculé en log (log f + H ou forme analytique) : λ reste exact dans la
+    queue, là où R(t) tombe à 0 et où f / R donnerait 0 ou NaN.
+    """
+    log_lambda = courbe_loi(loi, "loglambda", params, t, grille)
+    return log_lambda if log else np.exp(log_lambda)
+
+
+def evaluer_lois(df, t, fonctions=("R", "f", "lambda"), cache=True):
+    """Évalue R(t), f(t), λ(t), H(t), log f(t) et log λ(t) pour chaque ligne de `df` sur la grille `t`.
+
+    Les composants sont regroupés par loi et chaque loi est évaluée en un seul
+    appel vectorisé (courbe_loi, avec cache). Renvoie un dict
+    {fonction: matrice (len(df) × len(t))} dont les lignes suivent l'ordre de
+    `df` ; les lignes d'une loi non supportée restent à NaN. `fonctions`
+    parmi "R", "f", "lambda", "H", "logf", "loglambda" ; λ est calculé en log.
+    `cache=False` pour une grille propre à un échantillon (par exemple ses
+    TBF triés) : les courbes ne sont alors ni empreintées ni mises en cache.
+    """
+    t = np.asarray(t, dtype=float)
+    grille = identifiant_grille(t) if cache else None
+    lois = df["Loi"].to_numpy()
+    demandees = [("loglambda" if f == "lambda" else f) for f in fonctions]
+    courbes = {f: np.full((len(df), len(t)), np.nan) for f in dict.fromkeys(demandees)}
+
+    # Paramètres des lois présentes extraits une fois en matrice, puis
+    # découpés par loi sans passer par l'indexation pandas
+    presentes = [famille for loi, famille in LOIS.items() if (lois == loi).any()]
+    colonnes = list(dict.fromkeys(c for famille in presentes for c in famille.colonnes))
+    position = {c: j for j, c in enumerate(colonnes)}
+    P = df[colonnes].to_numpy(dtype=float)
+
+    for loi, famille in LOIS.items():
+        masque = lois == loi
+        if not masque.any():
+            continue
+        params = P[np.ix_(masque, [position[c] for c in famille.colonnes])]
+        for fonction, matrice in courbes.items():
+            matrice[masque] = courbe_loi(loi, fonction, params, t, grille)
+
+    if "lambda" in fonctions:
+        lambda_t = np.exp(courbes["loglambda"])
+        if "loglambda" not in fonctions:
+            del courbes["loglambda"]
+        courbes["lambda"] = lambda_t
+    return {f: courbes[f] for f in fonctions}
+
+
+def hasard_cumule(loi, params, x):
+    """H(x) = -log R(x) d'une loi, ligne à ligne.
+
+    `params` est une matrice (m × p) dans l'ordre des colonnes du registre et
+    `x` une matrice (m × n) : la ligne i de `x` est évaluée avec la ligne i
+    des paramètres (par exemple m échantillons bootstrap, chacun réajusté).
+    """
+    famille = LOIS[loi]
+    params = np.asarray(params, dtype=float).reshape(-1, len(famille.colonnes))
+    return famille.H(np.asarray(x, dtype=float), *params.T[:, :, None])
+
+
+# ==============================
+# 6. Distributions scipy (quantiles, tirages)
+# ==============================
+
+def distribution_scipy(loi, params):
+    """Distribution scipy figée d'une loi du registre (ppf, rvs, ...)."""
+    return LOIS[loi].scipy(*np.asarray(params, dtype=float))
+
+
+# ==============================
+# 7. Statistiques caractéristiques de toute la flotte
+# ==============================
+
+def nom_quantile(p):
+    """Nom de colonne du quantile de probabilité `p` (0.75 -> "Q75")."""
+    return f"Q{100 * p:g}"
+
+
+def statistiques_lois(df, quantiles=(0.75, 0.99)):
+    """MTBF, médiane, mode et quantiles de chaque ligne de `df`, avec λ(t) en chacun.
+
+    Les lignes sont regroupées par loi et chaque loi est traitée en un appel
+    vectorisé : statistiques à forme fermée et ppf du registre, puis taux de
+    défaillance λ = f / R évalué en log (Famille.log_lambda), sans perte dans
+    les queues. Renvoie un DataFrame numérique aligné sur `df` : colonnes MTBF,
+    Mediane, Mode, Q.. (voir nom_quantile), puis lambda_<point> pour chacune ;
+    NaN pour une loi non supportée.
+    """
+    points = ["MTBF", "Mediane", "Mode"] + [nom_quantile(p) for p in quantiles]
+    probabilites = np.array([0.5, *quantiles], dtype=float)[None, :]
+    lois = df["Loi"].to_numpy()
+    valeurs = np.full((len(df), len(points)), np.nan)
+    taux = np.full((len(df), len(points)), np.nan)
+
+    for loi, famille in LOIS.items():
+        masque = lois == loi
+        if not masque.any():
+            continue
+        params = df.loc[masque, list(famille.colonnes)].to_numpy(dtype=float).T[:, :, None]
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            quantiles_loi = famille.ppf(probabilites, *params)
+            t = np.column_stack([
+                np.broadcast_to(famille.moyenne(*params), (masque.sum(), 1)),
+                quantiles_loi[:, :1],
+                np.broadcast_to(famille.mode(*params), (masque.sum(), 1)),
+                quantiles_loi[:, 1:],
+            ])
+            valeurs[masque] = t
+            taux[masque] = np.exp(famille.log_lambda(t, *params))
+
+    statistiques = pd.DataFrame(valeurs, columns=points, index=df.index)
+    for j, point in enumerate(points):
+        statistiques[f"lambda_{point}"] = taux[:, j]
+    return statistiques
@@ -0,0 +1,250 @@
+import math
+import os
+
+import numpy as np
+
+try:
+    from numba import njit, prange
+except ImportError:
+    njit = None
+    prange = range
+
+# ==============================
+# 0. Choix du moteur de calcul
+# ==============================
+# Les boucles chaudes (R, f, H, log f, log λ des lois Weibull, Gumbel et
+# exponentielle sur une grille, sommes KS/AD/CvM de l'adéquation, sommes de
+# l'équation de profil du MLE Weibull) existent en deux versions :
+# - "numpy" : les fonctions vectorisées habituelles (lois_fiabilite,
+#   adequation, ajustement_weibull) ;
+# - "numba" : les noyaux compilés ci-dessous, une passe sans tableau
+#   temporaire, parallélisée sur les lignes.
+# Les deux versions appliquent les mêmes formules ; les résultats ne
+# diffèrent qu'à l'arrondi près (ordre des sommations, exp/log de la libm).
+# Par défaut, numba est utilisé s'il est installé ; la variable
+# d'environnement FIABILITE_NOYAUX ("numba", "numpy" ou "auto") force le
+# moteur, par exemple pour comparer les deux dans un benchmark. Elle est lue
+# à l'import : la fixer avant de lancer le script.
+
+VARIABLE_MOTEUR = "FIABILITE_NOYAUX"
+
+
+def _moteur():
+    demande = os.environ.get(VARIABLE_MOTEUR, "auto").strip().lower() or "auto"
+    if demande not in ("auto", "numba", "numpy"):
+        raise ValueError(f"{VARIABLE_MOTEUR} = {demande!r} : attendu 'auto', 'numba' ou 'numpy'")
+    if demande == "numba" and njit is None:
+        raise ImportError(f"{VARIABLE_MOTEUR} = 'numba' mais numba n'est pas installé")
+    if demande == "numpy" or njit is None:
+        return "numpy"
+    return "numba"
+
+
+MOTEUR = _moteur()
+
+
+def _compiler(parallele=True):
+    """Décorateur njit (sans effet si numba est absent : la fonction reste en Python).
+
+    error_model="numpy" : une division par zéro donne inf ou NaN, comme dans
+    la version numpy, au lieu de lever ZeroDivisionError.
+    """
+    if njit is None:
+        return lambda fonction: fonction
+    return njit(parallel=parallele, cache=True, error_model="numpy")
+
+
+# ==============================
+# 1. Fonctions élémentaires
+# ==============================
+
+# Fonction demandée (mêmes noms que lois_fiabilite.courbe_loi) -> code du noyau
+FONCTIONS = {"R": 0, "f": 1, "H": 2, "logf": 3, "loglambda": 4}
+
+
+@_compiler(parallele=False)
+def _log(x):
+    # log sans exception : -inf en 0, NaN pour x < 0 (comme np.log)
+    if x > 0:
+        return math.log(x)
+    if x == 0:
+        return -math.inf
+    return math.nan
+
+
+@_compiler(parallele=False)
+def _xlogy(x, y):
+    # x · log(y), nul si x = 0 (comme scipy.special.xlogy)
+    if x == 0 and not math.isnan(y):
+        return 0.0
+    return x * _log(y)
+
+
+@_compiler(parallele=False)
+def _puissance(x, a):
+    # x ** a, +inf en 0 si a < 0 et NaN pour x < 0 (comme np.power)
+    if x < 0:
+        return math.nan
+    if x == 0:
+        if a > 0:
+            return 0.0
+        if a == 0:
+            return 1.0
+        return math.inf
+    return x ** a
+
+
+# ==============================
+# 2. Courbes des lois (matrice m × T)
+# ==============================
+
+@_compiler()
+def _weibull(code, t, alpha, beta, gamma):
+    m, n_t = len(alpha), len(t)
+    sortie = np.empty((m, n_t))
+    for i in prange(m):
+        a, b = alpha[i], beta[i]
+        for j in range(n_t):
+            u = t[j] - gamma[i]
+            x = max(u, 0.0) / a
+            if code == 0:
+                sortie[i, j] = math.exp(-_puissance(x, b))
+            elif code == 1:
+                sortie[i, j] = (b / a) * _puissance(x, b - 1) * math.exp(-_puissance(x, b)) if u >= 0 else 0.0
+            elif code == 2:
+                sortie[i, j] = _puissance(x, b)
+            elif code == 3:
+                sortie[i, j] = _log(b / a) + _xlogy(b - 1, x) - _puissance(x, b) if u >= 0 else -math.inf
+            else:
+                sortie[i, j] = _log(b / a) + _xlogy(b - 1, x) if u >= 0 else -math.inf
+    return sortie
+
+
+@_compiler()
+def _gumbel(code, t, mu, beta):
+    m, n_t = len(mu), len(t)
+    sortie = np.empty((m, n_t))
+    for i in prange(m):
+        b = max(beta[i], 1e-6)
+        for j in range(n_t):
+            z = (t[j] - mu[i]) / b
+            if code == 2:
+                z = max(z, -700.0)
+                u = math.exp(-z)
+                # -log(1 - exp(-u)) ≈ z + u/2 dans la queue droite (u → 0)
+                sortie[i, j] = z + u / 2 if z > 30 else -_log(-math.expm1(-u))
+                continue
+            z = min(max(z, -700.0), 700.0)
+            u = math.exp(-z)
+            if code == 0:
+                sortie[i, j] = -math.expm1(-u)
+            elif code == 1:
+                sortie[i, j] = math.exp(-z - u) / b
+            elif code == 3:
+                sortie[i, j] = -z - u - math.log(b)
+            else:
+                # λ = (u / β) / (exp(u) - 1)
+                sortie[i, j] = -math.log(b) - (u - math.log(u) if u > 700 else math.log(math.expm1(u) / u))
+    return sortie
+
+
+@_compiler()
+def _exponentielle(code, t, lambda_, gamma):
+    m, n_t = len(lambda_), len(t)
+    sortie = np.empty((m, n_t))
+    for i in prange(m):
+        l = lambda_[i]
+        for j in range(n_t):
+            u = t[j] - gamma[i]
+            x = max(u, 0.0)
+            if code == 0:
+                sortie[i, j] = math.exp(-l * x)
+            elif code == 1:
+                sortie[i, j] = l * math.exp(-l * x) if u >= 0 else 0.0
+            elif code == 2:
+                sortie[i, j] = l * x
+            elif code == 3:
+                sortie[i, j] = _log(l) - l * x if u >= 0 else -math.inf
+            else:
+                sortie[i, j] = _log(l) if u >= 0 else -math.inf
+    return sortie
+
+
+def _colonne(params, j):
+    if params.shape[1] > j:
+        return np.ascontiguousarray(params[:, j])
+    return np.zeros(len(params))
+
+
+def courbe_weibull(fonction, t, params):
+    """Courbe Weibull (m × T) : `params` = (alpha, beta[, gamma]) par ligne."""
+    return _weibull(FONCTIONS[fonction], t, _colonne(params, 0), _colonne(params, 1), _colonne(params, 2))
+
+
+def courbe_gumbel(fonction, t, params):
+    """Courbe Gumbel (m × T) : `params` = (mu, beta) par ligne."""
+    return _gumbel(FONCTIONS[fonction], t, _colonne(params, 0), _colonne(params, 1))
+
+
+def courbe_exponentielle(fonction, t, params):
+    """Courbe exponentielle (m × T) : `params` = (lambda_[, gamma]) par ligne."""
+    return _exponentielle(FONCTIONS[fonction], t, _colonne(params, 0), _colonne(params, 1))
+
+
+# ==============================
+# 3. Statistiques d'adéquation
+# ==============================
+
+@_compiler()
+def _adequation(log_F, log_S, log_min):
+    n_lois, n = log_F.shape
+    ks = np.empty(n_lois)
+    ad = np.empty(n_lois)
+    cvm = np.empty(n_lois)
+    for k in prange(n_lois):
+        d = -math.inf
+        somme_ad = 0.0
+        somme_cvm = 0.0
+        for i in range(n):
+            lf = max(log_F[k, i], log_min)
+            F = math.exp(lf)
+            d = max(d, (i + 1) / n - F, F - i / n)
+            somme_ad += (2 * i + 1) * (lf + max(log_S[k, n - 1 - i], log_min))
+            somme_cvm += (F - (2 * i + 1) / (2 * n)) ** 2
+        ks[k] = d
+        ad[k] = -n - somme_ad / n
+        cvm[k] = 1 / (12 * n) + somme_cvm
+    return ks, ad, cvm
+
+
+def sommes_adequation(log_F, log_S, log_min):
+    """(KS, AD, CvM) de chaque ligne des matrices (n_lois × n) log F et log R, bornées à `log_min`."""
+    return _adequation(np.ascontiguousarray(log_F, dtype=float), np.ascontiguousarray(log_S, dtype=float),
+                       float(log_min))
+
+
+# ==============================
+# 4. Équation de profil du MLE Weibull
+# ==============================
+
+@_compiler()
+def _sommes_puissances(Lc, Lmax, beta, offsets):
+    n_groupes = len(offsets) - 1
+    A = np.zeros(n_groupes)
+    B = np.zeros(n_groupes)
+    C = np.zeros(n_groupes)
+    for k in prange(n_groupes):
+        a = b = c = 0.0
+        for j in range(offsets[k], offsets[k + 1]):
+            w = math.exp(beta[k] * (Lc[j] - Lmax[k]))
+            a += w
+            b += w * Lc[j]
+            c += w * Lc[j] * Lc[j]
+        A[k], B[k], C[k] = a, b, c
+    return A, B, C
+
+
+def sommes_puissances(Lc, Lmax, beta, offsets):
+    """Σ w, Σ w·L et Σ w·L² par groupe, w = exp(β (L - Lmax)), en une passe sur les TBF."""
+    return _sommes_puissances(np.ascontiguousarray(Lc, dtype=float), np.ascontiguousarray(Lmax, dtype=float),
+                              np.ascontiguousarray(beta, dtype=float), np.ascontiguousarray(offsets, dtype=np.int64))
@@ -0,0 +1,136 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from fiabilite_systeme import contient_attente, fiabilite_structure, segments
+from lois_fiabilite import LOIS
+
+# ==============================
+# 0. Paramètres de la simulation
+# ==============================
+# Les durées de vie de tous les composants d'un site sont tirées d'un coup,
+# sous forme d'une matrice (simulations × composants), par inversion des
+# lois ajustées (ppf du registre). La durée de vie du système s'en déduit
+# par la fonction de structure, sans boucle sur les trajectoires :
+# série = min, parallèle = max, k-sur-n = (n - k + 1)-ième défaillance,
+# attente (redondance froide, commutation parfaite) = somme.
+# Les simulations sont découpées en blocs de TAILLE_BLOC (mémoire bornée),
+# répartis sur un pool de processus ; chaque bloc a son propre flux
+# aléatoire dérivé de la graine : le résultat ne dépend pas du nombre de
+# processus.
+
+N_SIMULATIONS = 1_000_000
+TAILLE_BLOC = 100_000
+
+
+# ==============================
+# 1. Tirages et fonction de structure
+# ==============================
+
+def tirer_durees(lois, params, n, rng):
+    """Matrice (n × composants) de durées de vie tirées des lois ajustées.
+
+    `lois` donne la loi de chaque composant et `params[i]` ses paramètres,
+    dans l'ordre des colonnes du registre. Les composants d'une même loi
+    sont tirés en un seul appel vectorisé.
+    """
+    lois = np.asarray(lois, dtype=object)
+    U = rng.random((n, len(lois)))
+    durees = np.empty_like(U)
+    for loi in dict.fromkeys(lois):
+        colonnes = np.flatnonzero(lois == loi)
+        p = np.array([params[i] for i in colonnes], dtype=float)
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            durees[:, colonnes] = LOIS[loi].ppf(U[:, colonnes], *p.T)
+    return np.maximum(durees, 0.0)
+
+
+def duree_structure(bloc, durees):
+    """Durée de vie d'un bloc pour chaque ligne de `durees` (simulations × composants)."""
+    if not isinstance(bloc, tuple):
+        return durees[:, bloc]
+    type_bloc, k, elements = bloc
+    X = np.column_stack([duree_structure(e, durees) for e in elements])
+    if type_bloc == "série":
+        return X.min(axis=1)
+    if type_bloc == "parallèle":
+        return X.max(axis=1)
+    if type_bloc == "k/n":
+        # Le bloc tombe à la (n - k + 1)-ième défaillance
+        rang = X.shape[1] - k
+        return np.partition(X, rang, axis=1)[:, rang]
+    if type_bloc == "attente":
+        return X.sum(axis=1)
+    raise ValueError(f"Type de bloc inconnu : {type_bloc}")
+
+
+# ==============================
+# 2. Simulation par blocs (pool de processus)
+# ==============================
+
+def _simuler_bloc(args):
+    lois, params, bloc, t, n, graine = args
+    durees = duree_structure(bloc, tirer_durees(lois, params, n, np.random.default_rng(graine)))
+    # survivants[j] = nombre de trajectoires avec T_système > t[j]
+    comptes = np.bincount(np.searchsorted(t, durees, side="left"), minlength=len(t) + 1)
+    return np.cumsum(comptes[::-1])[::-1][1:]
+
+
+def simuler_fiabilite(lois, params, bloc, t, n_simulations=N_SIMULATIONS, taille_bloc=TAILLE_BLOC,
+                      graine=0, n_workers=None):
+    """R(t) d'un système par Monte Carlo sur la grille `t` (croissante).
+
+    `lois` et `params` décrivent les composants référencés par `bloc`
+    (indices de ligne). Renvoie (R, erreur_type) : l'estimation de R(t) et
+    son écart-type sqrt(R(1 - R) / N). Les blocs de simulations sont répartis
+    sur `n_workers` processus (tous les cœurs si None, série si 1).
+    """
+    t = np.asarray(t, dtype=float)
+    tailles = [taille_bloc] * (n_simulations // taille_bloc)
+    if n_simulations % taille_bloc:
+        tailles.append(n_simulations % taille_bloc)
+    graines = np.random.SeedSequence(graine).spawn(len(tailles))
+    args = [(list(lois), [tuple(p) for p in params], bloc, t, n, g) for n, g in zip(tailles, graines)]
+
+    if n_workers == 1 or len(args) <= 1:
+        survivants = sum(map(_simuler_bloc, args))
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers) as pool:
+            survivants = sum(pool.map(_simuler_bloc, args))
+
+    R = survivants / n_simulations
+    return R, np.sqrt(R * (1 - R) / n_simulations)
+
+
+# ==============================
+# 3. Fiabilité des sites structurés
+# ==============================
+
+def fiabilite_sites_structure(structures, df_composants, R_composants, debuts, t,
+                              n_simulations=N_SIMULATIONS, graine=0, n_workers=None):
+    """R(t) des sites décrits par `structures` (voir construire_structures).
+
+    `df_composants` (Loi et paramètres) et `R_composants` sont déjà permutés
+    par indexer_sites, `debuts` donnant le début de chaque segment de site.
+    La forme analytique est utilisée quand elle existe ; un site comportant
+    une redondance en attente est simulé. Renvoie {site: (R, méthode)}, la
+    méthode valant "analytique" ou "Monte Carlo".
+    """
+    lois = df_composants["Loi"].to_numpy()
+    sites = df_composants["Site"].to_numpy()
+    resultats = {}
+    for rang, (debut, fin) in enumerate(segments(debuts, len(df_composants))):
+        site = sites[debut]
+        bloc = structures.get(site)
+        if bloc is None:
+            continue
+        if not contient_attente(bloc):
+            resultats[site] = (fiabilite_structure(bloc, R_composants[debut:fin]), "analytique")
+            continue
+        segment = df_composants.iloc[debut:fin]
+        params = [segment.iloc[i][list(LOIS[loi].colonnes)].to_numpy(dtype=float)
+                  for i, loi in enumerate(lois[debut:fin])]
+        R, _ = simuler_fiabilite(lois[debut:fin], params, bloc, t, n_simulations=n_simulations,
+                                 graine=[graine, rang], n_workers=n_workers)
+        resultats[site] = (R, "Monte Carlo")
+    return resultats
@@ -0,0 +1,143 @@
+import json
+import os
+
+import pandas as pd
+
+# ==============================
+# 0. Paramètres globaux
+# ==============================
+
+# Dossier des tables intermédiaires (Parquet) partagées entre les scripts
+DOSSIER_STOCKAGE = "stockage_fiabilite"
+
+# Noms des tables du pipeline
+TABLE_PARAMETRES = "parametres"                 # Estimation -> Validation
+TABLE_TESTS = "resultats_tests"                 # Validation : feuille "Résultats Tests"
+TABLE_TOP3 = "classement_top3"                  # Validation : feuille "Classement Top 3"
+TABLE_RESUME = "resume_meilleure_loi"           # Validation : feuille "Résumé Meilleure Loi"
+TABLE_R_COMPOSANTS = "r_composants"             # Base_fiabilite : courbes R(t) composants
+TABLE_R_SITES = "r_sites"                       # Base_fiabilite : courbes R(t) sites
+TABLE_IMPORTANCE = "importance"                 # Base_fiabilite : facteurs d'importance
+TABLE_STATISTIQUES = "statistiques"             # Analyse_stat : caractéristiques par loi
+TABLE_STRUCTURE = "structure_systemes"          # Base_fiabilite : blocs série/parallèle/k-sur-n des sites
+
+# Variable d'environnement remplaçant la source de données de tous les
+# scripts (données synthétiques du benchmark, jeux de test) ; sans elle,
+# chaque script lit son propre classeur
+VARIABLE_SOURCE = "FIABILITE_SOURCE"
+
+
+def source_donnees(defaut):
+    """Source des données : FIABILITE_SOURCE si elle est définie, sinon `defaut`."""
+    return os.environ.get(VARIABLE_SOURCE) or defaut
+
+
+# ==============================
+# 1. Tables intermédiaires
+# ==============================
+
+def _chemin_table(nom, dossier):
+    return os.path.join(dossier, f"{nom}.parquet")
+
+
+def typer_colonnes(df):
+    """Convertit les colonnes de paramètres en float64 ("" -> NaN).
+
+    Les colonnes de paramètres sont celles des lois du registre
+    (lois_fiabilite.colonnes_parametres), toujours stockées en float64.
+    """
+    # Import différé : le registre des lois importe lui-même le stockage
+    from lois_fiabilite import colonnes_parametres
+
+    df = df.copy()
+    for col in colonnes_parametres():
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype("float64")
+    return df
+
+
+def sauver_table(nom, df, dossier=DOSSIER_STOCKAGE):
+    """Écrit une table intermédiaire typée au format Parquet."""
+    os.makedirs(dossier, exist_ok=True)
+    chemin = _chemin_table(nom, dossier)
+    typer_colonnes(df).to_parquet(chemin, index=False)
+    return chemin
+
+
+def charger_table(nom, dossier=DOSSIER_STOCKAGE):
+    """Relit une table écrite par sauver_table."""
+    return pd.read_parquet(_chemin_table(nom, dossier))
+
+
+def exporter_excel(chemin, feuilles, dossier=DOSSIER_STOCKAGE):
+    """Export Excel final : `feuilles` associe un nom de feuille à une table.
+
+    La table peut être un DataFrame ou le nom d'une table du stockage. Les NaN
+    des colonnes de paramètres sont laissés vides pour un affichage clair.
+    """
+    with pd.ExcelWriter(chemin, engine="openpyxl", mode="w") as writer:
+        for feuille, table in feuilles.items():
+            if isinstance(table, str):
+                table = charger_table(table, dossier)
+            table.to_excel(writer, sheet_name=feuille, index=False)
+    return chemin
+
+
+# ==============================
+# 2. Classeur TBF/TTR brut (cache Parquet)
+# ==============================
+
+def normaliser_noms(noms):
+    """Noms de colonnes nettoyés (Solution 2) : alphanumérique seulement."""
+    return pd.Index(noms).astype(str).str.strip().str.replace(r'[^a-zA-Z0-9]', '', regex=True)
+
+
+def normaliser_colonnes(df):
+    """Nettoyage des noms de colonnes (Solution 2) : alphanumérique seulement."""
+    df.columns = normaliser_noms(df.columns)
+    return df
+
+
+def cache_brut(chemin, sheet_name="Données TTR", dossier=DOSSIER_STOCKAGE):
+    """Fichiers du cache Parquet d'une feuille brute et signature attendue.
+
+    Renvoie (chemin_cache, chemin_meta, signature, valide) ; `valide` indique
+    que le cache existe et correspond à la date de modification du classeur.
+    """
+    base = os.path.splitext(os.path.basename(chemin))[0]
+    cle = f"brut_{base}_{sheet_name}".replace(" ", "_")
+    chemin_cache = _chemin_table(cle, dossier)
+    chemin_meta = os.path.join(dossier, f"{cle}.json")
+    signature = {"source": os.path.abspath(chemin), "feuille": sheet_name,
+                 "mtime_ns": os.stat(chemin).st_mtime_ns}
+
+    valide = False
+    if os.path.exists(chemin_cache) and os.path.exists(chemin_meta):
+        with open(chemin_meta, encoding="utf-8") as f:
+            valide = json.load(f) == signature
+    return chemin_cache, chemin_meta, signature, valide
+
+
+def charger_tbf(chemin, sheet_name="Données TTR", dossier=DOSSIER_STOCKAGE):
+    """Lit une feuille du classeur brut via un cache Parquet.
+
+    Le classeur n'est analysé qu'une fois : la feuille est ensuite relue depuis
+    le cache tant que la date de modification du fichier source ne change pas.
+    Les noms de colonnes sont renvoyés tels quels (voir normaliser_colonnes).
+    """
+    chemin_cache, chemin_meta, signature, valide = cache_brut(chemin, sheet_name, dossier)
+    if valide:
+        return pd.read_parquet(chemin_cache)
+
+    df = pd.read_excel(chemin, sheet_name=sheet_name)
+
+    try:
+        os.makedirs(dossier, exist_ok=True)
+        df.to_parquet(chemin_cache, index=False)
+        with open(chemin_meta, "w", encoding="utf-8") as f:
+            json.dump(signature, f)
+    except (ValueError, TypeError, NotImplementedError) as e:
+        # Colonnes de types mixtes non représentables en Parquet : pas de cache
+        print(f"[Info] Cache Parquet indisponible pour {chemin} : {e}")
+
+    return df
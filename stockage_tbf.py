@@ -0,0 +1,336 @@
+import json
+import os
+import shutil
+from itertools import islice
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import etape
+from lecture_donnees import groupes_tbf
+from stockage import DOSSIER_STOCKAGE
+
+# Nombre de groupes Site-Composant par paquet de la lecture en flux
+# (paquets_tbf) : chaque paquet est ajusté pendant que la suite est lue
+TAILLE_PAQUET = 5_000
+
+# ==============================
+# 1. Réductions par segment
+# ==============================
+
+def sommes_segments(x, offsets):
+    """Somme de `x` sur chaque segment [offsets[i], offsets[i+1]) (0 si vide)."""
+    x = np.asarray(x, dtype=np.float64)
+    n = np.diff(offsets)
+    if len(x) == 0:
+        return np.zeros(len(n))
+    # reduceat renvoie x[debut] pour un segment vide : corrigé par le masque
+    sommes = np.add.reduceat(x, np.minimum(offsets[:-1], len(x) - 1))
+    return np.where(n > 0, sommes, 0.0)
+
+
+# ==============================
+# 2. Stock des TBF de toute la flotte
+# ==============================
+
+class TBFStore:
+    """TBF de tous les groupes Site-Composant dans un seul tampon contigu.
+
+    - `valeurs` : float64, TBF triés à l'intérieur de chaque groupe
+    - `offsets` : int64 (n_groupes + 1), le groupe i occupe
+      valeurs[offsets[i]:offsets[i+1]]
+    - `codes_site`, `codes_composant` : codes catégoriels (int32) dans
+      `sites` et `composants`
+    - `n`, `somme`, `somme_carres`, `somme_logs` : statistiques par groupe,
+      calculées une fois par réduction de segment
+
+    Les groupes sont rendus comme des vues (aucune copie) ; le stock se
+    sauvegarde en .npy et peut être relu en mémoire projetée (mmap).
+    """
+
+    def __init__(self, valeurs, offsets, codes_site, codes_composant, sites, composants, statistiques=None):
+        self.valeurs = np.asarray(valeurs)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.codes_site = np.asarray(codes_site, dtype=np.int32)
+        self.codes_composant = np.asarray(codes_composant, dtype=np.int32)
+        self.sites = np.asarray(sites, dtype=object)
+        self.composants = np.asarray(composants, dtype=object)
+
+        if statistiques is None:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                statistiques = {
+                    "n": np.diff(self.offsets),
+                    "somme": sommes_segments(self.valeurs, self.offsets),
+                    "somme_carres": sommes_segments(self.valeurs ** 2, self.offsets),
+                    "somme_logs": sommes_segments(np.log(self.valeurs), self.offsets),
+                }
+        self.n = np.asarray(statistiques["n"], dtype=np.int64)
+        self.somme = np.asarray(statistiques["somme"])
+        self.somme_carres = np.asarray(statistiques["somme_carres"])
+        self.somme_logs = np.asarray(statistiques["somme_logs"])
+
+    # ---------- Construction ----------
+
+    @classmethod
+    def depuis_groupes(cls, groupes):
+        """Construit le stock à partir d'une suite de (site, composant, tbf)."""
+        sites, composants, morceaux = [], [], []
+        for site, composant, tbf in groupes:
+            sites.append(site)
+            composants.append(composant)
+            morceaux.append(np.sort(np.asarray(tbf, dtype=np.float64)))
+
+        offsets = np.zeros(len(morceaux) + 1, dtype=np.int64)
+        np.cumsum([len(m) for m in morceaux], out=offsets[1:])
+        valeurs = np.concatenate(morceaux) if morceaux else np.empty(0)
+
+        codes_site, noms_sites = pd.factorize(np.asarray(sites, dtype=object), sort=True)
+        codes_composant, noms_composants = pd.factorize(np.asarray(composants, dtype=object), sort=True)
+        return cls(valeurs, offsets, codes_site, codes_composant, noms_sites, noms_composants)
+
+    @classmethod
+    def depuis_matrice(cls, X):
+        """Stock dont le groupe i est la ligne i de X (B échantillons × n), par exemple pour le bootstrap."""
+        X = np.sort(np.asarray(X, dtype=np.float64), axis=1)
+        offsets = np.arange(X.shape[0] + 1, dtype=np.int64) * X.shape[1]
+        codes = np.arange(X.shape[0])
+        return cls(X.ravel(), offsets, codes, codes, codes, codes)
+
+    def selection(self, masque):
+        """Nouveau stock réduit aux groupes de `masque` (booléens ou indices)."""
+        indices = np.arange(len(self))[masque]
+        debuts, fins = self.offsets[indices], self.offsets[indices + 1]
+        offsets = np.zeros(len(indices) + 1, dtype=np.int64)
+        np.cumsum(fins - debuts, out=offsets[1:])
+        valeurs = (np.concatenate([self.valeurs[d:f] for d, f in zip(debuts, fins)])
+                   if len(indices) else np.empty(0))
+        statistiques = {nom: getattr(self, nom)[indices] for nom in ("n", "somme", "somme_carres", "somme_logs")}
+        return TBFStore(valeurs, offsets, self.codes_site[indices], self.codes_composant[indices],
+                        self.sites, self.composants, statistiques)
+
+    def filtrer(self, n_min):
+        """Groupes ayant au moins `n_min` TBF."""
+        return self.selection(self.n >= n_min)
+
+    # ---------- Accès aux groupes ----------
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def groupe(self, i):
+        """TBF triés du groupe i (vue sur le tampon, sans copie)."""
+        return self.valeurs[self.offsets[i]:self.offsets[i + 1]]
+
+    def cle(self, i):
+        return self.sites[self.codes_site[i]], self.composants[self.codes_composant[i]]
+
+    def __iter__(self):
+        for i in range(len(self)):
+            site, composant = self.cle(i)
+            yield site, composant, self.groupe(i)
+
+    # ---------- Statistiques par groupe ----------
+
+    def moyennes(self):
+        return self.somme / self.n
+
+    def variances(self, ddof=1):
+        """Variances par groupe, en deux passes (écarts à la moyenne) pour la précision."""
+        ecarts = self.valeurs - np.repeat(self.moyennes(), self.n)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return sommes_segments(ecarts ** 2, self.offsets) / (self.n - ddof)
+
+    def minimums(self):
+        """Plus petit TBF de chaque groupe (premier du segment trié), NaN si vide."""
+        if len(self.valeurs) == 0:
+            return np.full(len(self), np.nan)
+        premiers = self.valeurs[np.minimum(self.offsets[:-1], len(self.valeurs) - 1)]
+        return np.where(self.n > 0, premiers, np.nan)
+
+    def asymetries(self):
+        """Coefficients d'asymétrie par groupe (estimateur ajusté G1, comme pandas.skew)."""
+        ecarts = self.valeurs - np.repeat(self.moyennes(), self.n)
+        n = self.n.astype(float)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            m2 = sommes_segments(ecarts ** 2, self.offsets) / n
+            m3 = sommes_segments(ecarts ** 3, self.offsets) / n
+            return m3 / m2 ** 1.5 * np.sqrt(n * (n - 1)) / (n - 2)
+
+    def moyennes_log(self):
+        return self.somme_logs / self.n
+
+    def variances_log(self, ddof=1):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ecarts = np.log(self.valeurs) - np.repeat(self.moyennes_log(), self.n)
+            return sommes_segments(ecarts ** 2, self.offsets) / (self.n - ddof)
+
+    # ---------- Persistance ----------
+
+    _TABLEAUX = ("valeurs", "offsets", "codes_site", "codes_composant",
+                 "n", "somme", "somme_carres", "somme_logs")
+
+    def sauver(self, dossier, signature=None):
+        """Écrit le stock dans `dossier` : un .npy par tableau + noms en JSON."""
+        os.makedirs(dossier, exist_ok=True)
+        for nom in self._TABLEAUX:
+            np.save(os.path.join(dossier, f"{nom}.npy"), np.ascontiguousarray(getattr(self, nom)))
+        with open(os.path.join(dossier, "noms.json"), "w", encoding="utf-8") as f:
+            json.dump({"sites": pd.Series(self.sites).tolist(), "composants": pd.Series(self.composants).tolist(),
+                       "signature": signature}, f, ensure_ascii=False)
+
+    @classmethod
+    def charger(cls, dossier, mmap=True):
+        """Relit un stock sauvegardé ; les tableaux sont projetés en mémoire si `mmap`."""
+        mode = "r" if mmap else None
+        tableaux = {nom: np.load(os.path.join(dossier, f"{nom}.npy"), mmap_mode=mode)
+                    for nom in cls._TABLEAUX}
+        with open(os.path.join(dossier, "noms.json"), encoding="utf-8") as f:
+            noms = json.load(f)
+        statistiques = {nom: tableaux[nom] for nom in ("n", "somme", "somme_carres", "somme_logs")}
+        return cls(tableaux["valeurs"], tableaux["offsets"], tableaux["codes_site"],
+                   tableaux["codes_composant"], noms["sites"], noms["composants"], statistiques)
+
+
+class EcritureTBF:
+    """Écrit un stock sur disque paquet par paquet, au format de TBFStore.sauver.
+
+    Chaque paquet (TBFStore) est ajouté à la fin de fichiers bruts (.part) :
+    seuls les noms de sites et de composants restent en mémoire. `terminer`
+    convertit les fichiers en .npy (copie par blocs) et écrit noms.json ; le
+    stock n'est valide qu'à ce moment.
+    """
+
+    _TYPES = {"valeurs": np.float64, "offsets": np.int64, "codes_site": np.int32, "codes_composant": np.int32,
+              "n": np.int64, "somme": np.float64, "somme_carres": np.float64, "somme_logs": np.float64}
+
+    def __init__(self, dossier):
+        self.dossier = dossier
+        os.makedirs(dossier, exist_ok=True)
+        # L'ancien stock n'est plus valide dès qu'on commence à le remplacer
+        chemin_noms = os.path.join(dossier, "noms.json")
+        if os.path.exists(chemin_noms):
+            os.remove(chemin_noms)
+        self._fichiers = {nom: open(self._partiel(nom), "wb") for nom in TBFStore._TABLEAUX}
+        self._tailles = dict.fromkeys(TBFStore._TABLEAUX, 0)
+        self._codes = {"sites": {}, "composants": {}}
+        self._total = 0
+        self._ecrire("offsets", np.zeros(1, dtype=np.int64))
+
+    def _partiel(self, nom):
+        return os.path.join(self.dossier, f"{nom}.npy.part")
+
+    def _ecrire(self, nom, tableau):
+        np.ascontiguousarray(tableau, dtype=self._TYPES[nom]).tofile(self._fichiers[nom])
+        self._tailles[nom] += len(tableau)
+
+    def _recoder(self, categorie, noms, codes):
+        # Codes globaux, dans l'ordre d'apparition des noms
+        table = self._codes[categorie]
+        correspondance = np.array([table.setdefault(nom, len(table)) for nom in noms], dtype=np.int32)
+        return correspondance[codes] if len(codes) else np.empty(0, dtype=np.int32)
+
+    def ajouter(self, stock):
+        self._ecrire("valeurs", stock.valeurs)
+        self._ecrire("offsets", stock.offsets[1:] + self._total)
+        self._ecrire("codes_site", self._recoder("sites", stock.sites, stock.codes_site))
+        self._ecrire("codes_composant", self._recoder("composants", stock.composants, stock.codes_composant))
+        for nom in ("n", "somme", "somme_carres", "somme_logs"):
+            self._ecrire(nom, getattr(stock, nom))
+        self._total += int(stock.offsets[-1])
+
+    def terminer(self, signature=None):
+        for nom in TBFStore._TABLEAUX:
+            self._fichiers[nom].close()
+            entete = {"descr": np.lib.format.dtype_to_descr(np.dtype(self._TYPES[nom])), "fortran_order": False,
+                      "shape": (self._tailles[nom],)}
+            with open(os.path.join(self.dossier, f"{nom}.npy"), "wb") as sortie:
+                np.lib.format.write_array_header_1_0(sortie, entete)
+                with open(self._partiel(nom), "rb") as partiel:
+                    shutil.copyfileobj(partiel, sortie)
+            os.remove(self._partiel(nom))
+        with open(os.path.join(self.dossier, "noms.json"), "w", encoding="utf-8") as f:
+            json.dump({"sites": pd.Series(list(self._codes["sites"])).tolist(),
+                       "composants": pd.Series(list(self._codes["composants"])).tolist(),
+                       "signature": signature}, f, ensure_ascii=False)
+
+    def abandonner(self):
+        for nom, fichier in self._fichiers.items():
+            fichier.close()
+            if os.path.exists(self._partiel(nom)):
+                os.remove(self._partiel(nom))
+
+
+# ==============================
+# 3. Stock associé à une source de données
+# ==============================
+
+def _dossier_stock(source, sheet_name, dossier):
+    base = os.path.splitext(os.path.basename(source))[0]
+    return os.path.join(dossier, f"tbf_{base}_{sheet_name}".replace(" ", "_"))
+
+
+def _signature(source, sheet_name, triees):
+    # Le mode de lecture en fait partie : un stock lu comme trié n'est pas
+    # réutilisé pour une lecture avec regroupement, et inversement
+    return {"source": os.path.abspath(source), "feuille": sheet_name, "triees": bool(triees),
+            "mtime_ns": os.stat(source).st_mtime_ns}
+
+
+def _stock_valide(dossier_stock, signature):
+    chemin_noms = os.path.join(dossier_stock, "noms.json")
+    if not os.path.exists(chemin_noms):
+        return False
+    with open(chemin_noms, encoding="utf-8") as f:
+        return json.load(f).get("signature") == signature
+
+
+def paquets_tbf(source, sheet_name="Données TTR", triees=False, taille_paquet=TAILLE_PAQUET,
+                dossier=DOSSIER_STOCKAGE, mmap=True):
+    """Génère le stock d'une source par paquets de `taille_paquet` groupes (TBFStore).
+
+    Si la source (ou `triees`) a changé depuis la dernière sauvegarde, elle
+    est lue en flux (lecture_donnees.groupes_tbf) ; chaque paquet est écrit
+    sur disque (EcritureTBF) et rendu dès qu'il est complet, sans garder les
+    précédents : la mémoire reste bornée par un paquet. L'appelant n'ajuste
+    un paquet pendant que la suite est lue qu'avec `triees=True` (source
+    triée par site et composant) ; sinon groupes_tbf ne rend les groupes
+    qu'en fin de lecture. Sinon, les paquets sont des tranches du stock
+    sauvegardé.
+    """
+    dossier_stock = _dossier_stock(source, sheet_name, dossier)
+    signature = _signature(source, sheet_name, triees)
+    if _stock_valide(dossier_stock, signature):
+        stock = TBFStore.charger(dossier_stock, mmap=mmap)
+        for debut in range(0, len(stock), taille_paquet):
+            yield stock.selection(slice(debut, debut + taille_paquet))
+        return
+
+    groupes = groupes_tbf(source, sheet_name, triees=triees, dossier=dossier)
+    ecriture = EcritureTBF(dossier_stock)
+    try:
+        while True:
+            with etape("lecture"):
+                paquet = TBFStore.depuis_groupes(islice(groupes, taille_paquet))
+                if len(paquet) == 0:
+                    break
+                ecriture.ajouter(paquet)
+            yield paquet
+    except BaseException:
+        # Lecture interrompue (erreur, ou générateur fermé avant la fin) : pas de stock partiel
+        ecriture.abandonner()
+        raise
+    ecriture.terminer(signature)
+
+
+def stock_tbf(source, sheet_name="Données TTR", triees=False, dossier=DOSSIER_STOCKAGE, mmap=True):
+    """TBFStore d'une source (xlsx, csv, parquet), persistant entre les scripts.
+
+    Le stock est reconstruit par lecture en flux (paquets_tbf) seulement si
+    la source ou `triees` ont changé depuis la dernière sauvegarde ; sinon il
+    est relu tel quel, en mémoire projetée.
+    """
+    dossier_stock = _dossier_stock(source, sheet_name, dossier)
+    if not _stock_valide(dossier_stock, _signature(source, sheet_name, triees)):
+        for _ in paquets_tbf(source, sheet_name, triees=triees, dossier=dossier):
+            pass
+    return TBFStore.charger(dossier_stock, mmap=mmap)
@@ -1,197 +1,248 @@
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import os
-from scipy.stats import kstest, anderson, expon, gamma, lognorm, gumbel_r, weibull_min
-from reliability.Fitters import Fit_Weibull_2P, Fit_Weibull_3P
+import argparse
+from adequation import tester_groupe, bootstrap_taches
+from graphes import chemins_qq_pp, rendre_qq_pp
+from instrumentation import demarrer_rapport, etape
+from lois_fiabilite import LOIS
+from estimateurs import COLONNES_PARAMETRES, ESTIMATEUR_VERSION
+from cache_estimation import (empreinte_groupe, empreinte_derivee, empreinte_parametres, graine_empreinte,
+                              charger_cache, fusionner, sauver_cache, TABLE_CACHE_VALIDATION)
+from stockage_tbf import stock_tbf
+from stockage import (charger_table, exporter_excel, sauver_table, source_donnees,
+                      TABLE_PARAMETRES, TABLE_TESTS, TABLE_TOP3, TABLE_RESUME)
 
 # ======================= 0. Préparation =======================
 
-# Charger les données de fiabilité (paramètres estimés)
-parametres = pd.read_excel(r"C:\Users\COMPUTER\Parametres_Fiabilite_Sans_MTBF.xlsx")
-
-# Charger la base TBF d'origine
-df_tbf = pd.read_excel(r"C:\Users\COMPUTER\Documents\TFC\FINALY\DONNEES TTR ET TBF 2.xlsx",sheet_name="Données TTR")
-# Nettoyage des noms de colonnes (Solution 2)
-df_tbf.columns = df_tbf.columns.str.strip().str.replace(r'[^a-zA-Z0-9]', '', regex=True)
-
-
-# Créer dossier pour sauvegarder les graphes
-os.makedirs("graphes_validation", exist_ok=True)
-
-# Initialiser liste pour stocker les résultats des tests
-validation_resultats = []
-
-# ======================= 1. Boucle site/composant =======================
-
-# Boucle sur chaque couple (site, composant)
-for (site, composant), groupe in df_tbf.groupby(["Site", "Composant"]):
-
-    tbf = groupe["TBF"].dropna().values
-    if len(tbf) < 5:
-        continue  # Trop peu de données pour une validation fiable
-
-    # Extraire les lois disponibles pour ce couple dans les paramètres
-    param_group = parametres[(parametres["Site"] == site) & (parametres["Composant"] == composant)]
-
-    for _, row in param_group.iterrows():
-        loi = row["Loi"]
-        methode = row["Méthode"]
-
-        try:
-            # ======================= 2. Construire la distribution =======================
-            if loi == "Exponentielle":
-                lmbda = row["lambda_"]
-                dist = expon(scale=1/lmbda)
-
-            elif loi == "Gamma":
-                k = row["k"]
-                theta = row["theta"]
-                dist = gamma(a=k, scale=theta)
-
-            elif loi == "Lognormale":
-                mu_ln = row["mu_ln"]
-                sigma_ln = row["sigma_ln"]
-                dist = lognorm(s=sigma_ln, scale=np.exp(mu_ln))
-
-            elif loi == "Gumbel":
-                mu = row["mu_gumbel"]
-                beta = row["beta_gumbel"]
-                dist = gumbel_r(loc=mu, scale=beta)
-
-            elif loi == "Weibull 2P":
-                alpha = row["alpha"]
-                beta = row["beta"]
-                dist = weibull_min(c=beta, scale=alpha)
-
-            elif loi == "Weibull 3P":
-                alpha = row["alpha"]
-                beta = row["beta"]
-                gamma_val = row["gamma"]
-                dist = weibull_min(c=beta, scale=alpha, loc=gamma_val)
-
-            else:
-                continue  # Loi non reconnue
-
-            # ======================= 3. Tests d'adéquation =======================
-
-            # K-S test
-            ks_stat, ks_pvalue = kstest(tbf, dist.cdf)
-
-            # A-D test (remarque : certains types ne sont pas supportés → contournement)
-            try:
-                ad_test = anderson(tbf, dist.name if hasattr(dist, 'name') else 'expon')
-                ad_stat = ad_test.statistic
-            except:
-                ad_stat = np.nan
-
-            # ======================= 4. Graphes QQ et PP =======================
-
-            sorted_tbf = np.sort(tbf)
-            n = len(tbf)
-            prob = np.arange(1, n+1) / (n + 1)
-
-            # QQ-Plot
-            theo_quantiles = dist.ppf(prob)
-            plt.figure()
-            plt.scatter(theo_quantiles, sorted_tbf, color='blue')
-            plt.plot([min(theo_quantiles), max(theo_quantiles)],
-                     [min(theo_quantiles), max(theo_quantiles)], color='red', linestyle='--')
-            plt.title(f"QQ-Plot - {site} - {composant} - {loi} ({methode})")
-            plt.xlabel("Quantiles théoriques")
-            plt.ylabel("Quantiles empiriques")
-            qq_path = f"graphes_validation/QQ_{site}_{composant}_{loi}_{methode}.png".replace(" ", "_")
-            plt.savefig(qq_path)
-            plt.close()
-
-            # PP-Plot
-            theo_cdf = dist.cdf(sorted_tbf)
-            plt.figure()
-            plt.plot(prob, theo_cdf, 'o', color='green')
-            plt.plot([0, 1], [0, 1], 'r--')
-            plt.title(f"PP-Plot - {site} - {composant} - {loi} ({methode})")
-            plt.xlabel("Probabilités empiriques")
-            plt.ylabel("Probabilités théoriques")
-            pp_path = f"graphes_validation/PP_{site}_{composant}_{loi}_{methode}.png".replace(" ", "_")
-            plt.savefig(pp_path)
-            plt.close()
-
-            # ======================= 5. Stockage des résultats =======================
-            validation_resultats.append({
-                "Site": site,
-                "Composant": composant,
-                "Loi": loi,
-                "Méthode": methode,
-                "KS_Stat": ks_stat,
-                "KS_pval": ks_pvalue,
-                "AD_Stat": ad_stat,
-                "QQ_plot": qq_path,
-                "PP_plot": pp_path
+# Source des TBF (xlsx, csv ou parquet) : le TBFStore construit par
+# l'estimation est relu en mémoire projetée tant que la source ne change pas ;
+# la variable d'environnement FIABILITE_SOURCE la remplace
+SOURCE_TBF = source_donnees(r"C:\Users\COMPUTER\Documents\TFC\FINALY\DONNEES TTR ET TBF 2.xlsx")
+# Source triée par (Site, Composant) : même valeur que dans Estimation_shabini_v1
+# (lecture en flux recouvrant l'ajustement seulement si True)
+DONNEES_TRIEES = False
+
+# Export Excel en fin de traitement (les étapes suivantes lisent le Parquet)
+EXPORT_EXCEL = True
+
+# Bootstrap paramétrique des p-valeurs KS/AD (paramètres estimés sur les TBF) :
+# nombre de réplicats, graine, processus (None = tous les cœurs) et lot par processus
+BOOTSTRAP = False
+N_BOOTSTRAP = 200
+GRAINE_BOOTSTRAP = 12345
+N_WORKERS = None
+TAILLE_LOT = 1
+
+# Graphes QQ/PP : "all" (toutes les lois), "best" (loi classée 1re) ou "none"
+PLOTS = "all"
+
+# Classement des lois : "ks_ad" (KS + AD, ou p-valeurs bootstrap si BOOTSTRAP),
+# "aic" ou "bic" (critères d'information, log-vraisemblance calculée en lot)
+CLASSEMENT = "ks_ad"
+
+# Revalidation incrémentale : seuls les groupes nouveaux ou modifiés sont retestés
+INCREMENTAL = True
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Validation des lois de fiabilité")
+    parser.add_argument("--plots", choices=["none", "best", "all"], default=PLOTS,
+                        help="graphes QQ/PP à rendre (défaut : %(default)s)")
+    parser.add_argument("--classement", choices=["ks_ad", "aic", "bic"], default=CLASSEMENT,
+                        help="critère de classement des lois (défaut : %(default)s)")
+    args = parser.parse_args()
+    demarrer_rapport("validation_lois_fiabilite")
+
+    # Charger les données de fiabilité (paramètres estimés, stockage typé)
+    with etape("lecture"):
+        parametres = charger_table(TABLE_PARAMETRES)
+
+        # Validation incrémentale : les tests d'un groupe sont réutilisés tant que ses
+        # TBF, ses paramètres et la configuration du bootstrap n'ont pas changé
+        config_validation = ("bootstrap", N_BOOTSTRAP, GRAINE_BOOTSTRAP) if BOOTSTRAP else ("tests",)
+        cache = charger_cache(TABLE_CACHE_VALIDATION)
+        if not INCREMENTAL:
+            cache = cache.iloc[0:0]
+        connues = set(cache["Empreinte"])
+
+    # Initialiser liste pour stocker les résultats des tests
+    # (et, par ligne recalculée, la loi ajustée et ses TBF pour le bootstrap)
+    validation_resultats = []
+    taches = []
+    cles = []
+    groupes_taches = []
+    empreintes = []
+    donnees_groupes = {}
+
+    # Paramètres regroupés une seule fois par (site, composant)
+    par_groupe = dict(tuple(parametres.groupby(["Site", "Composant"], sort=False)))
+    aucun_parametre = parametres.iloc[0:0]
+
+    # ======================= 1. Boucle site/composant =======================
+
+    # Boucle sur chaque couple (site, composant) ; au moins 5 TBF pour une
+    # validation fiable. Les TBF du stock sont déjà triés dans chaque groupe.
+    with etape("tests d'adéquation"):
+        stock = stock_tbf(SOURCE_TBF, sheet_name="Données TTR", triees=DONNEES_TRIEES).filtrer(5)
+        for site, composant, tbf in stock:
+
+            # Extraire les lois disponibles pour ce couple dans les paramètres
+            param_group = par_groupe.get((site, composant), aucun_parametre)
+            donnees_groupes[(site, composant)] = tbf
+
+            # Les tests suivent les TBF et les paramètres qu'ils évaluent
+            empreinte = empreinte_derivee(empreinte_groupe(site, composant, tbf, ESTIMATEUR_VERSION),
+                                          empreinte_parametres(param_group), config_validation)
+            empreintes.append(empreinte)
+            if empreinte in connues:
+                continue
+
+            # ======================= 2. Tests d'adéquation (toutes les lois en lot) =======================
+            # KS, Anderson-Darling et Cramér-von Mises contre les paramètres ajustés :
+            # une matrice F(x_(i)) pour toutes les lois, sans retrier les TBF
+            tests = tester_groupe(tbf, param_group, trie=True)[0]
+
+            # ======================= 3. Stockage des résultats =======================
+            # Les graphes QQ/PP ne sont pas tracés ici : ils sont rendus après le
+            # classement (voir --plots). Une table par groupe, construite en bloc.
+            lignes = tests.join(param_group[["Loi", "Méthode"]])
+            lignes["Empreinte"], lignes["Site"], lignes["Composant"] = empreinte, site, composant
+            validation_resultats.append(lignes)
+
+            # Vecteurs de paramètres des tâches de bootstrap : une seule matrice
+            # par groupe, découpée ligne à ligne selon les colonnes de chaque loi
+            lois = lignes["Loi"].to_numpy()
+            methodes = lignes["Méthode"].to_numpy()
+            colonnes = list(dict.fromkeys(c for loi in lois for c in LOIS[loi].colonnes))
+            position = {c: j for j, c in enumerate(colonnes)}
+            matrice = param_group.loc[lignes.index, colonnes].to_numpy(dtype=float)
+            taches += [(loi, methode, matrice[k, [position[c] for c in LOIS[loi].colonnes]], tbf)
+                       for k, (loi, methode) in enumerate(zip(lois, methodes))]
+            cles += [graine_empreinte(empreinte_derivee(empreinte, loi, methode))
+                     for loi, methode in zip(lois, methodes)]
+            groupes_taches += [(site, composant)] * len(lignes)
+
+    # ======================= 6. Sortie Excel =======================
+
+    colonnes_tests = ["Site", "Composant", "Loi", "Méthode", "KS_Stat", "KS_pval", "AD_Stat", "CvM_Stat",
+                      "LogL", "AIC", "BIC"]
+    if validation_resultats:
+        nouvelles = pd.concat(validation_resultats, ignore_index=True)[["Empreinte"] + colonnes_tests]
+    else:
+        nouvelles = pd.DataFrame(columns=["Empreinte"] + colonnes_tests)
+    print(f"Groupes revalidés : {nouvelles['Empreinte'].nunique()} / {len(empreintes)}")
+
+    with etape("bootstrap"):
+        if BOOTSTRAP:
+            # p-valeurs valides malgré l'estimation des paramètres sur les mêmes données ;
+            # graine dérivée de l'empreinte de chaque ligne : résultat identique en incrémental
+            pvaleurs = bootstrap_taches(taches, n_replicats=N_BOOTSTRAP, graine=GRAINE_BOOTSTRAP,
+                                        n_workers=N_WORKERS, taille_lot=TAILLE_LOT, cles=cles,
+                                        groupes=groupes_taches)
+            nouvelles["KS_pval_boot"] = [p_ks for p_ks, _ in pvaleurs]
+            nouvelles["AD_pval_boot"] = [p_ad for _, p_ad in pvaleurs]
+            colonnes_tests += ["KS_pval_boot", "AD_pval_boot"]
+
+    df_validation, cache = fusionner(empreintes, cache, nouvelles, colonnes_tests)
+    sauver_cache(TABLE_CACHE_VALIDATION, cache)
+    df_validation.insert(8, "QQ_plot", "")
+    df_validation.insert(9, "PP_plot", "")
+
+    # ======================= 7. Classement des lois =======================
+
+    # Calcul du score global (à minimiser)
+    with etape("classement"):
+        if args.classement == "aic":
+            df_validation["Score_Global"] = df_validation["AIC"]
+        elif args.classement == "bic":
+            df_validation["Score_Global"] = df_validation["BIC"]
+        elif BOOTSTRAP:
+            # Les statistiques brutes favorisent les lois sur-ajustées (Weibull 3P) :
+            # on classe sur les p-valeurs bootstrap (1 - p, à minimiser)
+            df_validation["Score_Global"] = 2 - df_validation["KS_pval_boot"] - df_validation["AD_pval_boot"]
+        else:
+            df_validation["Score_Global"] = df_validation["KS_Stat"] + df_validation["AD_Stat"]
+
+        # Extraire les 3 meilleures lois par site/composant
+        top3 = (
+            df_validation
+            .sort_values(["Site", "Composant", "Score_Global"])
+            .groupby(["Site", "Composant"])
+            .head(3)
+            .copy()
+        )
+
+        # Ajouter un rang (1er, 2e, 3e)
+        top3["Classement"] = top3.groupby(["Site", "Composant"])["Score_Global"].rank(method="first")
+
+    # ======================= 8. Graphes QQ et PP (rendu différé) =======================
+
+    with etape("graphes QQ/PP"):
+        if args.plots == "all":
+            a_tracer = df_validation.index
+        elif args.plots == "best":
+            a_tracer = top3.index[top3["Classement"] == 1]
+        else:
+            a_tracer = []
+
+        # Une ligne de paramètres par (site, composant, loi, méthode), indexée une fois
+        cles_lignes = ["Site", "Composant", "Loi", "Méthode"]
+        lignes_parametres = parametres.drop_duplicates(cles_lignes).set_index(cles_lignes)
+
+        taches_graphes = []
+        for i in a_tracer:
+            site, composant, loi, methode = df_validation.loc[i, cles_lignes]
+            tbf = donnees_groupes[(site, composant)]
+            row = lignes_parametres.loc[(site, composant, loi, methode)]
+            qq_path, pp_path = chemins_qq_pp(site, composant, loi, methode)
+            taches_graphes.append((site, composant, loi, methode, row[list(LOIS[loi].colonnes)].to_numpy(dtype=float),
+                                   tbf, qq_path, pp_path))
+            df_validation.loc[i, ["QQ_plot", "PP_plot"]] = qq_path, pp_path
+        top3[["QQ_plot", "PP_plot"]] = df_validation.loc[top3.index, ["QQ_plot", "PP_plot"]]
+
+        for erreur in rendre_qq_pp(taches_graphes, n_workers=N_WORKERS):
+            print(f"[Erreur] {erreur}")
+
+    # ======================= 9. Résumé Meilleure Loi =======================
+
+    # =================== 1. Paramètres de l'étape précédente (déjà chargés) ===================
+
+    with etape("résumé et stockage"):
+        df_parametres = parametres
+
+        # =================== 2. Joindre les paramètres à best_laws ===================
+
+        # On suppose que best_laws existe déjà
+        # Faire la jointure sur les colonnes clés
+        # Sélectionner la meilleure loi (rang 1) pour chaque composant/site
+        best_laws = top3[top3["Classement"] == 1].copy()
+
+        df_best_with_params = pd.merge(
+            best_laws,
+            df_parametres,
+            on=["Site", "Composant", "Loi", "Méthode"],
+            how="left"
+        )
+
+        # =================== 3. Préparer les colonnes pour le résumé ===================
+
+        colonnes_resumes = ["Site", "Composant", "Loi", "Méthode"] + COLONNES_PARAMETRES
+
+        # Paramètres typés (NaN si absent) pour les étapes suivantes
+        df_resume = df_best_with_params[colonnes_resumes]
+
+        sauver_table(TABLE_TESTS, df_validation)
+        sauver_table(TABLE_TOP3, top3)
+        sauver_table(TABLE_RESUME, df_resume)
+
+    # =================== 4. Export Excel avec les 3 feuilles ===================
+
+    with etape("export excel"):
+        if EXPORT_EXCEL:
+            # Les NaN restent des cellules vides pour un affichage clair
+            exporter_excel("Validation_Lois_Fiabilite.xlsx", {
+                "Résultats Tests": df_validation,
+                "Classement Top 3": top3,
+                "Résumé Meilleure Loi": df_resume,
             })
 
-        except Exception as e:
-            print(f"[Erreur] {site}-{composant}-{loi}: {e}")
-            continue
-
-# ======================= 6. Sortie Excel =======================
-
-df_validation = pd.DataFrame(validation_resultats)
-# ======================= 7. Classement des lois =======================
-
-# Calcul du score global (à minimiser)
-df_validation["Score_Global"] = df_validation["KS_Stat"] + df_validation["AD_Stat"]
-
-# Extraire les 3 meilleures lois par site/composant
-top3 = (
-    df_validation
-    .sort_values(["Site", "Composant", "Score_Global"])
-    .groupby(["Site", "Composant"])
-    .head(3)
-    .copy()
-)
-
-# Ajouter un rang (1er, 2e, 3e)
-top3["Classement"] = top3.groupby(["Site", "Composant"])["Score_Global"].rank(method="first")
-
-# ======================= 9. Résumé Meilleure Loi =======================
-
-# =================== 1. Charger les paramètres depuis l'étape précédente ===================
-
-df_parametres = pd.read_excel(r"C:\Users\COMPUTER\Parametres_Fiabilite_Sans_MTBF.xlsx")
-
-# =================== 2. Joindre les paramètres à best_laws ===================
-
-# On suppose que best_laws existe déjà
-# Faire la jointure sur les colonnes clés
-# Sélectionner la meilleure loi (rang 1) pour chaque composant/site
-best_laws = top3[top3["Classement"] == 1].copy()
-
-df_best_with_params = pd.merge(
-    best_laws,
-    df_parametres,
-    on=["Site", "Composant", "Loi", "Méthode"],
-    how="left"
-)
-
-# =================== 3. Préparer les colonnes pour le résumé ===================
-
-colonnes_resumes = [
-    "Site", "Composant", "Loi", "Méthode",
-    "alpha", "beta", "gamma",
-    "k", "theta",
-    "mu_ln", "sigma_ln",
-    "mu_gumbel", "beta_gumbel",
-    "lambda_"
-]
-
-# Nettoyer les NaN → remplacer par chaîne vide pour affichage clair
-df_resume = df_best_with_params[colonnes_resumes].fillna("")
-
-# =================== 4. Export Excel avec les 3 feuilles ===================
-
-with pd.ExcelWriter("Validation_Lois_Fiabilite.xlsx", engine="openpyxl", mode="w") as writer:
-    df_validation.to_excel(writer, sheet_name="Résultats Tests", index=False)
-    top3.to_excel(writer, sheet_name="Classement Top 3", index=False)
-    df_resume.to_excel(writer, sheet_name="Résumé Meilleure Loi", index=False)
-
-print("✅ Résumé Meilleure Loi mis à jour avec les paramètres complets.")
+        print("✅ Résumé Meilleure Loi mis à jour avec les paramètres complets.")